@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark extraction chunking on the sample documents
+For each document and chunking strategy, reports:
+1. Number of chunks (= Gemini extraction calls)
+2. Smallest / largest chunk in approximate tokens
+3. Variable recall: share of known variable values that appear intact in at
+   least one chunk (a value cut by a chunk boundary cannot be extracted)
+
+Known values are the variable examples stored in the database plus dates,
+amounts and reference numbers found in the text. A synthetic ~100 KB
+document with single newlines (typical PDF text) is included as well.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import SessionLocal, TemplateVariable
+from services.chunking import TextChunker, estimate_tokens
+from services.document_parser import DocumentParser
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample_documents"
+
+ENTITY_PATTERNS = [
+    re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"),  # dates
+    re.compile(r"\b\d{1,2}(?:st|nd|rd|th)?\s+[A-Z][a-z]+,?\s+\d{4}\b"),  # 12 July 2025
+    re.compile(r"(?:Rs\.?|INR|₹|\$)\s?[\d,]+(?:\.\d+)?"),  # amounts
+    re.compile(r"\b[A-Z]{2,}[-/]?\d{3,}[\w/-]*\b"),  # reference numbers
+]
+
+def legacy_chunk_text(text, chunk_size=2000):
+    """Previous chunker: split on blank lines, count characters as tokens"""
+    paragraphs = text.split('\n\n')
+    chunks, current_chunk, current_length = [], [], 0
+    for para in paragraphs:
+        if current_length + len(para) > chunk_size and current_chunk:
+            chunks.append('\n\n'.join(current_chunk))
+            current_chunk, current_length = [para], len(para)
+        else:
+            current_chunk.append(para)
+            current_length += len(para)
+    if current_chunk:
+        chunks.append('\n\n'.join(current_chunk))
+    return chunks
+
+def known_values(text, examples):
+    values = {e for e in examples if e and len(e) > 2 and e in text}
+    for pattern in ENTITY_PATTERNS:
+        values.update(pattern.findall(text))
+    return values
+
+def evaluate(chunks, values):
+    sizes = [estimate_tokens(c) for c in chunks]
+    found = sum(1 for v in values if any(v in c for c in chunks))
+    return {
+        "calls": len(chunks),
+        "min": min(sizes) if sizes else 0,
+        "max": max(sizes) if sizes else 0,
+        "recall": found / len(values) if values else 1.0,
+    }
+
+def load_documents():
+    documents = []
+    for path in sorted(SAMPLE_DIR.glob("*.pdf")):
+        documents.append((path.name, DocumentParser.parse_document(path.read_bytes(), path.name)))
+
+    # ~100 KB of PDF-style text: single newlines only
+    combined = "\n".join(text.replace("\n\n", "\n") for _, text in documents)
+    synthetic = "\n".join([combined] * (100_000 // max(1, len(combined)) + 1))[:100_000]
+    documents.append(("synthetic_100kb_single_newlines", synthetic))
+    return documents
+
+def main():
+    db = SessionLocal()
+    try:
+        examples = [v.example for v in db.query(TemplateVariable).all()]
+    finally:
+        db.close()
+
+    strategies = [
+        ("legacy (2000 chars, \\n\\n)", legacy_chunk_text),
+        ("token-aware (500 tok)", TextChunker(500, 50).chunk),
+        ("adaptive (context window)", TextChunker.for_context_window().chunk),
+    ]
+
+    print(f"{'document':<34} {'strategy':<28} {'calls':>5} {'min tok':>8} {'max tok':>8} {'recall':>7}")
+    print("-" * 95)
+    totals = {name: 0 for name, _ in strategies}
+    for doc_name, text in load_documents():
+        values = known_values(text, examples)
+        for name, chunk in strategies:
+            result = evaluate(chunk(text), values)
+            totals[name] += result["calls"]
+            print(
+                f"{doc_name:<34} {name:<28} {result['calls']:>5} {result['min']:>8} "
+                f"{result['max']:>8} {result['recall']:>7.2f}"
+            )
+        print()
+
+    print("Total extraction calls:")
+    for name, calls in totals.items():
+        print(f"  {name:<28} {calls}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark ExaService.clean_web_content against its previous implementation
+For a corpus of synthetic web pages, reports:
+1. Whether the output is identical to the previous implementation on every page
+2. Mean time per page for inputs of roughly 10k characters, old vs. new
+
+The corpus is generated from a fixed seed: legal template lines (from the
+sample documents) mixed with cookie banners, navigation, marketing copy,
+links, headlines, metadata lines, escape sequences and non-ASCII text, in the
+proportions seen in Exa page contents.
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.exa_service import ExaService
+from services.document_parser import DocumentParser
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample_documents"
+
+NOISE_LINES = [
+    "We use cookies to improve your experience. By clicking Accept you agree.",
+    "Read more", "Sign up for our newsletter", "Log in", "Buy now - Instant download",
+    "Category: Employment | Format: Word | State: Multi-State | Control #: US-0123",
+    "Here's how employers and employees can prepare for AI at work",
+    "Learn how automation is already a part of many workplaces",
+    "HOME  ABOUT  FORMS", "PRIVACY POLICY", "https://example.com/forms/termination-letter",
+    "[Download the template](https://example.com/download)",
+    "### ### @@@ $$$ *** ~~~ |||", "---", "•", "»", "© 2025 Example Legal Forms™",
+    "Form popularity: ★★★★☆ (1,234 reviews)", "FAQ", "Related forms",
+    "Our experts said the proliferation of artificial intelligence could help usher in change.",
+]
+
+def load_legal_lines():
+    lines = []
+    for path in sorted(SAMPLE_DIR.glob("*.pdf")):
+        text = DocumentParser.parse_document(path.read_bytes(), path.name)
+        lines.extend(line for line in text.split("\n") if line.strip())
+    lines += [
+        "Date: [DATE]", "To: {{EMPLOYEE_NAME}}", "Re: Notice of Termination of Employment",
+        "Dear \\[Employee Name\\],", "Your final pay and benefits, including COBRA insurance, are described below.",
+        "Sincerely,", "Signature: ____________________", "Agreement made on ___ day of ______ 2025 at Mumbai – India",
+    ]
+    return lines
+
+def make_page(rng, legal_lines, target_chars=10_000):
+    parts, size = [], 0
+    while size < target_chars:
+        roll = rng.random()
+        if roll < 0.55:
+            line = rng.choice(legal_lines)
+        elif roll < 0.85:
+            line = rng.choice(NOISE_LINES)
+        else:
+            line = ""
+        if rng.random() < 0.1:
+            line = "  " + line + "\t"
+        parts.append(line)
+        size += len(line) + 1
+    return "\n".join(parts)
+
+def time_per_call(func, pages, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            func(page)
+        best = min(best, (time.perf_counter() - start) / len(pages))
+    return best
+
+def main():
+    rng = random.Random(7)
+    legal_lines = load_legal_lines()
+    pages = [make_page(rng, legal_lines) for _ in range(200)]
+    pages += [make_page(rng, legal_lines, 500) for _ in range(100)]  # Short pages and edge cases
+    pages += ["", "\n\n\n\n\n", "ÄÖÜ\n\n\n\n\nDATE: today"]
+
+    service = ExaService.__new__(ExaService)  # No API key needed to clean text
+    mismatches = [i for i, page in enumerate(pages) if service.clean_web_content(page) != legacy_clean_web_content(page)]
+    print(f"Pages: {len(pages)}, identical output: {len(pages) - len(mismatches)}/{len(pages)}")
+    if mismatches:
+        print(f"Mismatched pages: {mismatches[:10]}")
+        sys.exit(1)
+
+    long_pages = pages[:200]
+    avg_chars = sum(len(p) for p in long_pages) / len(long_pages)
+    old = time_per_call(legacy_clean_web_content, long_pages)
+    new = time_per_call(service.clean_web_content, long_pages)
+    print(f"~{avg_chars:,.0f}-character pages:")
+    print(f"  previous: {old * 1e6:8.1f} us/page")
+    print(f"  current:  {new * 1e6:8.1f} us/page  ({old / new:.1f}x faster)")
+
+def legacy_clean_web_content(text: str) -> str:
+    """Previous implementation (per-line any() scans and per-character filters), kept as the reference"""
+    if not text:
+        return ""
+    
+    import re
+    
+    # Common phrases to filter out (case-insensitive)
+    junk_phrases = [
+        "we use cookies",
+        "click here to",
+        "read more",
+        "read less",
+        "by clicking",
+        "cookie policy",
+        "privacy policy",
+        "terms of service",
+        "subscribe",
+        "newsletter",
+        "sign up",
+        "log in",
+        "create account",
+        "view this form",
+        "buy now",
+        "download now",
+        "instant download",
+        "form preview",
+        "related forms",
+        "faq",
+        "more info",
+        "category:",
+        "control #:",
+        "format:",
+        "state:",
+        "us legal forms",
+        "form popularity",
+        # NEW: Filter AI/marketing articles
+        "is not a futuristic concept",
+        "already a part of many",
+        "workplace and will continue",
+        "employers and employees can",
+        "here's how",
+        "expert said",
+        "learn how",
+        "proliferation of artificial",
+        "ensuing expected increase",
+        "could help usher in",
+        "boosts staff well-being",
+        "improving productivity"
+    ]
+    
+    # Lines that START legal sections (preserve these)
+    section_starters = [
+        "date:",
+        "to:",
+        "from:",
+        "re:",
+        "subject:",
+        "dear",
+        "sincerely",
+        "regards",
+        "signature",
+        "notice of",
+        "letter of",
+        "agreement",
+        "hereby"
+    ]
+    
+    lines = text.split('\n')
+    cleaned_lines = []
+    skip_until_legal = False
+    in_legal_section = False
+    
+    for line in lines:
+        line = line.strip()
+        
+        # Skip empty lines (but keep some for structure)
+        if not line:
+            if cleaned_lines and cleaned_lines[-1] != "":  # Don't add multiple blanks
+                cleaned_lines.append("")
+            continue
+        
+        line_lower = line.lower()
+        
+        # Check if this line STARTS a legal section
+        if any(starter in line_lower for starter in section_starters):
+            in_legal_section = True
+            skip_until_legal = False
+            cleaned_lines.append(line)
+            continue
+        
+        # Check if this line starts a non-legal section
+        if any(junk in line_lower for junk in junk_phrases):
+            skip_until_legal = True
+            in_legal_section = False
+            continue
+        
+        # If we're in a non-legal section, look for signs of returning to legal content
+        if skip_until_legal and not in_legal_section:
+            # Legal documents have specific keywords
+            legal_keywords = ['date', 'hereby', 'employee', 'employer', 'termination', 
+                            'notice', 'agreement', 'party', 'witness', 'signature',
+                            'severance', 'cobra', 'insurance', 'benefits', 'pay', 'release']
+            
+            if any(keyword in line_lower for keyword in legal_keywords):
+                skip_until_legal = False
+                in_legal_section = True
+            else:
+                continue
+        
+        # Skip very short lines (likely navigation/UI)
+        if len(line) < 15 and not any(c.isalnum() for c in line):
+            continue
+        
+        # Skip lines that are just URLs or links (but keep [DATE] placeholders)
+        if line.startswith("http"):
+            continue
+        
+        if "[" in line and "](" in line and "http" in line:  # Markdown links with URLs
+            continue
+        
+        # Skip lines that look like article titles/headlines (ALL CAPS, short)
+        if len(line) < 80 and line.isupper() and line.count(' ') < 3:
+            continue
+        
+        # Skip lines with too many symbols (likely metadata)
+        symbol_count = sum(1 for c in line if c in '#@$%^&*~|')
+        if symbol_count > 5:
+            continue
+        
+        # KEEP: Lines with placeholders like [DATE], {{NAME}}, etc
+        if "[" in line and "]" in line:  # Likely placeholder
+            cleaned_lines.append(line)
+            continue
+        
+        # KEEP: Lines that look like legal document content
+        if in_legal_section or any(keyword in line_lower for keyword in 
+                                   ['employee', 'employer', 'date', 'signature', 'hereby', 'notice']):
+            cleaned_lines.append(line)
+            continue
+        
+        # For other lines, accept if reasonably long and contain legal words
+        if len(line) > 40:
+            cleaned_lines.append(line)
+    
+    # Join with paragraph breaks
+    cleaned_text = '\n'.join(cleaned_lines)
+    
+    # Clean up excessive whitespace (but preserve paragraph structure)
+    cleaned_text = re.sub(r'\n{4,}', '\n\n\n', cleaned_text)  # Max 3 blank lines
+    
+    # Remove escape sequences
+    cleaned_text = cleaned_text.replace('\\[', '[').replace('\\]', ']')
+    
+    # Remove random unicode characters
+    cleaned_text = ''.join(c for c in cleaned_text if ord(c) < 128 or c in '\n')
+    
+    return cleaned_text.strip()
+
+
+if __name__ == "__main__":
+    main()
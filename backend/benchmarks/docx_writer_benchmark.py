@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark DocxWriter (direct OOXML) against the python-docx implementation
+1. Checks both produce the same package for the sample outputs, the drafts
+   rendered from stored templates and fixed-seed synthetic drafts: the same
+   parts in the same order, every part byte-identical except
+   word/document.xml, whose body XML must match exactly
+2. Times both writers on drafts of 10, 100 and 1,000 pages (~45 lines each)
+"""
+
+import io
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.docx_generator import DocxGenerator
+from services.docx_writer import docx_writer
+from services.draft_renderer import draft_renderer
+from config import settings
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent.parent / "sample_outputs"
+LINES_PER_PAGE = 45
+
+DRAFT_LINES = [
+    "# LEGAL NOTICE", "## Parties", "### TERMS AND CONDITIONS",
+    "**Date: 12 March 2025**", "**To,**", "**Dear Sir/Madam,**",
+    "The Licensor hereby grants the Licensee a licence to use the premises at Flat 4, Andheri (East), Mumbai.",
+    "- The rent of Rs. 25,000 shall be paid on or before the 5th of every month.",
+    "1. The term of this Agreement is 11 months.", "12. Notice period: 30 days",
+    "A *single* star, **bold** text and **** empty markers", "Tabs\tinside & <angle> brackets",
+    "Contact: +91 98765 43210", "**Yours faithfully,**", "**Asha Rao**", "Unicode: ₹ 5,000 – naïve café",
+]
+
+def synthetic_draft(rng, lines):
+    return "\n".join(rng.choice(DRAFT_LINES) for _ in range(lines))
+
+def sample_drafts():
+    drafts = [path.read_text(encoding="utf-8") for path in sorted(SAMPLE_DIR.glob("*.md"))]
+    try:
+        # Read-only: the benchmark must not migrate the checked-in database
+        db_path = settings.DATABASE_URL.removeprefix("sqlite:///")
+        db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            drafts += [draft_renderer.render(body_md, {}) for (body_md,) in db.execute("SELECT body_md FROM templates ORDER BY rowid")]
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Skipping stored templates ({e})")
+    return drafts
+
+def python_docx_bytes(markdown_text):
+    with tempfile.NamedTemporaryFile(suffix=".docx") as f:
+        DocxGenerator.markdown_to_docx_python_docx(markdown_text, f.name)
+        return Path(f.name).read_bytes()
+
+def ooxml_bytes(markdown_text):
+    buffer = io.BytesIO()
+    docx_writer.write(DocxGenerator.clean_markdown_for_docx(markdown_text).split("\n"), buffer)
+    return buffer.getvalue()
+
+def same_package(expected, actual):
+    with zipfile.ZipFile(io.BytesIO(expected)) as a, zipfile.ZipFile(io.BytesIO(actual)) as b:
+        if b.testzip() is not None or a.namelist() != b.namelist():
+            return False
+        return all(a.read(name) == b.read(name) for name in a.namelist())
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rng = random.Random(5)
+    drafts = sample_drafts() + [synthetic_draft(rng, rng.randint(1, 300)) for _ in range(30)]
+    mismatches = [i for i, draft in enumerate(drafts) if not same_package(python_docx_bytes(draft), ooxml_bytes(draft))]
+    print(f"Drafts: {len(drafts)}, identical packages: {len(drafts) - len(mismatches)}/{len(drafts)}")
+    if mismatches:
+        print(f"Mismatched drafts: {mismatches[:10]}")
+        sys.exit(1)
+
+    for pages in (10, 100, 1000):
+        draft = synthetic_draft(rng, pages * LINES_PER_PAGE)
+        repeat = 3 if pages < 1000 else 1
+        old = best_time(lambda: python_docx_bytes(draft), repeat)
+        new = best_time(lambda: ooxml_bytes(draft), repeat)
+        print(f"{pages:>5,} pages: python-docx {old * 1e3:9.1f} ms, ooxml {new * 1e3:7.1f} ms ({old / new:.0f}x faster)")
+
+if __name__ == "__main__":
+    main()
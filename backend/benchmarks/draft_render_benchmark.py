@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark incremental draft re-rendering (DraftRenderer.render_instance)
+1. Applies a fixed-seed sequence of answer edits to long synthetic contracts
+   (single and multi-variable edits, cleared answers, values with line
+   breaks, HTML comments, tracking codes) and checks every incremental
+   render equals a full render of the same answers
+2. Times a full render vs. re-rendering after a single-variable edit on
+   contracts of 1k-20k lines
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.draft_renderer import DraftRenderer
+
+# "{{*}}" is replaced by a random variable per occurrence
+CLAUSE_LINES = [
+    "1. The {{party}} shall pay the {{*}} a sum of Rs. {{amount}} on or before {{date}}.",
+    "The parties agree that this Agreement is governed by the laws of {{*}}.",
+    "NOTICES:",
+    "- Address: {{*}}",
+    "Date: {{date}}",
+    "Dear {{*}},",
+    "Any dispute shall be referred to arbitration at {{*}} under the Arbitration Act.",
+    "{{*}}",
+    "",
+    "Yours faithfully,",
+    "<!-- UOIONHHC -->",
+]
+FIXED_KEYS = ["party", "amount", "date", "signatory"]
+
+def make_body(rng, line_count, key_count):
+    keys = [f"var_{i}" for i in range(key_count)]
+    lines = ["---", "template_id: bench", "---", "DEED OF AGREEMENT"]
+    for _ in range(line_count):
+        parts = rng.choice(CLAUSE_LINES).split("{{*}}")
+        lines.append("".join(part + "{{" + rng.choice(keys) + "}}" for part in parts[:-1]) + parts[-1])
+    lines += ["", "{{signatory}}", "Email: {{*}}".replace("{{*}}", "{{" + keys[0] + "}}")]
+    return "\n".join(lines), keys + FIXED_KEYS
+
+def random_value(rng):
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    if roll < 0.08:
+        return "line one\nline two"
+    if roll < 0.1:
+        return "<!-- note -->"
+    if roll < 0.12:
+        return "UOIONHHC"
+    if roll < 0.15:
+        return "PART A:"
+    if roll < 0.2:
+        return rng.randint(1, 10**6)
+    return rng.choice(["Asha Rao", "Mumbai", "12 March 2025", "25,000", "India"]) + f" {rng.randint(0, 99)}"
+
+def check_equivalence(rng):
+    checked = 0
+    for _ in range(20):
+        renderer = DraftRenderer()
+        body, keys = make_body(rng, rng.randint(5, 200), rng.randint(1, 30))
+        answers = {key: random_value(rng) for key in keys if rng.random() < 0.7}
+        for _ in range(30):
+            for key in rng.sample(keys, rng.choice([1, 1, 1, 2, 5])):
+                answers[key] = random_value(rng)
+            if renderer.render_instance("bench", body, answers) != renderer.render(body, answers):
+                print(f"Mismatch after {checked} renders")
+                sys.exit(1)
+            checked += 1
+    return checked
+
+def best_time(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rng = random.Random(11)
+    print(f"Incremental renders identical to full renders: {check_equivalence(rng)}")
+
+    for line_count in (1_000, 5_000, 20_000):
+        body, keys = make_body(rng, line_count, 200)
+        answers = {key: f"value {key}" for key in keys}
+        renderer = DraftRenderer()
+        renderer.render_instance("bench", body, answers)
+
+        full = best_time(lambda: renderer.render(body, answers))
+        counter = iter(range(10**9))
+        def edit_one():
+            answers["var_7"] = str(next(counter))  # Used on ~0.3% of lines
+            renderer.render_instance("bench", body, answers)
+        incremental = best_time(edit_one, repeat=20)
+        print(f"{line_count:>6,} lines: full render {full * 1e3:7.2f} ms, "
+              f"single-variable edit {incremental * 1e3:6.3f} ms ({full / incremental:.0f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark embedding providers for template matching
+Measures:
+1. Per-query latency (p50/p95)
+2. Batched indexing throughput
+3. Recall@1 and recall@3 on a labelled set of catalogue queries
+
+The local provider always runs. The remote Gemini provider only runs with
+--remote and a configured GEMINI_API_KEY (it uses API quota).
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from services.embedding_providers import GeminiEmbeddingProvider, HashingEmbeddingProvider
+from services.embedding_service import EmbeddingService
+
+# (template_id, title, doc_type, jurisdiction, similarity_tags)
+CATALOGUE = [
+    ("tpl_motor_insurance_notice", "Notice to Insurer - Motor Accident", "Notice to Insurer", "India", ["insurance", "notice", "motor", "accident", "claim"]),
+    ("tpl_health_insurance_claim", "Health Insurance Claim Letter", "Insurance Claim", "India", ["insurance", "health", "hospital", "claim"]),
+    ("tpl_rental_agreement", "Residential Rental Agreement", "Rental Agreement", "India", ["rent", "lease", "tenant", "landlord", "property"]),
+    ("tpl_commercial_lease", "Commercial Lease Deed", "Lease Deed", "India", ["lease", "commercial", "office", "premises"]),
+    ("tpl_employment_contract", "Employment Contract", "Employment Agreement", "India", ["employment", "employee", "salary", "contract"]),
+    ("tpl_termination_letter", "Employee Termination Letter", "Termination Letter", "USA", ["termination", "employee", "dismissal", "hr"]),
+    ("tpl_nda", "Mutual Non-Disclosure Agreement", "NDA", "USA", ["confidentiality", "nda", "non-disclosure", "trade secrets"]),
+    ("tpl_legal_notice_cheque", "Legal Notice for Cheque Bounce", "Legal Notice", "India", ["cheque", "bounce", "section 138", "negotiable instruments"]),
+    ("tpl_power_of_attorney", "General Power of Attorney", "Power of Attorney", "India", ["attorney", "authorization", "agent", "property"]),
+    ("tpl_sale_deed", "Property Sale Deed", "Sale Deed", "India", ["sale", "property", "buyer", "seller", "conveyance"]),
+    ("tpl_consumer_complaint", "Consumer Complaint to District Forum", "Consumer Complaint", "India", ["consumer", "complaint", "deficiency", "service"]),
+    ("tpl_service_agreement", "Freelance Service Agreement", "Service Agreement", "USA", ["services", "freelance", "contractor", "payment"]),
+]
+
+# (query, expected template_id)
+QUERIES = [
+    ("Draft a notice to my insurance company about a car accident in Delhi", "tpl_motor_insurance_notice"),
+    ("I need to claim hospital expenses from my health insurer", "tpl_health_insurance_claim"),
+    ("rent agreement for my flat with a new tenant", "tpl_rental_agreement"),
+    ("lease for an office space for five years", "tpl_commercial_lease"),
+    ("employment contract for a software engineer with monthly salary", "tpl_employment_contract"),
+    ("letter firing an employee for misconduct", "tpl_termination_letter"),
+    ("confidentiality agreement before sharing trade secrets", "tpl_nda"),
+    ("legal notice because the cheque I received bounced", "tpl_legal_notice_cheque"),
+    ("authorize my brother to manage my property as my attorney", "tpl_power_of_attorney"),
+    ("deed for selling my house to a buyer", "tpl_sale_deed"),
+    ("complaint against a company for deficient service to consumer forum", "tpl_consumer_complaint"),
+    ("contract with a freelance designer for services and payment", "tpl_service_agreement"),
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def benchmark_provider(provider, repeats: int):
+    service = EmbeddingService(provider)
+    texts = [service.template_embedding_text(title, doc_type, jurisdiction, tags) for _, title, doc_type, jurisdiction, tags in CATALOGUE]
+
+    start = time.perf_counter()
+    vectors = service.generate_document_embeddings(texts)
+    index_seconds = time.perf_counter() - start
+
+    candidates = [(entry[0], vector) for entry, vector in zip(CATALOGUE, vectors)]
+
+    latencies = []
+    hits_at_1 = 0
+    hits_at_3 = 0
+    for _ in range(repeats):
+        for query, expected in QUERIES:
+            start = time.perf_counter()
+            query_vector = service.generate_query_embedding(query)
+            ranked = service.find_most_similar(query_vector, candidates, top_k=3)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            ranked_ids = [template_id for template_id, _ in ranked]
+            hits_at_1 += ranked_ids[:1] == [expected]
+            hits_at_3 += expected in ranked_ids
+
+    total = len(QUERIES) * repeats
+    return {
+        "model": provider.model_id,
+        "index_ms": index_seconds * 1000,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "recall_at_1": hits_at_1 / total,
+        "recall_at_3": hits_at_3 / total,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--remote", action="store_true", help="Also benchmark the Gemini embedding API")
+    parser.add_argument("--repeats", type=int, default=20, help="Times to repeat the local query set")
+    args = parser.parse_args()
+
+    providers = [(HashingEmbeddingProvider(), args.repeats)]
+    if args.remote:
+        if not settings.GEMINI_API_KEY:
+            print("❌ GEMINI_API_KEY not configured - skipping remote provider")
+        else:
+            providers.append((GeminiEmbeddingProvider(), 1))
+
+    print(f"{'model':<32} {'index ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'R@1':>6} {'R@3':>6}")
+    print("-" * 74)
+    for provider, repeats in providers:
+        result = benchmark_provider(provider, repeats)
+        print(
+            f"{result['model']:<32} {result['index_ms']:>9.1f} {result['p50_ms']:>8.2f} "
+            f"{result['p95_ms']:>8.2f} {result['recall_at_1']:>6.2f} {result['recall_at_3']:>6.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
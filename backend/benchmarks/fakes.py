@@ -0,0 +1,246 @@
+"""
+Deterministic offline stand-ins for the Gemini and Exa API clients
+
+The fakes replace the SDK clients behind the real GeminiService and
+ExaService, so prompts, schemas, JSON parsing, retries and metrics run
+exactly as in production; only the network round trip is simulated.
+Each call sleeps for a latency drawn from a seeded log-normal
+distribution and returns a canned response derived from the prompt:
+
+- variable extraction: dates, amounts, reference numbers and {{placeholders}} in the chunk
+- classification: the first candidate template
+- questions / prefill: one entry per variable key listed in the prompt
+- embeddings: the local hashed n-gram model
+- Exa search / contents: a fixed set of legal template pages
+
+Usage:
+    from benchmarks.fakes import install_fakes, LatencyModel
+    install_fakes(gemini_latency=LatencyModel(800, 4000, seed=1))
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from services.embedding_providers import HashingEmbeddingProvider
+
+# 99th percentile of the standard normal distribution
+Z_99 = 2.326
+
+class LatencyModel:
+    """Log-normal latency with a given median and 99th percentile, in milliseconds
+
+    ``time_scale`` shrinks every delay by a constant factor so CI runs stay
+    short while keeping the shape of the distribution.
+    """
+
+    def __init__(self, median_ms: float, p99_ms: float, seed: int = 0, time_scale: float = 1.0):
+        self.median_ms = median_ms
+        self.sigma = math.log(max(p99_ms, median_ms) / median_ms) / Z_99 if median_ms > 0 else 0.0
+        self.time_scale = time_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ms(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        with self._lock:
+            return self._random.lognormvariate(math.log(self.median_ms), self.sigma)
+
+    def sleep(self):
+        delay = self.sample_ms() * self.time_scale / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+NO_LATENCY = LatencyModel(0, 0)
+
+ENTITY_PATTERNS = [
+    ("date", re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{1,2}(?:st|nd|rd|th)?\s+[A-Z][a-z]+,?\s+\d{4}\b")),
+    ("amount", re.compile(r"(?:Rs\.?|INR|₹|\$)\s?[\d,]+(?:\.\d+)?")),
+    ("reference_number", re.compile(r"\b[A-Z]{2,}[-/]?\d{3,}[\w/-]*\b")),
+    ("placeholder", re.compile(r"\{\{\s*\w+\s*\}\}")),  # Web templates after placeholder conversion
+]
+
+def _first_json_array(text: str) -> List[Any]:
+    """The first JSON array starting at the beginning of a line"""
+    match = re.search(r"^\[", text, re.M)
+    if not match:
+        return []
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, match.start())
+    except json.JSONDecodeError:
+        return []
+    return value if isinstance(value, list) else []
+
+def _variables_for(text: str, limit: int = 12) -> List[Dict[str, Any]]:
+    variables, seen = [], set()
+    for kind, pattern in ENTITY_PATTERNS:
+        for value in pattern.findall(text):
+            if value in seen or len(variables) >= limit:
+                continue
+            seen.add(value)
+            index = sum(1 for v in variables if v["dtype"] == kind) + 1
+            variables.append({
+                "key": f"{kind}_{index}",
+                "label": f"{kind.replace('_', ' ').title()} {index}",
+                "description": f"{kind.replace('_', ' ')} mentioned in the document",
+                "example": value,
+                "required": True,
+                "dtype": kind
+            })
+    return variables
+
+class FakeGeminiModels:
+    """Stand-in for ``genai.Client().models``"""
+
+    def __init__(self, latency: LatencyModel, embed_latency: LatencyModel = NO_LATENCY, stream_chunks: int = 4):
+        self.latency = latency
+        self.embed_latency = embed_latency
+        self.stream_chunks = stream_chunks
+        self.embedder = HashingEmbeddingProvider(768)
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def _respond(self, contents: str, config: Any) -> Dict[str, Any]:
+        schema = getattr(config, "response_schema", None) or {}
+        properties = set((schema.get("properties") or {}).keys())
+
+        if "variables" in properties:
+            self._count("extract_variables")
+            variables = _variables_for(contents)
+            return {
+                "variables": variables,
+                "similarity_tags": ["agreement", "notice", "india"],
+                "doc_type": "Agreement",
+                "jurisdiction": "India"
+            }
+        if "best_match_id" in properties:
+            self._count("classify")
+            candidates = _first_json_array(contents)
+            ids = [c.get("template_id") for c in candidates if isinstance(c, dict)]
+            return {
+                "best_match_id": ids[0] if ids else "none",
+                "confidence": 0.9 if ids else 0.0,
+                "justification": "Closest candidate by document type",
+                "alternatives": ids[1:3]
+            }
+        if "questions" in properties:
+            self._count("questions")
+            keys = [v.get("key") for v in _first_json_array(contents) if isinstance(v, dict)]
+            return {"questions": [
+                {"variable_key": key, "question": f"What is the {key.replace('_', ' ')}?", "format_hint": None}
+                for key in keys
+            ]}
+        if "filled_variables" in properties:
+            self._count("prefill")
+            keys = [v.get("key") for v in _first_json_array(contents) if isinstance(v, dict)]
+            return {"filled_variables": [{"key": key, "value": None} for key in keys[:1]]}
+
+        # Untyped calls made by the web bootstrap flow
+        if "TEMPLATE TITLE" in contents:
+            self._count("web_template_extraction")
+            return {"template": WEB_TEMPLATE_TEXT}
+        self._count("search_terms")
+        return {"search_terms": ["legal", "agreement", "template"]}
+
+    @staticmethod
+    def _usage(contents: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(prompt_token_count=len(contents) // 4, candidates_token_count=len(text) // 4)
+
+    def generate_content(self, model: str, contents: str, config: Any = None):
+        self.latency.sleep()
+        text = json.dumps(self._respond(contents, config))
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, text))
+
+    def generate_content_stream(self, model: str, contents: str, config: Any = None):
+        text = json.dumps(self._respond(contents, config))
+        size = max(1, math.ceil(len(text) / self.stream_chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+        def chunks():
+            for i, piece in enumerate(pieces):
+                # Time to first token, then the rest of the response spread over the chunks
+                time.sleep(self.latency.sample_ms() * self.latency.time_scale / 1000 / len(pieces))
+                usage = self._usage(contents, text) if i == len(pieces) - 1 else None
+                yield SimpleNamespace(text=piece, usage_metadata=usage)
+
+        return chunks()
+
+    def embed_content(self, model: str, contents: Any):
+        self.embed_latency.sleep()
+        self._count("embed")
+        texts = contents if isinstance(contents, list) else [contents]
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=v) for v in self.embedder.embed(texts)])
+
+WEB_TEMPLATE_TEXT = """RENT AGREEMENT
+
+This Rent Agreement is made at [CITY] on [DATE] between [LANDLORD NAME], hereinafter
+called the Landlord, and [TENANT NAME], hereinafter called the Tenant.
+
+1. The Landlord agrees to let the premises at [PROPERTY ADDRESS] to the Tenant for a
+period of eleven months commencing from [START DATE].
+2. The monthly rent shall be Rs. [MONTHLY RENT], payable on or before the fifth day of
+each month, and the Tenant has paid a security deposit of Rs. [DEPOSIT AMOUNT].
+3. Either party may terminate this agreement by giving one month's notice in writing.
+
+IN WITNESS WHEREOF the parties have signed this agreement on the date first written above.
+
+Landlord: ____________            Tenant: ____________
+"""
+
+class FakeExaClient:
+    """Stand-in for ``exa_py.Exa``"""
+
+    def __init__(self, latency: LatencyModel, num_documents: int = 5):
+        self.latency = latency
+        self.documents = [
+            SimpleNamespace(
+                id=f"fake-doc-{i}",
+                title=f"Rent Agreement Template {i}",
+                url=f"https://templates.example.com/rent-agreement-{i}",
+                text=WEB_TEMPLATE_TEXT,
+                highlights=[],
+                published_date=None
+            )
+            for i in range(num_documents)
+        ]
+
+    def search_and_contents(self, query: str, num_results: int = 5, **options):
+        self.latency.sleep()
+        return SimpleNamespace(results=self.documents[:num_results])
+
+    def get_contents(self, ids: List[str], **options):
+        self.latency.sleep()
+        return SimpleNamespace(results=[d for d in self.documents if d.id in ids or d.url in ids])
+
+def install_fakes(
+    gemini_latency: LatencyModel = NO_LATENCY,
+    embed_latency: LatencyModel = NO_LATENCY,
+    exa_latency: Optional[LatencyModel] = NO_LATENCY
+) -> SimpleNamespace:
+    """Point the service singletons at fake clients
+
+    Returns the fakes so callers can inspect call counts. Exa is only
+    replaced when the service is configured (EXA_API_KEY set).
+    """
+    from services.gemini_service import gemini_service
+    from services.exa_service import exa_service
+
+    models = FakeGeminiModels(gemini_latency, embed_latency)
+    gemini_service._client = SimpleNamespace(models=models)
+
+    exa = None
+    if exa_service and exa_latency is not None:
+        exa = FakeExaClient(exa_latency)
+        exa_service._client = exa
+
+    return SimpleNamespace(gemini=models, exa=exa)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Load benchmark of the drafting pipeline with fake Gemini and Exa clients
+Drives the API in-process (httpx ASGI transport, no sockets) through:
+1. POST /api/upload          (freshly generated DOCX files, so nothing is deduplicated)
+2. POST /api/extract         (one per uploaded document)
+3. GET  /api/templates
+4. POST /api/draft           (distinct queries, so the match cache only hits on repeats)
+5. POST /api/draft/finalize  (one per created draft instance)
+6. POST /api/web/search      (optional, --endpoints ...,web_search)
+
+After one untimed warm-up request (skip with --cold), each phase sends --requests requests with at most --concurrency in flight and
+reports p50/p95/p99/max latency, errors and throughput per endpoint. API calls
+are served by benchmarks/fakes.py with seeded log-normal latencies, so runs are
+offline, repeatable and free. The database and catalogue snapshot are copied to
+a temporary directory; the working database is never modified.
+
+For CI, shrink the simulated latencies with --time-scale and set --max-p95-ms
+to fail the run (exit code 1) when any endpoint regresses or returns errors:
+
+    python benchmarks/load_benchmark.py --requests 40 --concurrency 8 --time-scale 0.05 --max-p95-ms 500
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_ENDPOINTS = ["upload", "extract", "templates", "draft", "finalize"]
+
+QUERIES = [
+    "rent agreement for a 2BHK flat in Pune starting {day} March 2025",
+    "notice to insurer about a car accident on {day} July 2025",
+    "employment contract for a software engineer joining on {day} June 2025",
+    "leave and licence agreement for a shop, deposit Rs. {amount}",
+    "termination letter for an employee, last working day {day} August 2025",
+]
+
+def isolate_environment(workdir: Path, embedding_provider: str):
+    """Point the app at a copy of the database and placeholder API keys
+
+    Must run before any backend module is imported, since Settings reads the
+    environment at import time.
+    """
+    source_db = BACKEND_DIR / "legal_templates.db"
+    target_db = workdir / "benchmark.db"
+    if source_db.exists():
+        shutil.copy(source_db, target_db)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{target_db}"
+    os.environ["CATALOGUE_SNAPSHOT_DIR"] = str(workdir / "catalogue_snapshot")
+    # Placeholders only: the SDK clients are replaced before any request is sent
+    os.environ["GEMINI_API_KEY"] = "offline-benchmark"
+    os.environ["EXA_API_KEY"] = "offline-benchmark"
+    os.environ["EMBEDDING_PROVIDER"] = embedding_provider
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+def make_docx(index: int) -> bytes:
+    """A small agreement with values unique to this request"""
+    import docx
+
+    document = docx.Document()
+    document.add_heading("LEAVE AND LICENCE AGREEMENT", level=1)
+    document.add_paragraph(
+        f"This agreement is made on {index % 28 + 1:02d}/03/2025 between Mr. Anil Sharma "
+        f"(Licensor) and Ms. Priya Nair (Licensee) for the premises at Flat {index}, "
+        f"Shanti Apartments, Baner, Pune."
+    )
+    document.add_paragraph(
+        f"The licence fee shall be Rs. {20000 + index * 10:,} per month and the interest-free "
+        f"security deposit shall be Rs. {100000 + index * 100:,}. Agreement reference LLA-{1000 + index}."
+    )
+    document.add_paragraph(
+        "The licence is for a period of eleven months. Either party may terminate it by "
+        "giving one month's written notice."
+    )
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+async def run_phase(name, make_request, count, concurrency):
+    """Send ``count`` requests with bounded concurrency; returns stats and successful responses"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, responses = [], [], []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            finally:
+                latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors.append(f"HTTP {response.status_code}: {response.text[:120]}")
+            else:
+                responses.append(response.json())
+
+    phase_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - phase_start
+
+    latencies.sort()
+    stats = {
+        "endpoint": name,
+        "requests": count,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0) * 1000,
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "sample_error": errors[0] if errors else None,
+    }
+    return stats, responses
+
+async def warm_up(client, index):
+    """One untimed upload and draft, so lazy imports and first-use setup are not measured"""
+    await client.post("/api/upload", files={"file": ("warm_up.docx", make_docx(index),
+                      "application/vnd.openxmlformats-officedocument.wordprocessingml.document")})
+    await client.post("/api/draft", json={"user_query": "warm-up request for a rental agreement"})
+
+async def run(args, fakes_latency):
+    import httpx
+    import main
+    from benchmarks.fakes import install_fakes
+
+    results = []
+    # Before startup, so the embedding index is built through the fakes too
+    fakes = install_fakes(*fakes_latency)
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            documents = [make_docx(i) for i in range(args.requests)]
+            document_ids, instance_ids = [], []
+            n = args.requests
+            if not args.cold:
+                await warm_up(client, n)
+
+            phases = {
+                "upload": lambda i: client.post(
+                    "/api/upload",
+                    files={"file": (f"agreement_{i}.docx", documents[i],
+                                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document")}
+                ),
+                "extract": lambda i: client.post("/api/extract", json={
+                    "document_id": document_ids[i % len(document_ids)],
+                    "title": f"Leave and Licence Agreement {i}"
+                }),
+                "templates": lambda i: client.get("/api/templates"),
+                "draft": lambda i: client.post("/api/draft", json={
+                    "user_query": QUERIES[i % len(QUERIES)].format(day=i % 28 + 1, amount=f"{50000 + i * 1000:,}")
+                }),
+                "finalize": lambda i: client.post("/api/draft/finalize", json={
+                    "instance_id": instance_ids[i % len(instance_ids)],
+                    "answers": {"date_1": "01/04/2025", "amount_1": f"Rs. {25000 + i:,}"}
+                }),
+                "web_search": lambda i: client.post("/api/web/search", json={
+                    "query": QUERIES[i % len(QUERIES)].format(day=i % 28 + 1, amount="50,000"),
+                    "num_results": 3
+                }),
+            }
+
+            for name in args.endpoints:
+                if name == "extract" and not document_ids:
+                    document_ids = [r["document_id"] for r in (await run_phase("upload", phases["upload"], n, args.concurrency))[1]]
+                if name == "finalize" and not instance_ids:
+                    instance_ids = [r["instance_id"] for r in (await run_phase("draft", phases["draft"], n, args.concurrency))[1]]
+                if (name == "extract" and not document_ids) or (name == "finalize" and not instance_ids):
+                    results.append({"endpoint": name, "requests": 0, "errors": n, "sample_error": "no inputs from previous phase"})
+                    continue
+
+                stats, responses = await run_phase(name, phases[name], n, args.concurrency)
+                results.append(stats)
+                if name == "upload":
+                    document_ids = [r["document_id"] for r in responses]
+                elif name == "draft":
+                    instance_ids = [r["instance_id"] for r in responses]
+
+        fake_calls = dict(sorted(fakes.gemini.calls.items()))
+    return results, fake_calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="Maximum requests in flight")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS),
+                        help="Comma-separated phases: upload, extract, templates, draft, finalize, web_search")
+    parser.add_argument("--gemini-median-ms", type=float, default=900)
+    parser.add_argument("--gemini-p99-ms", type=float, default=4000)
+    parser.add_argument("--embed-median-ms", type=float, default=120)
+    parser.add_argument("--embed-p99-ms", type=float, default=600)
+    parser.add_argument("--exa-median-ms", type=float, default=700)
+    parser.add_argument("--exa-p99-ms", type=float, default=3000)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every simulated latency")
+    parser.add_argument("--embedding-provider", default="gemini", choices=["gemini", "local"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cold", action="store_true", help="Skip the warm-up and include first-use costs")
+    parser.add_argument("--json", dest="json_path", help="Also write the results as JSON to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit with status 1 if any endpoint exceeds this p95")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+
+    workdir = Path(tempfile.mkdtemp(prefix="load_benchmark_"))
+    try:
+        isolate_environment(workdir, args.embedding_provider)
+        from benchmarks.fakes import LatencyModel
+
+        fakes_latency = (
+            LatencyModel(args.gemini_median_ms, args.gemini_p99_ms, args.seed, args.time_scale),
+            LatencyModel(args.embed_median_ms, args.embed_p99_ms, args.seed + 1, args.time_scale),
+            LatencyModel(args.exa_median_ms, args.exa_p99_ms, args.seed + 2, args.time_scale),
+        )
+        results, fake_calls = asyncio.run(run(args, fakes_latency))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, "
+          f"Gemini median {args.gemini_median_ms:.0f} ms x{args.time_scale}")
+    print(f"{'endpoint':<12} {'reqs':>5} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}")
+    print("-" * 74)
+    for r in results:
+        if not r["requests"]:
+            print(f"{r['endpoint']:<12} skipped: {r['sample_error']}")
+            continue
+        print(f"{r['endpoint']:<12} {r['requests']:>5} {r['errors']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['throughput_rps']:>8.1f}")
+    for r in results:
+        if r.get("sample_error"):
+            print(f"  {r['endpoint']}: {r['sample_error']}")
+    print(f"Fake API calls: {fake_calls}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"config": vars(args), "results": results, "fake_calls": fake_calls}, f, indent=2)
+
+    if args.max_p95_ms is not None:
+        failed = [r for r in results if r["errors"] or r.get("p95_ms", 0) > args.max_p95_ms]
+        if failed:
+            print(f"FAILED: {', '.join(r['endpoint'] for r in failed)} over {args.max_p95_ms:.0f} ms p95 or with errors")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
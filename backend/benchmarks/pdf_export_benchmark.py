@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF export throughput
+1. Renders a batch of distinct synthetic drafts one after another in this
+   process (what an API worker would do inline)
+2. Renders the same batch through PdfExporter with 1, 2 and 4 worker
+   processes, submitted at once as the bulk export endpoint does
+3. Times a repeated export of an unchanged draft (artifact cache hit)
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.artifact_store import ArtifactStore
+from services.pdf_export import PdfExporter
+from services.pdf_generator import PdfGenerator
+
+DRAFT_LINES = [
+    "# LEGAL NOTICE", "## Parties", "### TERMS AND CONDITIONS",
+    "**Date: 12 March 2025**", "**To,**", "**Dear Sir/Madam,**",
+    "The Licensor hereby grants the Licensee a licence to use the premises at Flat 4, Andheri (East), Mumbai, "
+    "subject to the terms and conditions set out in this Agreement and the schedules annexed hereto.",
+    "- The rent of Rs. 25,000 shall be paid on or before the 5th of every month.",
+    "1. The term of this Agreement is 11 months.", "", "Unicode: ₹ 5,000 – naïve café",
+    "**Yours faithfully,**",
+]
+LINES_PER_PAGE = 30
+
+def synthetic_draft(rng, pages, index):
+    lines = [f"# DRAFT {index}"] + [rng.choice(DRAFT_LINES) for _ in range(pages * LINES_PER_PAGE)]
+    return "\n".join(lines)
+
+def serial(drafts, directory):
+    start = time.perf_counter()
+    for i, draft in enumerate(drafts):
+        PdfGenerator.markdown_to_pdf(draft, str(Path(directory) / f"serial-{i}.pdf"))
+    return time.perf_counter() - start
+
+def pooled(drafts, directory, workers):
+    exporter = PdfExporter(workers=workers, max_pending=len(drafts), store=ArtifactStore(directory, max_bytes=1 << 40))
+    try:
+        # Start the worker processes outside the timed region
+        exporter.submit("# warm-up").result()
+        start = time.perf_counter()
+        futures = [exporter.submit(draft) for draft in drafts]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exporter.submit(drafts[0]).result()
+        return elapsed, time.perf_counter() - start
+    finally:
+        exporter.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drafts", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    drafts = [synthetic_draft(rng, args.pages, i) for i in range(args.drafts)]
+    pages = args.drafts * args.pages
+
+    with tempfile.TemporaryDirectory() as directory:
+        elapsed = serial(drafts, directory)
+        print(f"{'in-process':>12}: {elapsed:6.2f} s, {args.drafts / elapsed:5.1f} drafts/s, {pages / elapsed:6.1f} pages/s")
+        baseline = elapsed
+        for workers in (1, 2, 4):
+            with tempfile.TemporaryDirectory() as store_dir:
+                elapsed, hit = pooled(drafts, store_dir, workers)
+            print(f"{f'{workers} workers':>12}: {elapsed:6.2f} s, {args.drafts / elapsed:5.1f} drafts/s, "
+                  f"{pages / elapsed:6.1f} pages/s ({baseline / elapsed:.1f}x), cache hit {hit * 1e3:.2f} ms")
+
+if __name__ == "__main__":
+    main()
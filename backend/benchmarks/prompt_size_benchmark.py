@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt sizes for the variable-list LLM calls
+Compares approximate input tokens of the previous prompts (indented JSON
+with every variable field) against the PromptBuilder versions for:
+1. Question generation for all variables of each stored template
+2. Pre-fill value extraction from a user query
+3. The previously-found-variables hint on the last extraction chunk
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from services.chunking import estimate_tokens
+from services.gemini_service import GeminiService
+from services.question_generator import QuestionGenerator
+from services.prompt_builder import PromptBuilder, extraction_hint_builder
+
+LEGACY_QUESTION_FORMAT = """Generate friendly questions. Return JSON:
+{
+  "questions": [
+    {
+      "variable_key": "policy_number",
+      "question": "What is the insurance policy number exactly as it appears on the policy schedule?",
+      "format_hint": "Example: 302786965"
+    }
+  ]
+}"""
+
+QUERY = "Draft a notice to the insurer about the car accident on 12 July 2025 for Rajesh Kumar"
+
+def template_variables(db_path):
+    """(title, variables) of each stored template, read without migrating the database"""
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for template_id, title in db.execute("SELECT id, title FROM templates ORDER BY rowid").fetchall():
+            rows = db.execute(
+                'SELECT "key", label, description, example, required, dtype FROM template_variables '
+                "WHERE template_id = ? ORDER BY rowid",
+                (template_id,)
+            ).fetchall()
+            yield title, [
+                {
+                    "key": key,
+                    "label": label,
+                    "description": description,
+                    "example": example,
+                    "required": None if required is None else bool(required),
+                    "dtype": dtype
+                }
+                for key, label, description, example, required, dtype in rows
+            ]
+    finally:
+        db.close()
+
+def main():
+    templates = list(template_variables(settings.DATABASE_URL.removeprefix("sqlite:///")))
+
+    print(f"{'template':<40} {'call':<18} {'vars':>5} {'before':>8} {'after':>8} {'saved':>6}")
+    print("-" * 90)
+    totals = [0, 0]
+    for title, variables in templates:
+        if not variables:
+            continue
+        legacy_variables = json.dumps(variables, indent=2)
+        hint = [{"key": v["key"], "label": v["label"]} for v in variables]
+
+        system_prompt, user_prompt, _ = QuestionGenerator._question_prompts(variables)
+        rows = [
+            (
+                "questions",
+                estimate_tokens(system_prompt)
+                + estimate_tokens(f"Missing variables:\n{legacy_variables}\n\n{LEGACY_QUESTION_FORMAT}"),
+                estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+            ),
+            (
+                "prefill variables",
+                estimate_tokens(legacy_variables),
+                estimate_tokens(PromptBuilder().fit(variables, PromptBuilder.PREFILL_FIELDS, QUERY)[0])
+            ),
+            (
+                "extraction hint",
+                estimate_tokens(json.dumps(hint, indent=2)),
+                estimate_tokens(extraction_hint_builder.fit(hint, PromptBuilder.EXTRACTION_HINT_FIELDS)[0])
+            ),
+        ]
+        for call, before, after in rows:
+            totals[0] += before
+            totals[1] += after
+            print(f"{title[:40]:<40} {call:<18} {len(variables):>5} {before:>8} {after:>8} {1 - after / before:>6.0%}")
+
+    # The extraction output example is part of every chunk's prompt
+    _, user_prompt = GeminiService._extract_variables_prompts("")
+    print()
+    print(f"Extraction prompt without document text: {estimate_tokens(user_prompt)} tokens")
+    print(f"Total approximate input tokens: {totals[0]} -> {totals[1]} ({1 - totals[1] / totals[0]:.0%} saved)")
+
+if __name__ == "__main__":
+    main()
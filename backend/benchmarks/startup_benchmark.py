@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark API cold start (import of main.py)
+1. Runs `python -X importtime -c "import main"` in fresh interpreters and
+   reports the median total import time
+2. Repeats with the heavy optional dependencies imported up front, which is
+   what importing main used to cost
+3. Lists which heavy modules `import main` loads and the slowest imports
+
+No API keys are needed: clients are created on first use.
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["docx", "PyPDF2", "pdfplumber", "scipy", "google.genai", "exa_py"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def run_importtime(code: str):
+    env = dict(os.environ, GEMINI_API_KEY="", EXA_API_KEY="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))  # Cumulative microseconds
+    top_level = sum(
+        int(m.group(2)) for m in map(IMPORTTIME_LINE.match, result.stderr.splitlines())
+        if m and len(m.group(3)) == 1
+    )
+    return top_level / 1000, modules, result.stdout.strip()
+
+def median_ms(code: str, runs: int):
+    return statistics.median(run_importtime(code)[0] for _ in range(runs))
+
+def main(runs: int = 5):
+    lazy_code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    eager_code = "import " + ", ".join(
+        m for m in HEAVY_MODULES if m != "scipy"
+    ) + ", scipy.spatial.distance, main"
+
+    lazy = median_ms(lazy_code, runs)
+    eager = median_ms(eager_code, runs)
+    _, modules, loaded = run_importtime(lazy_code)
+
+    print(f"Median import time over {runs} fresh interpreters")
+    print("-" * 60)
+    print(f"import main (lazy dependencies):    {lazy:8.1f} ms")
+    print(f"import main + heavy dependencies:   {eager:8.1f} ms")
+    print(f"saved at startup:                   {eager - lazy:8.1f} ms")
+    print()
+    print(f"Heavy modules loaded by import main: {loaded or 'none'}")
+    print()
+    print("Slowest imports (cumulative):")
+    for name, micros in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
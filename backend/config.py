@@ -24,6 +24,88 @@ class Settings:
     # Text embedding model for semantic search
     GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "text-embedding-004")
     
+    # Embedding provider: "gemini" (remote API) or "local" (offline hashed n-gram model)
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+    # Fall back to the local model for queries when the remote provider fails
+    EMBEDDING_FALLBACK_TO_LOCAL = os.getenv("EMBEDDING_FALLBACK_TO_LOCAL", "true").lower() == "true"
+    LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "512"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    # Batches embedded in parallel by reembed_templates.py
+    EMBEDDING_MIGRATION_CONCURRENCY = int(os.getenv("EMBEDDING_MIGRATION_CONCURRENCY", "4"))
+    
+    # Extraction chunking (approximate tokens). Chunks are sized to fill the model's
+    # context window minus the reserve for instructions and the JSON response,
+    # capped so one chunk's variables fit in the output token limit
+    EXTRACTION_CONTEXT_TOKENS = int(os.getenv("EXTRACTION_CONTEXT_TOKENS", "1000000"))
+    EXTRACTION_RESERVED_TOKENS = int(os.getenv("EXTRACTION_RESERVED_TOKENS", "12000"))
+    EXTRACTION_MAX_CHUNK_TOKENS = int(os.getenv("EXTRACTION_MAX_CHUNK_TOKENS", "8000"))
+    EXTRACTION_CHUNK_OVERLAP_TOKENS = int(os.getenv("EXTRACTION_CHUNK_OVERLAP_TOKENS", "150"))
+    
+    # Template match result cache
+    MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "512"))
+    # Queries whose embeddings are at least this similar share a cached match
+    MATCH_CACHE_SIMILARITY = float(os.getenv("MATCH_CACHE_SIMILARITY", "0.97"))
+    MATCH_CACHE_TTL_SECONDS = int(os.getenv("MATCH_CACHE_TTL_SECONDS", "3600"))
+    
+    # Memory-mapped template catalogue snapshots, shared by worker processes
+    CATALOGUE_SNAPSHOT_DIR = os.getenv("CATALOGUE_SNAPSHOT_DIR", "./catalogue_snapshot")
+    # Catalogue versions whose template changes are kept for incremental snapshot updates
+    CATALOGUE_CHANGE_LOG_SIZE = int(os.getenv("CATALOGUE_CHANGE_LOG_SIZE", "1000"))
+    
+    # Input token budgets (approximate) for prompts built from variable lists
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+    # Previously found variables resent with each extraction chunk
+    EXTRACTION_HINT_TOKENS = int(os.getenv("EXTRACTION_HINT_TOKENS", "1500"))
+    
+    # Web bootstrap cache lifetimes and speculative content prefetch of top search results
+    WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "86400"))
+    WEB_CONTENT_CACHE_TTL_SECONDS = int(os.getenv("WEB_CONTENT_CACHE_TTL_SECONDS", "604800"))
+    WEB_PREFETCH_COUNT = int(os.getenv("WEB_PREFETCH_COUNT", "3"))
+    WEB_PREFETCH_WORKERS = int(os.getenv("WEB_PREFETCH_WORKERS", "4"))
+    # How long a failed prefetch is remembered (and not retried by prefetching)
+    WEB_PREFETCH_FAILURE_TTL_SECONDS = int(os.getenv("WEB_PREFETCH_FAILURE_TTL_SECONDS", "60"))
+    # Search results fetched and scored by /api/web/bootstrap/auto
+    WEB_BOOTSTRAP_CANDIDATES = int(os.getenv("WEB_BOOTSTRAP_CANDIDATES", "5"))
+    
+    # Compiled template bodies and reconstructed draft revisions kept in memory
+    COMPILED_TEMPLATE_CACHE_SIZE = int(os.getenv("COMPILED_TEMPLATE_CACHE_SIZE", "64"))
+    DRAFT_REVISION_CACHE_SIZE = int(os.getenv("DRAFT_REVISION_CACHE_SIZE", "128"))
+    # Last rendered draft per instance, so editing one answer re-renders only its lines
+    DRAFT_RENDER_STATE_CACHE_SIZE = int(os.getenv("DRAFT_RENDER_STATE_CACHE_SIZE", "128"))
+    
+    # Generated export files, keyed by draft content hash, evicted least recently used first
+    ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "./artifacts")
+    ARTIFACT_CACHE_MAX_MB = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "512"))
+    # Threads generating exports in the background after a draft is finalized
+    ARTIFACT_WORKERS = int(os.getenv("ARTIFACT_WORKERS", "2"))
+    
+    # DOCX export: "ooxml" writes the package directly, "python-docx" builds it through python-docx
+    DOCX_WRITER = os.getenv("DOCX_WRITER", "ooxml")
+    
+    # PDF export: worker processes, jobs queued or running before new ones are refused, and
+    # the TrueType fonts embedded in each file (Times without embedding if they are missing)
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+    PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "32"))
+    PDF_FONT_PATH = os.getenv("PDF_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf")
+    PDF_BOLD_FONT_PATH = os.getenv("PDF_BOLD_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf")
+    
+    # Logging: records are written to stdout by a background thread
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+    # Share of verbose payload logs (answers, previews, model output) kept at DEBUG
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+    LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+    LOG_REDACT_PII = os.getenv("LOG_REDACT_PII", "true").lower() == "true"
+    
+    # Request profiling (off by default). Requests are sampled at PROFILE_SAMPLE_RATE
+    # or profiled on demand with an X-Profile-Token header matching PROFILE_TOKEN
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+    
     # Tracking - UOIONHHC
     TRACKING_CODE = "UOIONHHC"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Text, Boolean, Integer, DateTime, JSON, Float
+from sqlalchemy import create_engine, inspect, text, UniqueConstraint, Column, String, Text, Boolean, Integer, DateTime, JSON, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -39,10 +39,27 @@ class Template(Base):
     similarity_tags = Column(JSON)  # List of tags
     body_md = Column(Text, nullable=False)  # Markdown with {{variables}}
     embedding = Column(JSON)  # Store as JSON array
+    embedding_model = Column(String(100))  # Provider/model that produced the embedding
+    embedding_hash = Column(String(64))  # SHA-256 of the embedded text (title, doc_type, jurisdiction, tags)
+    # Vector from a second model: filled during an embedding migration, kept after cutover
+    secondary_embedding = Column(JSON)
+    secondary_embedding_model = Column(String(100))
+    secondary_embedding_hash = Column(String(64))
+    version = Column(Integer, default=1)  # Incremented when body_md changes
     tracking_code = Column(String(50), default=settings.TRACKING_CODE)  # UOIONHHC
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class TemplateVersion(Base):
+    __tablename__ = "template_versions"
+    __table_args__ = (UniqueConstraint("template_row_id", "version"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    template_row_id = Column(String, nullable=False, index=True)  # templates.id
+    version = Column(Integer, nullable=False)
+    body_md = Column(Text, nullable=False)  # Body as it was before an edit (or deletion)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class TemplateVariable(Base):
     __tablename__ = "template_variables"
     
@@ -67,6 +84,7 @@ class Document(Base):
     raw_text = Column(Text)
     file_path = Column(String(500))
     embedding = Column(JSON)  # Store as JSON array
+    content_hash = Column(String(64), unique=True, index=True)  # SHA-256 of the uploaded bytes
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Instance(Base):
@@ -81,11 +99,120 @@ class Instance(Base):
     tracking_code = Column(String(50), default=settings.TRACKING_CODE)  # UOIONHHC
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class InstanceRevision(Base):
+    __tablename__ = "instance_revisions"
+    __table_args__ = (UniqueConstraint("instance_id", "revision"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    instance_id = Column(String, nullable=False, index=True)
+    revision = Column(Integer, nullable=False)  # 1, 2, ... per instance
+    template_row_id = Column(String, nullable=False)  # templates.id
+    template_version = Column(Integer, nullable=False)
+    answers_delta = Column(JSON)  # Answers changed since the previous revision (all answers for revision 1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "model_name", "prompt_version"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA-256 of the document text
+    model_name = Column(String(100), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    result = Column(JSON)  # variables, similarity_tags, doc_type, jurisdiction, template_body
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ExtractionChunkCache(Base):
+    __tablename__ = "extraction_chunk_cache"
+    __table_args__ = (UniqueConstraint("chunk_hash", "model_name", "prompt_version"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    chunk_hash = Column(String(64), nullable=False, index=True)  # SHA-256 of the chunk text
+    model_name = Column(String(100), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    result = Column(JSON)  # Raw Gemini extraction result for the chunk
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class WebCache(Base):
+    __tablename__ = "web_cache"
+    __table_args__ = (UniqueConstraint("namespace", "cache_key"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    namespace = Column(String(50), nullable=False)  # search_terms, search, content, cleaned
+    cache_key = Column(String(64), nullable=False, index=True)  # SHA-256 of the lookup key
+    value = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class CatalogueState(Base):
+    __tablename__ = "catalogue_state"
+    
+    id = Column(Integer, primary_key=True)  # Single row, id = 1
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every template change
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CatalogueChange(Base):
+    __tablename__ = "catalogue_changes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    version = Column(Integer, nullable=False, index=True)  # Catalogue version the change produced
+    template_row_id = Column(String, nullable=False)  # templates.id
+    op = Column(String(10), nullable=False)  # "upsert" or "delete"
+
+class EmbeddingMigrationState(Base):
+    __tablename__ = "embedding_migrations"
+    
+    target_model = Column(String(100), primary_key=True)  # model_id being migrated to
+    status = Column(String(20), nullable=False, default="running")  # running, complete
+    last_row_id = Column(String, nullable=False, default="")  # Checkpoint: templates.id of the last committed batch
+    embedded_count = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Columns added after the initial release: create_all() does not alter existing
+# tables, so these are added to older databases on startup
+ADDED_COLUMNS = {
+    "templates": [
+        ("embedding_model", "VARCHAR(100)"),
+        ("embedding_hash", "VARCHAR(64)"),
+        ("secondary_embedding", "JSON"),
+        ("secondary_embedding_model", "VARCHAR(100)"),
+        ("secondary_embedding_hash", "VARCHAR(64)"),
+        ("version", "INTEGER DEFAULT 1"),
+    ],
+    "documents": [
+        ("content_hash", "VARCHAR(64)"),
+    ],
+}
+
+# Indexes on added columns, created if missing
+ADDED_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+]
+
+def _migrate_schema():
+    """Add missing columns to tables created by an older version, and seed fixed rows"""
+    inspector = inspect(engine)
+    
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+        
+        for ddl in ADDED_INDEXES:
+            conn.execute(text(ddl))
+        
+        # Seed the catalogue version row, so concurrent first bumps only ever update it
+        conn.execute(text("INSERT OR IGNORE INTO catalogue_state (id, version) VALUES (1, 0)"))
+
 # Create all tables
 def init_db():
     """Initialize database with all tables"""
     # UOIONHHC - Database initialization
     Base.metadata.create_all(bind=engine)
+    _migrate_schema()
 
 # Dependency to get DB session
 def get_db():
@@ -1,12 +1,17 @@
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+import asyncio
 import uvicorn
 import uuid
+import hashlib
+import json
 from contextlib import asynccontextmanager
 
-from database import init_db, get_db, Document, Template, TemplateVariable, Instance
+from database import init_db, get_db, engine, SessionLocal, Document, Template, TemplateVariable, Instance
 from models import (
     DocumentUploadResponse,
     ExtractionRequest,
@@ -14,73 +19,107 @@ from models import (
     TemplateResponse,
     TemplateWithVariables,
     TemplateCreate,
+    TemplateUpdate,
     DraftRequest,
     DraftResponse,
     AnswerSubmission,
     FinalDraftResponse,
+    DraftRevisionSummary,
+    DraftRevisionResponse,
+    PdfExportRequest,
+    PdfExportStatus,
+    PdfExportResponse,
     VariableSchema,
     QuestionSchema,
     WebSearchRequest,
     WebSearchResponse,
     WebSearchResult,
     WebBootstrapRequest,
-    WebBootstrapResponse
+    WebBootstrapResponse,
+    WebAutoBootstrapRequest,
+    WebAutoBootstrapResponse
 )
 from config import settings
 from services.document_parser import DocumentParser
 from services.template_extractor import TemplateExtractor
+from services.extraction_cache import extraction_cache
+from services.web_cache import web_cache
+from services.gemini_service import gemini_service
 from services.embedding_service import embedding_service
 from services.template_matcher import template_matcher
+from services.catalogue import catalogue
+from services.catalogue_snapshot import catalogue_snapshot
 from services.question_generator import question_generator
 from services.web_bootstrap import web_bootstrap
 from services.docx_generator import docx_generator
+from services.artifact_store import artifact_store
+from services.pdf_export import pdf_exporter, ExportQueueFull, ExportCancelled
+from services.draft_renderer import draft_renderer
+from services.draft_history import draft_history
+from services.profiling import request_profiler
+from services.logging_setup import configure_logging, shutdown_logging, PAYLOAD
+from services.metrics import registry, stage_seconds, http_request_seconds, time_stage, record_cache, instrument_engine
 import os
-import tempfile
+import time
 import re
+import logging
 from fastapi.responses import FileResponse
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_logging()
     try:
         init_db()
-        print("Database initialized successfully")
+        logger.info("Database initialized successfully")
+        web_cache.purge_expired()
+        artifact_store.remove_stale_temp_files()
+        
+        # Re-embed templates if the embedding provider changed since they were indexed
+        try:
+            db = SessionLocal()
+            try:
+                rebuilt = embedding_service.rebuild_index(db)
+                # Map (or build, if no worker has yet) the snapshot for this catalogue version
+                snapshot = catalogue_snapshot.get(db)
+            finally:
+                db.close()
+            logger.info(f"Embedding index ready ({embedding_service.model_id}, {rebuilt} templates re-embedded, "
+                        f"snapshot v{snapshot.version} with {len(snapshot)} templates)")
+        except Exception as e:
+            logger.warning(f"Embedding index rebuild failed: {str(e)}")
         
         # Validate API keys
         if not settings.GEMINI_API_KEY:
-            print("⚠️  WARNING: GEMINI_API_KEY not configured - template extraction will fail")
+            logger.warning("GEMINI_API_KEY not configured - template extraction will fail")
         else:
-            print(f"✅ Gemini API Key configured: {settings.GEMINI_API_KEY[:10]}...")
+            logger.info("Gemini API key configured")
             
         if not settings.EXA_API_KEY:
-            print("⚠️  WARNING: EXA_API_KEY not configured - web bootstrap feature disabled")
+            logger.warning("EXA_API_KEY not configured - web bootstrap feature disabled")
         else:
-            print(f"✅ Exa API Key configured: {settings.EXA_API_KEY[:10]}...")
-            
-        # Test API connections
-        try:
-            from services.gemini_service import gemini_service
-            print("✅ Gemini service initialized successfully")
-        except Exception as e:
-            print(f"❌ Gemini service initialization failed: {str(e)}")
+            logger.info("Exa API key configured")
             
-        try:
-            from services.exa_service import exa_service
-            if exa_service:
-                print("✅ Exa service initialized successfully")
-            else:
-                print("⚠️  Exa service not available (no API key)")
-        except Exception as e:
-            print(f"❌ Exa service initialization failed: {str(e)}")
+        # API clients are created on first use to keep cold starts fast
+        from services.exa_service import exa_service
+        if exa_service:
+            logger.info("Exa service configured")
+        else:
+            logger.warning("Exa service not available (no API key)")
             
     except Exception as e:
-        print(f"❌ Startup failed: {str(e)}")
+        logger.error(f"Startup failed: {str(e)}")
         raise
     
     yield
     
-    # Shutdown (if needed)
-    print("Shutting down...")
+    # Shutdown: stop PDF workers and flush queued log records
+    logger.info("Shutting down...")
+    pdf_exporter.shutdown()
+    shutdown_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -99,6 +138,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument_engine(engine)
+
+# Request latency middleware, labelled by route template rather than raw path
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
+# Opt-in request profiling (see services/profiling.py)
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if request.url.path.startswith("/admin/") or not request_profiler.should_profile(
+        request.headers.get(request_profiler.HEADER)
+    ):
+        return await call_next(request)
+    
+    session = request_profiler.start()
+    if session is None:
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        profile, extension = request_profiler.stop(session)
+        route = getattr(request.scope.get("route"), "path", request.url.path)
+        await run_in_threadpool(request_profiler.save, profile, extension, request.method, route, duration_ms)
+
 # Request size validation middleware
 @app.middleware("http")
 async def validate_request_size(request: Request, call_next):
@@ -114,115 +194,6 @@ async def validate_request_size(request: Request, call_next):
     response = await call_next(request)
     return response
 
-def _format_template_content(content: str) -> str:
-    """Format template content for better markdown rendering"""
-    # Remove YAML front-matter if present
-    if content.startswith('---'):
-        parts = content.split('---', 2)
-        if len(parts) >= 3:
-            content = parts[2].strip()
-    
-    # Remove tracking code from visible content
-    content = content.replace("UOIONHHC", "")
-    content = content.replace("<!--  -->", "")
-    
-    # Clean up extra whitespace
-    content = content.strip()
-    
-    # Ensure proper line breaks for common patterns
-    # Fix "To," patterns - add line breaks after recipients
-    content = re.sub(r'To,\s*\n?\s*', 'To,\n\n', content)
-    
-    # Fix date patterns - add line breaks after dates
-    content = re.sub(r'Date:\s*([^\n]+)\n?', r'Date: \1\n\n', content)
-    
-    # Fix subject patterns - add line breaks after subject
-    content = re.sub(r'Subject:\s*([^\n]+)\n?', r'Subject: \1\n\n', content)
-    
-    # Fix "Dear" patterns - add line breaks after salutation
-    content = re.sub(r'Dear\s+([^\n]+),\n?', r'Dear \1,\n\n', content)
-    
-    # Fix signature patterns - add line breaks before signatures
-    content = re.sub(r'\n(Yours\s+(?:faithfully|sincerely))', r'\n\n\1', content, flags=re.IGNORECASE)
-    
-    # Ensure double line breaks between paragraphs
-    # Replace multiple newlines with exactly two
-    content = re.sub(r'\n{3,}', '\n\n', content)
-    
-    # Clean up any trailing whitespace
-    content = re.sub(r'\n\s+', '\n', content)
-    
-    return content
-
-def _format_draft_markdown(content: str) -> str:
-    """Format draft markdown for beautiful display with proper markdown syntax"""
-    lines = content.split('\n')
-    formatted_lines = []
-    
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        
-        # Skip empty lines
-        if not stripped:
-            formatted_lines.append('')
-            continue
-        
-        # Main title (first line, all caps or starts with specific patterns)
-        if i == 0 or (stripped.isupper() and len(stripped.split()) <= 6):
-            formatted_lines.append(f"# {stripped}")
-        
-        # Date line
-        elif stripped.startswith('Date:'):
-            formatted_lines.append(f"**{stripped}**")
-            formatted_lines.append('')  # Add space after
-        
-        # To, From patterns
-        elif stripped in ['To,', 'From:']:
-            formatted_lines.append(f"**{stripped}**")
-        
-        # Subject line
-        elif stripped.startswith('Subject:'):
-            formatted_lines.append(f"**{stripped}**")
-            formatted_lines.append('')
-        
-        # Section headers (ALL CAPS, colon at end)
-        elif stripped.isupper() and stripped.endswith(':') and len(stripped.split()) <= 5:
-            formatted_lines.append('')
-            formatted_lines.append(f"### {stripped[:-1]}")
-            formatted_lines.append('')
-        
-        # Salutation (Dear...)
-        elif stripped.startswith('Dear '):
-            formatted_lines.append(f"**{stripped}**")
-            formatted_lines.append('')
-        
-        # Closing (Yours faithfully, Yours sincerely, etc.)
-        elif re.match(r'^Yours\s+(faithfully|sincerely)', stripped, re.IGNORECASE):
-            formatted_lines.append('')
-            formatted_lines.append(f"**{stripped}**")
-        
-        # Name/signature at end
-        elif i > len(lines) - 5 and stripped and not stripped.startswith(('-', 'Contact:', 'Email:', 'Address:', '1.', '2.', '3.')):
-            # Could be a name
-            if not any(stripped.startswith(prefix) for prefix in ['I ', 'The ', 'Please ', 'Enclosed ']):
-                formatted_lines.append(f"**{stripped}**")
-            else:
-                formatted_lines.append(stripped)
-        
-        # Bullet points (lines starting with dash or number)
-        elif stripped.startswith('-') or re.match(r'^\d+\.', stripped):
-            formatted_lines.append(stripped)
-        
-        # Contact info at end
-        elif stripped.startswith(('Contact:', 'Email:', 'Address:')):
-            formatted_lines.append(f"**{stripped}**")
-        
-        # Regular paragraph text
-        else:
-            formatted_lines.append(stripped)
-    
-    return '\n'.join(formatted_lines)
-
 @app.get("/")
 async def root():
     return {
@@ -237,9 +208,57 @@ async def health_check():
         "status": "healthy",
         "database": "connected",
         "gemini_configured": bool(settings.GEMINI_API_KEY),
-        "exa_configured": bool(settings.EXA_API_KEY)
+        "exa_configured": bool(settings.EXA_API_KEY),
+        "embedding_model": embedding_service.model_id,
+        "gemini_calls": gemini_service.call_stats()
     }
 
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """List stored request profiles, newest first"""
+    if not request_profiler.authorized(request.headers.get(request_profiler.HEADER)):
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"profiles": request_profiler.list_profiles()}
+
+@app.get("/admin/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    """Download a profile (speedscope JSON or collapsed stacks for flamegraph.pl/speedscope)"""
+    if not request_profiler.authorized(request.headers.get(request_profiler.HEADER)):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = request_profiler.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage latencies, LLM usage, cache and DB counters"""
+    return Response(registry.render(), media_type=registry.CONTENT_TYPE)
+
+def _document_upload_response(document: Document, deduplicated: bool = False) -> DocumentUploadResponse:
+    """Build the upload response for a stored document"""
+    extracted_text = document.raw_text or ""
+    
+    extraction_cached = False
+    if deduplicated:
+        message = f"Document already uploaded. Reusing existing parse ({len(extracted_text)} characters)."
+        extraction_cached = extraction_cache.get_document(
+            extraction_cache.hash_text(extracted_text),
+            gemini_service.model_name,
+            gemini_service.EXTRACTION_PROMPT_VERSION
+        ) is not None
+    else:
+        message = f"Document uploaded successfully. Extracted {len(extracted_text)} characters."
+    
+    return DocumentUploadResponse(
+        document_id=document.id,
+        filename=document.filename,
+        extracted_text=extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
+        message=message,
+        deduplicated=deduplicated,
+        extraction_cached=extraction_cached
+    )
+
 @app.post("/api/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -269,9 +288,17 @@ async def upload_document(
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_message)
         
+        # Content addressing: identical bytes reuse the stored document and its parse
+        content_hash = hashlib.sha256(file_content).hexdigest()
+        existing = db.query(Document).filter(Document.content_hash == content_hash).first()
+        record_cache("upload_dedup", existing is not None)
+        if existing:
+            return _document_upload_response(existing, deduplicated=True)
+        
         # Parse document
         try:
-            extracted_text = DocumentParser.parse_document(file_content, file.filename or "unknown")
+            with time_stage("parse"):
+                extracted_text = DocumentParser.parse_document(file_content, file.filename or "unknown")
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         
@@ -287,19 +314,21 @@ async def upload_document(
             filename=file.filename,
             mime_type=file.content_type,
             raw_text=extracted_text,
-            file_path=None  # We're storing text directly, not saving files
+            file_path=None,  # We're storing text directly, not saving files
+            content_hash=content_hash
         )
         
         db.add(document)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # The same bytes were stored by a concurrent upload
+            db.rollback()
+            existing = db.query(Document).filter(Document.content_hash == content_hash).first()
+            return _document_upload_response(existing, deduplicated=True)
         db.refresh(document)
         
-        return DocumentUploadResponse(
-            document_id=document.id,
-            filename=document.filename,
-            extracted_text=extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
-            message=f"Document uploaded successfully. Extracted {len(extracted_text)} characters."
-        )
+        return _document_upload_response(document)
         
     except HTTPException:
         raise
@@ -318,49 +347,112 @@ async def extract_template(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        print(f"DEBUG: Extracting variables from document (length: {len(document.raw_text)} chars)")
-        
-        # Extract variables using Gemini
-        extraction_result = TemplateExtractor.extract_variables_from_document(document.raw_text)
-        
-        print(f"DEBUG: Extracted {len(extraction_result['variables'])} variables")
-        print(f"DEBUG: Variable keys: {[v['key'] for v in extraction_result['variables']]}")
+        # Serve repeat extractions of the same text from the extraction cache
+        text_hash = extraction_cache.hash_text(document.raw_text)
+        model_name = gemini_service.model_name
+        prompt_version = gemini_service.EXTRACTION_PROMPT_VERSION
+        extraction_result = extraction_cache.get_document(text_hash, model_name, prompt_version)
         
-        # Generate template ID
-        template_id = TemplateExtractor.generate_template_id(request.title)
+        if extraction_result:
+            logger.debug(f"Using cached extraction for document {document.id}")
+        else:
+            logger.debug(f"Extracting variables from document (length: {len(document.raw_text)} chars)")
+            
+            # Extract variables using Gemini
+            extraction_result = TemplateExtractor.extract_variables_from_document(document.raw_text)
+            extraction_result['template_body'] = TemplateExtractor.substitute_variables(
+                document.raw_text,
+                extraction_result['variables']
+            )
+            extraction_cache.put_document(text_hash, model_name, prompt_version, extraction_result)
         
-        # Create template markdown
-        template_markdown = TemplateExtractor.create_template_markdown(
-            document.raw_text,
-            extraction_result['variables'],
-            template_id,
-            request.title,
-            extraction_result.get('doc_type', 'Unknown'),
-            extraction_result.get('jurisdiction', 'Unknown'),
-            extraction_result.get('similarity_tags', []),
-            request.file_description or ""
-        )
-        
-        print(f"DEBUG: Template markdown length: {len(template_markdown)}")
-        
-        return ExtractionResponse(
-            template_id=template_id,
-            title=request.title,
-            doc_type=extraction_result.get('doc_type'),
-            jurisdiction=extraction_result.get('jurisdiction'),
-            similarity_tags=extraction_result.get('similarity_tags', []),
-            variables=[VariableSchema(**v) for v in extraction_result['variables']],
-            template_markdown=template_markdown,
-            message=f"Extracted {len(extraction_result['variables'])} variables successfully"
-        )
+        return _extraction_response(request, extraction_result)
         
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Extraction failed")
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
+def _extraction_response(request: ExtractionRequest, extraction_result: dict) -> ExtractionResponse:
+    """Build the extraction response from an (optionally cached) extraction result"""
+    logger.debug(f"Extracted {len(extraction_result['variables'])} variables")
+    logger.debug("Variable keys: %s", [v['key'] for v in extraction_result['variables']], extra=PAYLOAD)
+    
+    # Generate template ID
+    template_id = TemplateExtractor.generate_template_id(request.title)
+    
+    # Create template markdown
+    template_markdown = TemplateExtractor.build_front_matter(
+        template_id,
+        request.title,
+        extraction_result.get('doc_type', 'Unknown'),
+        extraction_result.get('jurisdiction', 'Unknown'),
+        extraction_result.get('similarity_tags', []),
+        request.file_description or ""
+    ) + extraction_result['template_body']
+    
+    logger.debug(f"Template markdown length: {len(template_markdown)}")
+    
+    return ExtractionResponse(
+        template_id=template_id,
+        title=request.title,
+        doc_type=extraction_result.get('doc_type'),
+        jurisdiction=extraction_result.get('jurisdiction'),
+        similarity_tags=extraction_result.get('similarity_tags', []),
+        variables=[VariableSchema(**v) for v in extraction_result['variables']],
+        template_markdown=template_markdown,
+        message=f"Extracted {len(extraction_result['variables'])} variables successfully"
+    )
+
+def _ndjson_event(event_type: str, **payload) -> str:
+    """One line of a newline-delimited JSON event stream"""
+    return json.dumps({"type": event_type, **payload}, default=str) + "\n"
+
+@app.post("/api/extract/stream")
+async def extract_template_stream(
+    request: ExtractionRequest,
+    db: Session = Depends(get_db)
+):
+    """Extract variables as a newline-delimited JSON stream
+    
+    Emits {"type": "variable", "variable": {...}} as each variable is extracted,
+    then {"type": "result", ...} with the same fields as /api/extract, or
+    {"type": "error", "detail": ...} if extraction fails part-way.
+    """
+    document = db.query(Document).filter(Document.id == request.document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    raw_text = document.raw_text
+    text_hash = extraction_cache.hash_text(raw_text)
+    model_name = gemini_service.model_name
+    prompt_version = gemini_service.EXTRACTION_PROMPT_VERSION
+    
+    def events():
+        try:
+            extraction_result = extraction_cache.get_document(text_hash, model_name, prompt_version)
+            if extraction_result:
+                for variable in extraction_result['variables']:
+                    yield _ndjson_event("variable", variable=VariableSchema(**variable).model_dump())
+            else:
+                for event, payload in TemplateExtractor.stream_variables_from_document(raw_text):
+                    if event == "variable":
+                        yield _ndjson_event("variable", variable=VariableSchema(**payload).model_dump())
+                    else:
+                        extraction_result = payload
+                extraction_result['template_body'] = TemplateExtractor.substitute_variables(
+                    raw_text,
+                    extraction_result['variables']
+                )
+                extraction_cache.put_document(text_hash, model_name, prompt_version, extraction_result)
+            
+            yield _ndjson_event("result", **_extraction_response(request, extraction_result).model_dump())
+        except Exception as e:
+            yield _ndjson_event("error", detail=f"Extraction failed: {str(e)}")
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/api/templates", response_model=TemplateResponse)
 async def save_template(
     template_data: TemplateCreate,
@@ -373,10 +465,6 @@ async def save_template(
         if existing:
             raise HTTPException(status_code=400, detail="Template ID already exists")
         
-        # Generate embedding for template
-        embedding_text = f"{template_data.title} {template_data.doc_type} {template_data.jurisdiction} {' '.join(template_data.similarity_tags)}"
-        embedding = embedding_service.generate_document_embedding(embedding_text)
-        
         # Create template
         template = Template(
             id=str(uuid.uuid4()),
@@ -386,44 +474,23 @@ async def save_template(
             doc_type=template_data.doc_type,
             jurisdiction=template_data.jurisdiction,
             similarity_tags=template_data.similarity_tags,
-            body_md=template_data.body_md,
-            embedding=embedding
+            body_md=template_data.body_md
         )
         
+        # Generate embedding for template
+        embedding_service.embed_template(template)
+        
         db.add(template)
         db.flush()  # Get template.id
         
         # Create variables
-        for var_data in template_data.variables:
-            variable = TemplateVariable(
-                id=str(uuid.uuid4()),
-                template_id=template.id,
-                key=var_data.key,
-                label=var_data.label,
-                description=var_data.description,
-                example=var_data.example,
-                required=var_data.required,
-                dtype=var_data.dtype,
-                regex=var_data.regex,
-                enum_values=var_data.enum_values
-            )
-            db.add(variable)
+        _add_template_variables(db, template.id, template_data.variables)
         
+        catalogue.bump_version(db, changed=[template.id])
         db.commit()
         db.refresh(template)
         
-        return TemplateResponse(
-            id=template.id,
-            template_id=template.template_id,
-            title=template.title,
-            file_description=template.file_description,
-            doc_type=template.doc_type,
-            jurisdiction=template.jurisdiction,
-            similarity_tags=template.similarity_tags,
-            body_md=template.body_md,
-            created_at=template.created_at,
-            updated_at=template.updated_at
-        )
+        return TemplateResponse.model_validate(template)
         
     except HTTPException:
         raise
@@ -431,6 +498,91 @@ async def save_template(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to save template: {str(e)}")
 
+def _add_template_variables(db: Session, template_row_id: str, variables: list[VariableSchema]):
+    """Add variable rows for a template (by Template.id)"""
+    for var_data in variables:
+        variable = TemplateVariable(
+            id=str(uuid.uuid4()),
+            template_id=template_row_id,
+            key=var_data.key,
+            label=var_data.label,
+            description=var_data.description,
+            example=var_data.example,
+            required=var_data.required,
+            dtype=var_data.dtype,
+            regex=var_data.regex,
+            enum_values=var_data.enum_values
+        )
+        db.add(variable)
+
+@app.put("/api/templates/{template_id}", response_model=TemplateResponse)
+async def update_template(
+    template_id: str,
+    template_data: TemplateUpdate,
+    db: Session = Depends(get_db)
+):
+    """Update a template; fields left out of the request are unchanged
+    
+    The embedding is only recomputed when the embedded fields (title,
+    doc_type, jurisdiction, similarity_tags) change. Variables, when given,
+    replace the existing ones.
+    """
+    try:
+        template = db.query(Template).filter(Template.template_id == template_id).first()
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        
+        changes = template_data.model_dump(exclude_unset=True, exclude={"variables"})
+        if "body_md" in changes and changes["body_md"] != template.body_md:
+            # Keep the old body so earlier draft revisions can still be rebuilt
+            draft_history.archive_template(db, template)
+            template.version = (template.version or 1) + 1
+        for field, value in changes.items():
+            setattr(template, field, value)
+        reembedded = embedding_service.embed_template(template)
+        
+        if template_data.variables is not None:
+            db.query(TemplateVariable).filter(TemplateVariable.template_id == template.id).delete()
+            _add_template_variables(db, template.id, template_data.variables)
+        
+        catalogue.bump_version(db, changed=[template.id])
+        db.commit()
+        db.refresh(template)
+        logger.info(f"Updated template {template_id} ({'re-embedded' if reembedded else 'embedding unchanged'})")
+        
+        return TemplateResponse.model_validate(template)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to update template: {str(e)}")
+
+@app.delete("/api/templates/{template_id}")
+async def delete_template(template_id: str, db: Session = Depends(get_db)):
+    """Delete a template and its variables (existing drafts are kept)"""
+    try:
+        template = db.query(Template).filter(Template.template_id == template_id).first()
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        
+        template_row_id = template.id
+        draft_history.archive_template(db, template)
+        db.query(TemplateVariable).filter(TemplateVariable.template_id == template_row_id).delete()
+        db.delete(template)
+        catalogue.bump_version(db, deleted=[template_row_id])
+        db.commit()
+        embedding_service.forget(template_row_id)
+        logger.info(f"Deleted template {template_id}")
+        
+        return {"template_id": template_id, "message": "Template deleted"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to delete template: {str(e)}")
+
 @app.get("/api/templates", response_model=list[TemplateResponse])
 async def list_templates(db: Session = Depends(get_db)):
     """List all templates"""
@@ -478,40 +630,37 @@ async def create_draft(
     try:
         # Check if template_id is provided directly
         if hasattr(request, 'template_id') and request.template_id:
-            print(f"DEBUG: Draft request with direct template_id: {request.template_id}")
+            logger.debug(f"Draft request with direct template_id: {request.template_id}")
             
             # Load template directly
             template = db.query(Template).filter(Template.template_id == request.template_id).first()
             if not template:
                 raise HTTPException(status_code=404, detail="Template not found")
             
-            # Find alternatives by using a simple query to other templates
-            all_templates = db.query(Template).all()
-            alternatives = []
-            for t in all_templates:
-                if t.template_id != request.template_id:  # Don't include current template
-                    alternatives.append({
-                        "template_id": t.template_id,
-                        "title": t.title,
-                        "doc_type": t.doc_type
-                    })
+            # Alternatives are the templates sharing the most similarity tags
+            alternatives = [
+                {
+                    "template_id": t["template_id"],
+                    "title": t["title"],
+                    "doc_type": t["doc_type"]
+                }
+                for t in catalogue_snapshot.get(db).related(request.template_id, limit=2)
+            ]
             
             match_result = {
                 "template": template,
                 "confidence": 1.0,
                 "justification": f"Using selected template: {template.title}",
-                "alternatives": alternatives[:2]  # Limit to 2 alternatives
+                "alternatives": alternatives
             }
         else:
-            print(f"DEBUG: Draft request for query: {request.user_query}")
+            logger.debug("Draft request for query: %s", request.user_query, extra=PAYLOAD)
             
             # Match template by query
             match_result = template_matcher.match_template(request.user_query, db)
             
-            print(f"DEBUG: Match result: {match_result}")
-            
             if not match_result:
-                print(f"DEBUG: No template found - returning 404")
+                logger.info("No template matched the draft query")
                 raise HTTPException(
                     status_code=404,
                     detail=f"No suitable template found (confidence < {settings.CONFIDENCE_THRESHOLD}). Try uploading a template or broadening your request."
@@ -524,7 +673,8 @@ async def create_draft(
             TemplateVariable.template_id == template.id
         ).all()
         
-        print(f"DEBUG: Found {len(variables)} variables for template {template.template_id}")
+        logger.debug(f"Matched template {template.template_id} "
+                     f"(confidence {match_result['confidence']:.2f}, {len(variables)} variables)")
         
         # Convert to dict format
         variable_dicts = [
@@ -539,16 +689,13 @@ async def create_draft(
             for v in variables
         ]
         
-        if len(variable_dicts) > 0:
-            print(f"DEBUG: Variable keys: {[v['key'] for v in variable_dicts[:5]]}")  # Show first 5
-        
         # Extract pre-filled values from query
         pre_filled = question_generator.extract_values_from_query(
             request.user_query or f"Load template: {template.title}",
             variable_dicts
         )
         
-        print(f"DEBUG: Pre-filled values: {pre_filled}")
+        logger.debug("Pre-filled values: %s", pre_filled, extra=PAYLOAD)
         
         # Find missing variables
         missing_vars = [
@@ -556,12 +703,10 @@ async def create_draft(
             if v["key"] not in pre_filled or pre_filled[v["key"]] is None
         ]
         
-        print(f"DEBUG: Missing variables count: {len(missing_vars)}")
-        
         # Generate questions for missing variables
         questions = question_generator.generate_questions(missing_vars)
         
-        print(f"DEBUG: Generated {len(questions)} questions")
+        logger.debug(f"{len(missing_vars)} missing variables, {len(questions)} questions")
         
         # Create instance
         instance = Instance(
@@ -592,9 +737,7 @@ async def create_draft(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"DEBUG: Draft endpoint error: {error_trace}")
+        logger.exception("Draft creation failed")
         raise HTTPException(status_code=500, detail=f"Draft creation failed: {str(e)}")
 
 @app.post("/api/draft/finalize", response_model=FinalDraftResponse)
@@ -604,6 +747,9 @@ async def finalize_draft(
 ):
     """Generate final draft with user answers"""
     try:
+        # Serialize with concurrent updates of this draft, so revisions stay consecutive
+        draft_history.lock_instance(db, submission.instance_id)
+        
         # Get instance
         instance = db.query(Instance).filter(Instance.id == submission.instance_id).first()
         if not instance:
@@ -629,50 +775,25 @@ async def finalize_draft(
                        "Please try a different document or upload the template directly."
             )
         
-        # Replace variables in template
-        draft_md = template.body_md
-        
-        # Format the template content for better markdown rendering
-        draft_md = _format_template_content(draft_md)
-        
-        # Debug logging
-        print(f"DEBUG: All answers: {all_answers}")
-        print(f"DEBUG: Template variables count: {len(template_variables)}")
-        print(f"DEBUG: Template body preview: {draft_md[:500]}")
+        logger.debug("Finalizing with answers: %s", all_answers, extra=PAYLOAD)
         
-        # Replace variables
-        replaced_count = 0
-        for key, value in all_answers.items():
-            if value is not None:
-                placeholder = f"{{{{{key}}}}}"
-                if placeholder in draft_md:
-                    print(f"DEBUG: Replacing {placeholder} with {value}")
-                    draft_md = draft_md.replace(placeholder, str(value))
-                    replaced_count += 1
-                else:
-                    print(f"DEBUG: Warning - placeholder {placeholder} not found in template")
+        # Fill the compiled template and format the markdown for display
+        # (after an edit, only the lines with changed answers are re-rendered)
+        render_start = time.perf_counter()
+        draft_md = draft_renderer.render_instance(instance.id, template.body_md, all_answers)
+        stage_seconds.observe(time.perf_counter() - render_start, stage="render")
         
-        print(f"DEBUG: Replaced {replaced_count}/{len(all_answers)} variables")
+        logger.debug("Final draft preview: %s", draft_md[:500], extra=PAYLOAD)
         
-        # Remove UOIONHHC tracking code from final output
-        draft_md = draft_md.replace("UOIONHHC", "")
-        draft_md = draft_md.replace("<!--  -->", "")
-        
-        # Clean up any remaining HTML comments
-        import re
-        draft_md = re.sub(r'<!--.*?-->', '', draft_md, flags=re.DOTALL)
-        
-        # Format the markdown for better display
-        draft_md = _format_draft_markdown(draft_md)
-        
-        print(f"DEBUG: Final draft preview: {draft_md[:500]}")
-        
-        # Update instance
+        # Record the answer changes as a revision, then update instance
+        revision = draft_history.record(db, instance, template, all_answers)
+        logger.debug(f"Recorded revision {revision} of draft {instance.id}")
         instance.answers_json = all_answers
         instance.draft_md = draft_md
         
         db.commit()
         db.refresh(instance)
+        _prefetch_docx(draft_md)
         
         return FinalDraftResponse(
             instance_id=instance.id,
@@ -690,24 +811,21 @@ async def finalize_draft(
 async def search_web(request: WebSearchRequest):
     """Search for similar documents on the web using exa.ai"""
     try:
-        print(f"DEBUG: Web search requested for query: {request.query}")
-        print(f"DEBUG: Exa API configured: {bool(settings.EXA_API_KEY)}")
+        logger.debug("Web search requested for query: %s", request.query, extra=PAYLOAD)
         
         results = web_bootstrap.search_web_documents(request.query, request.num_results)
         
-        print(f"DEBUG: Web search returned {len(results)} results")
+        logger.debug(f"Web search returned {len(results)} results")
         
         return WebSearchResponse(
             results=[WebSearchResult(**r) for r in results],
             message=f"Found {len(results)} documents online"
         )
     except ValueError as e:
-        print(f"DEBUG: Web search ValueError: {str(e)}")
+        logger.warning(f"Web search rejected: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"DEBUG: Web search Exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Web search failed")
         raise HTTPException(status_code=500, detail=f"Web search failed: {str(e)}")
 
 @app.post("/api/web/bootstrap", response_model=WebBootstrapResponse)
@@ -728,43 +846,170 @@ async def bootstrap_from_web(request: WebBootstrapRequest, db: Session = Depends
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Web bootstrap failed: {str(e)}")
 
+@app.post("/api/web/bootstrap/auto", response_model=WebAutoBootstrapResponse)
+async def bootstrap_best_from_web(request: WebAutoBootstrapRequest, db: Session = Depends(get_db)):
+    """Search the web and create a template from the best-scoring result"""
+    try:
+        result = web_bootstrap.bootstrap_best_candidate(
+            request.query,
+            db,
+            request.num_candidates or settings.WEB_BOOTSTRAP_CANDIDATES
+        )
+        
+        return WebAutoBootstrapResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Web bootstrap failed: {str(e)}")
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def _docx_artifact(draft_md: str):
+    """Artifact key of a draft's DOCX export and the function that generates it"""
+    key = artifact_store.key(draft_md, docx_generator.artifact_generator())
+    return key, lambda output_path: docx_generator.markdown_to_docx(draft_md, output_path)
+
+def _prefetch_docx(draft_md: str):
+    """Start generating the DOCX export of a new draft so the download is a file serve"""
+    key, generate = _docx_artifact(draft_md)
+    artifact_store.prefetch(key, ".docx", generate)
+
+def _artifact_headers(etag: str) -> dict:
+    return {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match (weak comparison) already covers this artifact"""
+    client_tags = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    return etag in client_tags or "*" in client_tags
+
+def _artifact_response(request: Request, path, etag: str, media_type: str, filename: str) -> Response:
+    """Serve a stored artifact with a strong ETag, conditional GET and single byte ranges"""
+    headers = _artifact_headers(etag)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    stat_result = os.stat(path)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip()) if range_header else None
+    # A range ending before it starts is invalid and ignored (RFC 9110 14.2)
+    if match and match.group(1) and match.group(2) and int(match.group(2)) < int(match.group(1)):
+        match = None
+    if match and (if_range is None or if_range == etag) and (match.group(1) or match.group(2)):
+        size = stat_result.st_size
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            start, end = max(size - int(match.group(2)), 0), size - 1
+        if start >= size:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        with open(path, "rb") as f:
+            f.seek(start)
+            content = f.read(end - start + 1)
+        return Response(
+            content,
+            status_code=206,
+            media_type=media_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}",
+                     "Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    # Multiple or invalid ranges are answered with the whole file
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat_result)
+
 @app.get("/api/draft/{instance_id}/download/docx")
-async def download_draft_docx(instance_id: str, db: Session = Depends(get_db)):
-    """Download draft as DOCX file"""
+async def download_draft_docx(instance_id: str, request: Request, db: Session = Depends(get_db)):
+    """Download draft as DOCX file
+    
+    Exports are cached by draft content, so repeated downloads of an unchanged
+    draft are served from disk (usually generated right after finalize).
+    """
     try:
         # Get instance
         instance = db.query(Instance).filter(Instance.id == instance_id).first()
         if not instance or not instance.draft_md:
             raise HTTPException(status_code=404, detail="Draft not found")
         
-        print(f"DEBUG: Generating DOCX for instance {instance_id}")
-        print(f"DEBUG: Draft markdown length: {len(instance.draft_md)}")
-        print(f"DEBUG: Draft preview: {instance.draft_md[:200]}")
-        
-        # Create temporary file
-        temp_dir = tempfile.gettempdir()
-        output_path = os.path.join(temp_dir, f"draft_{instance.draft_number}.docx")
+        key, generate = _docx_artifact(instance.draft_md)
+        if _not_modified(request, f'"{key}"'):
+            return Response(status_code=304, headers=_artifact_headers(f'"{key}"'))
+        path = artifact_store.get(key, ".docx")
+        if path is None:
+            logger.debug(f"Generating DOCX for instance {instance_id} ({len(instance.draft_md)} chars of markdown)")
+            with time_stage("docx"):
+                path = await run_in_threadpool(artifact_store.get_or_create, key, ".docx", generate)
         
-        # Generate DOCX
-        docx_generator.markdown_to_docx(instance.draft_md, output_path)
-        
-        print(f"DEBUG: DOCX generated successfully at {output_path}")
-        
-        return FileResponse(
-            output_path,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            filename=f"draft_{instance.draft_number}.docx"
-        )
+        return _artifact_response(request, path, f'"{key}"', DOCX_MEDIA_TYPE, f"draft_{instance.draft_number}.docx")
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DOCX generation failed: {str(e)}")
 
+@app.get("/api/draft/{instance_id}/download/pdf")
+async def download_draft_pdf(instance_id: str, request: Request, db: Session = Depends(get_db)):
+    """Download draft as PDF file
+    
+    PDFs are rendered by the PDF worker processes and cached by draft
+    content; this request only waits for the job.
+    """
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance or not instance.draft_md:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    
+    etag = f'"{pdf_exporter.key(instance.draft_md)}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=_artifact_headers(etag))
+    
+    try:
+        with time_stage("pdf"):
+            path = await asyncio.wrap_future(pdf_exporter.submit(instance.draft_md))
+    except (ExportQueueFull, ExportCancelled) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+    
+    return _artifact_response(request, path, etag, "application/pdf", f"draft_{instance.draft_number}.pdf")
+
+@app.post("/api/draft/export/pdf", response_model=PdfExportResponse, status_code=202)
+async def export_drafts_pdf(request: PdfExportRequest, db: Session = Depends(get_db)):
+    """Queue PDF exports for several drafts; download each from its download_url
+    
+    Drafts beyond the worker queue's capacity are reported as busy, to be
+    submitted again later.
+    """
+    instances = {
+        instance.id: instance
+        for instance in db.query(Instance).filter(Instance.id.in_(request.instance_ids)).all()
+    }
+    exports = []
+    for instance_id in request.instance_ids:
+        instance = instances.get(instance_id)
+        if not instance or not instance.draft_md:
+            exports.append(PdfExportStatus(instance_id=instance_id, status="not_found"))
+            continue
+        try:
+            future = pdf_exporter.submit(instance.draft_md)
+        except ExportQueueFull:
+            exports.append(PdfExportStatus(instance_id=instance_id, status="busy"))
+            continue
+        exports.append(PdfExportStatus(
+            instance_id=instance_id,
+            status="ready" if future.done() and not future.exception() else "queued",
+            download_url=f"/api/draft/{instance_id}/download/pdf"
+        ))
+    
+    return PdfExportResponse(exports=exports, pending=pdf_exporter.pending())
+
 @app.post("/api/draft/{instance_id}/regenerate", response_model=FinalDraftResponse)
 async def regenerate_draft(instance_id: str, db: Session = Depends(get_db)):
     """Regenerate draft with existing answers"""
     try:
+        # Serialize with concurrent updates of this draft, so revisions stay consecutive
+        draft_history.lock_instance(db, instance_id)
+        
         # Get instance
         instance = db.query(Instance).filter(Instance.id == instance_id).first()
         if not instance:
@@ -775,13 +1020,12 @@ async def regenerate_draft(instance_id: str, db: Session = Depends(get_db)):
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
-        # Replace variables in template
-        draft_md = template.body_md
+        # Render from the current template body with the stored answers
         all_answers = instance.answers_json or {}
-        
-        for key, value in all_answers.items():
-            if value is not None:
-                draft_md = draft_md.replace(f"{{{{{key}}}}}", str(value))
+        render_start = time.perf_counter()
+        draft_md = draft_renderer.render_instance(instance.id, template.body_md, all_answers)
+        stage_seconds.observe(time.perf_counter() - render_start, stage="render")
+        draft_history.record(db, instance, template, all_answers)
         
         # Increment draft number
         instance.draft_number += 1
@@ -789,6 +1033,7 @@ async def regenerate_draft(instance_id: str, db: Session = Depends(get_db)):
         
         db.commit()
         db.refresh(instance)
+        _prefetch_docx(draft_md)
         
         return FinalDraftResponse(
             instance_id=instance.id,
@@ -802,6 +1047,36 @@ async def regenerate_draft(instance_id: str, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Regeneration failed: {str(e)}")
 
+@app.get("/api/draft/{instance_id}/revisions", response_model=list[DraftRevisionSummary])
+async def list_draft_revisions(instance_id: str, db: Session = Depends(get_db)):
+    """List the revisions of a draft, oldest first, with the answers each one changed"""
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Draft instance not found")
+    
+    return [
+        DraftRevisionSummary(
+            revision=revision.revision,
+            template_version=revision.template_version,
+            changed_keys=sorted(revision.answers_delta or {}),
+            created_at=revision.created_at
+        )
+        for revision in draft_history.list(db, instance_id)
+    ]
+
+@app.get("/api/draft/{instance_id}/revisions/{revision}", response_model=DraftRevisionResponse)
+async def get_draft_revision(instance_id: str, revision: int, db: Session = Depends(get_db)):
+    """Rebuild a past revision of a draft from its answer deltas and template version"""
+    try:
+        with time_stage("render"):
+            result = draft_history.materialize(db, instance_id, revision)
+    except ValueError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Draft revision not found")
+    
+    return DraftRevisionResponse(instance_id=instance_id, **result)
+
 @app.post("/api/draft/{instance_id}/edit", response_model=DraftResponse)
 async def edit_draft_variables(instance_id: str, db: Session = Depends(get_db)):
     """Get questions for editing draft variables"""
@@ -853,6 +1128,60 @@ async def edit_draft_variables(instance_id: str, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Edit failed: {str(e)}")
 
+@app.post("/api/draft/{instance_id}/edit/stream")
+async def edit_draft_variables_stream(instance_id: str, db: Session = Depends(get_db)):
+    """Stream questions for editing draft variables as newline-delimited JSON
+    
+    Emits {"type": "draft", ...} with the draft state first, then
+    {"type": "question", "question": {...}} as each question is generated,
+    then {"type": "done", "count": n}.
+    """
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Draft instance not found")
+    
+    template = db.query(Template).filter(Template.id == instance.template_id).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    variables = db.query(TemplateVariable).filter(
+        TemplateVariable.template_id == template.id
+    ).all()
+    
+    variable_dicts = [
+        {
+            "key": v.key,
+            "label": v.label,
+            "description": v.description,
+            "example": v.example,
+            "required": v.required,
+            "dtype": v.dtype
+        }
+        for v in variables
+    ]
+    draft = {
+        "instance_id": instance.id,
+        "template_id": template.template_id,
+        "template_title": template.title,
+        "pre_filled_variables": instance.answers_json or {},
+        "missing_variables": [v["key"] for v in variable_dicts],
+        "draft_md": instance.draft_md
+    }
+    
+    def events():
+        yield _ndjson_event("draft", **draft)
+        count = 0
+        try:
+            for question in question_generator.stream_questions(variable_dicts):
+                count += 1
+                yield _ndjson_event("question", question=QuestionSchema(**question).model_dump())
+        except Exception as e:
+            yield _ndjson_event("error", detail=f"Edit failed: {str(e)}")
+            return
+        yield _ndjson_event("done", count=count, message=f"Edit mode: {count} variables available")
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.get("/api/draft/alternatives/{template_id}")
 async def get_template_alternatives(template_id: str, user_query: str, db: Session = Depends(get_db)):
     """Get alternative templates for selection"""
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -23,6 +23,23 @@ class TemplateCreate(BaseModel):
     body_md: str
     variables: List[VariableSchema]
 
+class TemplateUpdate(BaseModel):
+    title: Optional[str] = None
+    file_description: Optional[str] = None
+    doc_type: Optional[str] = None
+    jurisdiction: Optional[str] = None
+    similarity_tags: Optional[List[str]] = None
+    body_md: Optional[str] = None
+    variables: Optional[List[VariableSchema]] = None
+
+    @field_validator("title", "body_md", "similarity_tags")
+    @classmethod
+    def not_null(cls, value):
+        # Leave these out to keep them unchanged; they cannot be cleared
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 class TemplateResponse(BaseModel):
     id: str
     template_id: str
@@ -46,6 +63,8 @@ class DocumentUploadResponse(BaseModel):
     filename: str
     extracted_text: str
     message: str
+    deduplicated: bool = False  # True when the same bytes were uploaded before
+    extraction_cached: bool = False  # True when /api/extract will be served from cache
 
 class ExtractionRequest(BaseModel):
     document_id: str
@@ -99,6 +118,32 @@ class FinalDraftResponse(BaseModel):
     draft_number: int
     message: str
 
+class DraftRevisionSummary(BaseModel):
+    revision: int
+    template_version: int
+    changed_keys: List[str]
+    created_at: datetime
+
+class DraftRevisionResponse(BaseModel):
+    instance_id: str
+    revision: int
+    template_version: int
+    answers: Dict[str, Any]
+    draft_md: str
+    created_at: datetime
+
+class PdfExportRequest(BaseModel):
+    instance_ids: List[str]
+
+class PdfExportStatus(BaseModel):
+    instance_id: str
+    status: str  # ready, queued, busy (queue full, retry later) or not_found
+    download_url: Optional[str] = None
+
+class PdfExportResponse(BaseModel):
+    exports: List[PdfExportStatus]
+    pending: int
+
 class WebSearchRequest(BaseModel):
     query: str
     num_results: int = 3
@@ -124,3 +169,49 @@ class WebBootstrapResponse(BaseModel):
     title: str
     variables_count: int
     message: str
+
+class WebAutoBootstrapRequest(BaseModel):
+    query: str
+    num_candidates: Optional[int] = None
+
+class WebCandidate(BaseModel):
+    id: str
+    title: str
+    url: str
+    score: float
+    keyword_density: Optional[float] = None
+    field_count: Optional[int] = None
+    non_legal_count: Optional[int] = None
+    rejected: Optional[str] = None
+    selected: bool = False
+
+class WebAutoBootstrapResponse(WebBootstrapResponse):
+    source_url: str
+    candidates: List[WebCandidate]
+
+# Gemini structured-output models (passed as response_schema)
+class VariableExtractionOutput(BaseModel):
+    variables: List[VariableSchema]
+    similarity_tags: List[str] = []
+    doc_type: Optional[str] = None
+    jurisdiction: Optional[str] = None
+
+class TemplateClassificationOutput(BaseModel):
+    best_match_id: str
+    confidence: float
+    justification: str
+    alternatives: List[str] = []
+
+class QuestionsOutput(BaseModel):
+    questions: List[QuestionSchema]
+
+class PrefillValue(BaseModel):
+    key: str
+    value: Optional[str] = None
+
+class PrefillOutput(BaseModel):
+    # A list of pairs, as response schemas cannot describe free-form objects
+    filled_variables: List[PrefillValue] = []
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {item.key: item.value for item in self.filled_variables}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Re-embed all templates with a new embedding model, resumably
+Switching GEMINI_EMBEDDING_MODEL (or EMBEDDING_PROVIDER) makes every stored
+vector incompatible with queries. Run this before switching:
+
+1. python reembed_templates.py --provider gemini --model text-embedding-005
+   Embeds templates in batches into a second vector slot, committing a
+   checkpoint with every batch. Interrupt it at any time and run the same
+   command again to continue after the last committed batch. The running
+   app keeps matching with the current model meanwhile.
+2. Deploy with GEMINI_EMBEDDING_MODEL=text-embedding-005. On startup each
+   worker switches templates to the new vectors without API calls; workers
+   still on the old model keep using the old vectors during the rollout.
+
+Options:
+    --status         Show the checkpoint and how many templates have target vectors
+    --restart        Ignore the checkpoint and rescan from the first template
+    --max-batches N  Stop after N batches (e.g. to spread the job over time windows)
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+from database import init_db
+from services.embedding_migration import EmbeddingMigration
+from services.embedding_providers import get_embedding_provider
+from config import settings
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+def print_progress(progress):
+    percent = 100 * progress["scanned"] / progress["templates"] if progress["templates"] else 100.0
+    print(f"[{percent:5.1f}%] {progress['scanned']:,}/{progress['templates']:,} templates, "
+          f"{progress['embedded']:,} embedded, {progress['rows_per_s']:.0f} rows/s, "
+          f"ETA {format_duration(progress['eta_s'])}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--provider", default=settings.EMBEDDING_PROVIDER, choices=["gemini", "local"])
+    parser.add_argument("--model", help="Gemini embedding model to migrate to (default: GEMINI_EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE,
+                        help="Templates per batch and per checkpoint")
+    parser.add_argument("--concurrency", type=int, default=settings.EMBEDDING_MIGRATION_CONCURRENCY,
+                        help="Batches embedded in parallel")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    parser.add_argument("--status", action="store_true", help="Only show migration status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    init_db()
+    migration = EmbeddingMigration(
+        get_embedding_provider(args.provider, args.model),
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        progress=print_progress
+    )
+
+    if args.status:
+        print(json.dumps(migration.status(), indent=2))
+        return
+
+    print(f"Re-embedding templates with {migration.target} "
+          f"(batches of {migration.batch_size}, {migration.concurrency} in parallel)")
+    try:
+        result = migration.run(restart=args.restart, max_batches=args.max_batches)
+    except KeyboardInterrupt:
+        print("Interrupted. Committed batches are kept; run the same command to resume.")
+        sys.exit(130)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if result["resumed_rows"]:
+        print(f"Resumed after {result['resumed_rows']:,} templates from a previous run")
+    print(f"Embedded {result['embedded']:,} templates in {result['elapsed_s']}s")
+    if result["complete"]:
+        print(f"Complete: every template has a {migration.target} vector")
+    else:
+        print("Stopped before the end; run the same command to continue")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,12 @@ CREATE TABLE templates (
     similarity_tags TEXT, -- JSON array
     body_md TEXT NOT NULL,
     embedding TEXT, -- JSON array of floats
+    embedding_model TEXT, -- e.g. gemini:text-embedding-004 or local:hashing-ngram-512
+    embedding_hash TEXT, -- SHA-256 of the embedded text, to skip re-embedding unchanged templates
+    secondary_embedding TEXT, -- JSON array: vector from a second model during/after an embedding migration
+    secondary_embedding_model TEXT,
+    secondary_embedding_hash TEXT,
+    version INTEGER DEFAULT 1, -- incremented when body_md changes
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -44,9 +50,12 @@ CREATE TABLE documents (
     raw_text TEXT,
     file_path TEXT,
     embedding TEXT, -- JSON array of floats
+    content_hash TEXT, -- SHA-256 of the uploaded bytes
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE UNIQUE INDEX ix_documents_content_hash ON documents(content_hash);
+
 -- Instances table (draft history)
 CREATE TABLE instances (
     id TEXT PRIMARY KEY,
@@ -60,3 +69,94 @@ CREATE TABLE instances (
 );
 
 CREATE INDEX idx_instances_template_id ON instances(template_id);
+
+-- Previous template bodies, so old draft revisions can be re-rendered
+CREATE TABLE template_versions (
+    id TEXT PRIMARY KEY,
+    template_row_id TEXT NOT NULL, -- templates.id
+    version INTEGER NOT NULL,
+    body_md TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (template_row_id, version)
+);
+
+CREATE INDEX idx_template_versions_template_row_id ON template_versions(template_row_id);
+
+-- Draft history: answer deltas per revision; drafts are re-rendered on demand
+CREATE TABLE instance_revisions (
+    id TEXT PRIMARY KEY,
+    instance_id TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    template_row_id TEXT NOT NULL, -- templates.id
+    template_version INTEGER NOT NULL,
+    answers_delta TEXT, -- JSON object: answers changed since the previous revision
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (instance_id, revision),
+    FOREIGN KEY (instance_id) REFERENCES instances(id)
+);
+
+CREATE INDEX idx_instance_revisions_instance_id ON instance_revisions(instance_id);
+
+-- Catalogue state (single row, version bumped whenever templates change)
+CREATE TABLE catalogue_state (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalogue_state (id, version) VALUES (1, 0);
+
+-- Templates touched by each catalogue version, for incremental snapshot updates
+CREATE TABLE catalogue_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version INTEGER NOT NULL,
+    template_row_id TEXT NOT NULL, -- templates.id
+    op TEXT NOT NULL -- upsert or delete
+);
+
+CREATE INDEX idx_catalogue_changes_version ON catalogue_changes(version);
+
+-- Checkpoints of resumable embedding migrations (reembed_templates.py)
+CREATE TABLE embedding_migrations (
+    target_model TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running', -- running or complete
+    last_row_id TEXT NOT NULL DEFAULT '', -- templates.id of the last committed batch
+    embedded_count INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Extraction results per (document text hash, model, prompt version)
+CREATE TABLE extraction_cache (
+    id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    result TEXT, -- JSON object
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (content_hash, model_name, prompt_version)
+);
+
+-- Per-chunk extraction results, reused when only part of a document changes
+CREATE TABLE extraction_chunk_cache (
+    id TEXT PRIMARY KEY,
+    chunk_hash TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    result TEXT, -- JSON object
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (chunk_hash, model_name, prompt_version)
+);
+
+-- Web search, search-term and page content cache (TTL)
+CREATE TABLE web_cache (
+    id TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    cache_key TEXT NOT NULL,
+    value TEXT, -- JSON
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    UNIQUE (namespace, cache_key)
+);
+
+CREATE INDEX idx_web_cache_expires_at ON web_cache(expires_at);
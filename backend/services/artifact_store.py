@@ -0,0 +1,180 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from services.metrics import record_cache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class ArtifactStore:
+    """Content-addressed cache of generated export files on local disk
+
+    An artifact is named after the hash of the content it was generated from
+    and the generator version (see ``key``), so a draft that has not changed
+    since its last export is served from the file written then, and any edit
+    or generator change simply produces a new name. Files are written to a
+    temporary name and moved into place with os.replace, so several worker
+    processes can share the directory.
+
+    Reading an artifact touches its modification time. When the directory
+    grows past ``max_bytes``, the least recently used files are deleted.
+    """
+
+    # Temporary files older than this are left over from a crashed writer
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(
+        self,
+        directory: str = settings.ARTIFACT_DIR,
+        max_bytes: int = settings.ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+        workers: int = settings.ARTIFACT_WORKERS
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="artifacts")
+        # File name -> generation in progress in this process
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    @staticmethod
+    def key(content: str, generator: str) -> str:
+        """Artifact key for ``content`` rendered by ``generator`` (a name and version)"""
+        return hashlib.sha256(f"{generator}\0{content}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """Path of a stored artifact (marking it recently used), or None"""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            record_cache("artifact", False)
+            return None
+        record_cache("artifact", True)
+        return path
+
+    def get_or_create(self, key: str, suffix: str, generate: Callable[[str], object]) -> Path:
+        """Stored artifact, waiting for or running ``generate(output_path)`` if needed"""
+        path = self.get(key, suffix)
+        if path is not None:
+            return path
+
+        with self._lock:
+            future = self._inflight.get(f"{key}{suffix}")
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass  # Generate again in this thread so the caller sees the error
+        return self._create(key, suffix, generate)
+
+    def prefetch(self, key: str, suffix: str, generate: Callable[[str], object]):
+        """Generate an artifact in the background unless it is stored or in progress"""
+        name = f"{key}{suffix}"
+        with self._lock:
+            if name in self._inflight or self.path(key, suffix).exists():
+                return
+            future = self._executor.submit(self._create, key, suffix, generate)
+            self._inflight[name] = future
+
+        def _done(f: Future):
+            with self._lock:
+                self._inflight.pop(name, None)
+            if f.exception():
+                logger.warning(f"Background generation of {name} failed: {f.exception()}")
+
+        future.add_done_callback(_done)
+
+    def _create(self, key: str, suffix: str, generate: Callable[[str], object]) -> Path:
+        tmp_path = self.temp_path(key, suffix)
+        try:
+            generate(tmp_path)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return self.publish(tmp_path, key, suffix)
+
+    def temp_path(self, key: str, suffix: str) -> str:
+        """New temporary file in the store directory, to be passed to ``publish`` or ``discard``"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{key}{suffix}", suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+
+    def publish(self, tmp_path: str, key: str, suffix: str) -> Path:
+        """Move a generated file into place as the artifact for ``key``"""
+        path = self.path(key, suffix)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    @staticmethod
+    def discard(tmp_path: str):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def remove_stale_temp_files(self) -> int:
+        """Delete temporary files abandoned by writers that died; returns the number removed
+
+        Only files older than STALE_TEMP_SECONDS are removed, since other
+        worker processes may be writing to the same directory.
+        """
+        cutoff = time.time() - self.STALE_TEMP_SECONDS
+        removed = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".tmp") and entry.is_file() and entry.stat().st_mtime < cutoff:
+                        try:
+                            os.remove(entry.path)
+                            removed += 1
+                        except OSError:
+                            continue
+        except FileNotFoundError:
+            return 0
+        if removed:
+            logger.info(f"Removed {removed} stale temporary files from {self.directory}")
+        return removed
+
+    def _files(self) -> List[Tuple[str, os.stat_result]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    entries.append((entry.path, entry.stat()))
+        return entries
+
+    def _evict(self, keep: Path):
+        """Delete least recently used artifacts until the directory fits in max_bytes"""
+        with self._evict_lock:
+            try:
+                files = self._files()
+            except OSError:
+                return
+            total = sum(stat.st_size for _, stat in files)
+            if total <= self.max_bytes:
+                return
+            removed = 0
+            for file_path, stat in sorted(files, key=lambda item: item[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                if file_path == str(keep):
+                    continue
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    continue  # Already evicted by another worker
+                total -= stat.st_size
+                removed += 1
+            logger.info(f"Evicted {removed} artifacts ({total / 1024 / 1024:.1f} MB kept)")
+
+artifact_store = ArtifactStore()
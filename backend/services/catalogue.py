@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, Optional
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from database import CatalogueState, CatalogueChange
+from config import settings
+
+class Catalogue:
+    """Version counter for the template catalogue
+
+    Every change to the set of templates (save, update, delete, bootstrap,
+    re-embed) bumps the version, so caches and indexes built from the
+    catalogue can tell when they are stale. The counter lives in the database
+    so all worker processes agree.
+
+    Each bump also records which templates it touched, so an index built for
+    an older version can be brought up to date by applying the changes
+    instead of being rebuilt from the whole table.
+    """
+
+    STATE_ID = 1
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+    @staticmethod
+    def get_version(db: Session) -> int:
+        """Current catalogue version"""
+        state = db.get(CatalogueState, Catalogue.STATE_ID)
+        return state.version if state else 0
+
+    @staticmethod
+    def bump_version(
+        db: Session,
+        changed: Iterable[str] = (),
+        deleted: Iterable[str] = (),
+        change_log_size: int = settings.CATALOGUE_CHANGE_LOG_SIZE
+    ) -> int:
+        """Increment the catalogue version as part of the caller's transaction
+
+        Args:
+            changed: Template.id values added or modified by this change
+            deleted: Template.id values removed by this change
+
+        The caller is responsible for committing. A bump without any ids is
+        still valid, but forces indexes to rebuild instead of updating.
+        """
+        bump = (
+            update(CatalogueState)
+            .where(CatalogueState.id == Catalogue.STATE_ID)
+            .values(version=CatalogueState.version + 1)
+        )
+        if db.execute(bump).rowcount == 0:
+            # init_db seeds the row; without it, create it in a way concurrent bumps cannot conflict on
+            db.execute(insert(CatalogueState).values(id=Catalogue.STATE_ID, version=0).on_conflict_do_nothing())
+            db.execute(bump)
+        version = Catalogue.get_version(db)
+
+        for template_row_id in changed:
+            db.add(CatalogueChange(version=version, template_row_id=template_row_id, op=Catalogue.UPSERT))
+        for template_row_id in deleted:
+            db.add(CatalogueChange(version=version, template_row_id=template_row_id, op=Catalogue.DELETE))
+        db.query(CatalogueChange).filter(CatalogueChange.version <= version - change_log_size).delete()
+        return version
+
+    @staticmethod
+    def changes_between(db: Session, from_version: int, to_version: int) -> Optional[Dict[str, str]]:
+        """Net change per template from ``from_version`` (exclusive) to ``to_version``
+
+        Returns:
+            Template.id -> "upsert" or "delete" (the last operation wins), or
+            None if any version in the range has no recorded changes
+        """
+        changes = (
+            db.query(CatalogueChange)
+            .filter(CatalogueChange.version > from_version, CatalogueChange.version <= to_version)
+            .order_by(CatalogueChange.version, CatalogueChange.id)
+            .all()
+        )
+        if {c.version for c in changes} != set(range(from_version + 1, to_version + 1)):
+            return None
+
+        net: Dict[str, str] = {}
+        for change in changes:
+            net.pop(change.template_row_id, None)
+            net[change.template_row_id] = change.op
+        return net
+
+catalogue = Catalogue()
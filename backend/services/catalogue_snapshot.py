@@ -0,0 +1,282 @@
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import numpy as np
+from sqlalchemy.orm import Session
+from database import Template
+from services.catalogue import catalogue
+from services.embedding_service import embedding_service
+from services.metrics import record_cache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class Snapshot:
+    """Read-only view of one catalogue version for one embedding model
+
+    ``matrix`` holds L2-normalized template vectors, one row per template,
+    memory-mapped from disk so worker processes share it through the OS page
+    cache. ``templates`` holds the metadata needed to rank and describe
+    candidates without loading rows from the database, and ``tag_index`` maps
+    each lowercased similarity tag to the rows that carry it.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        model_id: str,
+        templates: List[Dict[str, Any]],
+        matrix: np.ndarray,
+        tag_index: Dict[str, List[int]]
+    ):
+        self.version = version
+        self.model_id = model_id
+        self.templates = templates
+        self.matrix = matrix
+        self.tag_index = tag_index
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def search(self, query_vector: List[float], top_k: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """Top K templates by cosine similarity to the query vector"""
+        if not len(self):
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.matrix @ (query / norm if norm else query)
+
+        top_k = min(top_k, len(scores))
+        order = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = order[np.argsort(-scores[order])]
+        return [(self.templates[i], float(scores[i])) for i in order]
+
+    def related(self, template_id: str, limit: int = 2) -> List[Dict[str, Any]]:
+        """Other templates ordered by the number of similarity tags they share"""
+        rows = [i for i, t in enumerate(self.templates) if t["template_id"] == template_id]
+        shared: Dict[int, int] = {}
+        for row in rows:
+            for tag in self.templates[row]["similarity_tags"]:
+                for other in self.tag_index.get(tag.lower(), []):
+                    shared[other] = shared.get(other, 0) + 1
+
+        candidates = [i for i, t in enumerate(self.templates) if t["template_id"] != template_id]
+        candidates.sort(key=lambda i: -shared.get(i, 0))  # Stable: catalogue order breaks ties
+        return [self.templates[i] for i in candidates[:limit]]
+
+class CatalogueSnapshot:
+    """Warm-start snapshots of the template catalogue
+
+    A snapshot is a pair of files per catalogue version and embedding model:
+    an .npy matrix of normalized template vectors and a .json file with the
+    template metadata and tag index. Files are written to a temporary name
+    and moved into place with os.replace, the matrix first and the metadata
+    last, so readers never see a partial snapshot.
+
+    A process loads the snapshot for the current version when it is first
+    needed (or at startup); if another worker already wrote it, loading is a
+    memory map and a small JSON read. When the catalogue version changes, the
+    next lookup loads the snapshot for the new version, or derives it from the
+    previous one by applying the recorded template changes. The full table is
+    only read when the change log does not cover the gap.
+    """
+
+    def __init__(self, directory: str = settings.CATALOGUE_SNAPSHOT_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Snapshot] = {}
+
+    @staticmethod
+    def _slug(model_id: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', model_id)
+
+    def _paths(self, version: int, model_id: str) -> Tuple[Path, Path]:
+        stem = f"catalogue-v{version}-{self._slug(model_id)}"
+        return self.directory / f"{stem}.npy", self.directory / f"{stem}.json"
+
+    def get(self, db: Session, model_id: Optional[str] = None) -> Snapshot:
+        """Snapshot of the current catalogue version for ``model_id``
+
+        Args:
+            model_id: Embedding model of the vectors (defaults to the active provider)
+        """
+        model_id = model_id or embedding_service.model_id
+        version = catalogue.get_version(db)
+
+        snapshot = self._loaded.get(model_id)
+        if snapshot and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            previous = self._loaded.get(model_id)
+            if previous and previous.version == version:
+                return previous
+
+            snapshot = self._read(version, model_id)
+            record_cache("catalogue_snapshot", snapshot is not None)
+            if snapshot is None:
+                if previous and previous.version < version:
+                    snapshot = self._update(db, previous, version)
+                if snapshot is None:
+                    snapshot = self._build(db, version, model_id)
+                self._write(snapshot)
+            self._loaded[model_id] = snapshot
+            return snapshot
+
+    def _read(self, version: int, model_id: str) -> Optional[Snapshot]:
+        matrix_path, meta_path = self._paths(version, model_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["templates"]:
+                matrix = np.load(matrix_path, mmap_mode="r")
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return Snapshot(version, model_id, meta["templates"], matrix, meta["tag_index"])
+
+    @staticmethod
+    def _metadata(template: Template) -> Dict[str, Any]:
+        return {
+            "id": template.id,
+            "template_id": template.template_id,
+            "title": template.title,
+            "doc_type": template.doc_type,
+            "jurisdiction": template.jurisdiction,
+            "similarity_tags": template.similarity_tags or []
+        }
+
+    @staticmethod
+    def _tag_index(metadata: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+        tag_index: Dict[str, List[int]] = {}
+        for row, meta in enumerate(metadata):
+            for tag in {tag.lower() for tag in meta["similarity_tags"]}:
+                tag_index.setdefault(tag, []).append(row)
+        return tag_index
+
+    @staticmethod
+    def _normalized(vectors: List[List[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def _build(self, db: Session, version: int, model_id: str) -> Snapshot:
+        templates = db.query(Template).all()
+        pairs = embedding_service.template_vectors(templates, model_id)
+
+        metadata = [self._metadata(template) for template, _ in pairs]
+        if pairs:
+            matrix = self._normalized([vector for _, vector in pairs])
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        logger.info(f"Built catalogue snapshot v{version} for {model_id} ({len(metadata)} templates)")
+        return Snapshot(version, model_id, metadata, matrix, self._tag_index(metadata))
+
+    def _update(self, db: Session, previous: Snapshot, version: int) -> Optional[Snapshot]:
+        """Apply the template changes since ``previous`` to a copy of it
+
+        Only the changed rows are loaded from the database. Returns None when
+        the change log does not cover every version in between, so the caller
+        falls back to a full build.
+        """
+        changes = catalogue.changes_between(db, previous.version, version)
+        if changes is None:
+            return None
+
+        upserted = [row_id for row_id, op in changes.items() if op == catalogue.UPSERT]
+        templates = {t.id: t for t in db.query(Template).filter(Template.id.in_(upserted)).all()} if upserted else {}
+        vectors = {
+            template.id: vector
+            for template, vector in embedding_service.template_vectors(list(templates.values()), previous.model_id)
+        }
+
+        rows = {meta["id"]: row for row, meta in enumerate(previous.templates)}
+        metadata = list(previous.templates)
+        matrix = np.array(previous.matrix, dtype=np.float32)
+        removed, added_metadata, added_vectors = set(), [], []
+        for row_id in changes:
+            row = rows.get(row_id)
+            if row_id not in vectors:
+                # Deleted, or no longer embedded by this snapshot's model
+                if row is not None:
+                    removed.add(row)
+                continue
+            vector = self._normalized([vectors[row_id]])
+            if len(previous) and vector.shape[1] != matrix.shape[1]:
+                return None
+            if row is None:
+                added_metadata.append(self._metadata(templates[row_id]))
+                added_vectors.append(vector)
+            else:
+                metadata[row] = self._metadata(templates[row_id])
+                matrix[row] = vector[0]
+
+        if removed:
+            keep = [row for row in range(len(metadata)) if row not in removed]
+            metadata = [metadata[row] for row in keep]
+            matrix = matrix[keep]
+        if added_vectors:
+            metadata.extend(added_metadata)
+            matrix = np.vstack([matrix] + added_vectors) if len(matrix) else np.vstack(added_vectors)
+        if not metadata:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        logger.info(f"Updated catalogue snapshot v{previous.version} -> v{version} for {previous.model_id} "
+                    f"({len(changes)} changed, {len(metadata)} templates)")
+        return Snapshot(version, previous.model_id, metadata, matrix, self._tag_index(metadata))
+
+    def _write(self, snapshot: Snapshot):
+        """Persist a snapshot atomically; failures only cost the warm start"""
+        matrix_path, meta_path = self._paths(snapshot.version, snapshot.model_id)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if len(snapshot):
+                self._atomic_write(matrix_path, lambda f: np.save(f, snapshot.matrix))
+            self._atomic_write(meta_path, lambda f: f.write(json.dumps({
+                "version": snapshot.version,
+                "model_id": snapshot.model_id,
+                "templates": snapshot.templates,
+                "tag_index": snapshot.tag_index
+            }).encode("utf-8")))
+            self._remove_stale(snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write catalogue snapshot: {str(e)}")
+
+    def _atomic_write(self, path: Path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _remove_stale(self, snapshot: Snapshot):
+        """Delete older versions; processes that still map them keep their copy until reload
+
+        Newer versions are kept: a worker still on an older catalogue version
+        must not delete a snapshot a peer has just published.
+        """
+        name = re.compile(rf'catalogue-v(\d+)-{re.escape(self._slug(snapshot.model_id))}\.(?:npy|json)')
+        for path in self.directory.glob("catalogue-v*"):
+            match = name.fullmatch(path.name)
+            if match and int(match.group(1)) < snapshot.version:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+catalogue_snapshot = CatalogueSnapshot()
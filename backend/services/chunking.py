@@ -0,0 +1,145 @@
+from typing import List, Optional, Tuple
+import math
+import re
+from config import settings
+
+# Rough average for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of model tokens in a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class TextChunker:
+    """Split documents into token-bounded chunks for LLM extraction
+
+    Text is split into paragraphs at blank lines. Paragraphs that are too
+    large are split into lines (PDF text often has no blank lines), then
+    sentences, then word windows. The original whitespace between units is
+    kept, so every chunk is a contiguous slice of the document.
+
+    Units are packed greedily into chunks of a balanced target size, so a
+    document that needs N calls is split into N chunks of similar size rather
+    than N-1 full chunks and a small remainder. Consecutive chunks share up to
+    ``overlap_tokens`` of trailing context so fields spanning a boundary are
+    seen whole by at least one call.
+    """
+
+    # Split levels for oversized text, coarsest first. Sentence boundaries skip
+    # common abbreviations ("Mr.", "Rs.", "No.") that precede names and amounts.
+    SPLIT_PATTERNS = [
+        re.compile(r'\n\s*\n'),
+        re.compile(r'\n'),
+        re.compile(
+            r'(?<!\bMr\.)(?<!\bMs\.)(?<!\bDr\.)(?<!\bRs\.)(?<!\bNo\.)(?<!\bMrs\.)(?<!\bSt\.)'
+            r'(?<=[.!?;])\s+(?=["\'(\[]?[A-Z])'
+        ),
+        re.compile(r' +'),
+    ]
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 4))
+
+    @staticmethod
+    def for_context_window(
+        context_tokens: int = settings.EXTRACTION_CONTEXT_TOKENS,
+        reserved_tokens: int = settings.EXTRACTION_RESERVED_TOKENS,
+        max_chunk_tokens: int = settings.EXTRACTION_MAX_CHUNK_TOKENS,
+        overlap_tokens: int = settings.EXTRACTION_CHUNK_OVERLAP_TOKENS
+    ) -> "TextChunker":
+        """Chunker sized to fill the model's context window
+
+        ``reserved_tokens`` covers the prompt instructions, previously found
+        variables and the response. ``max_chunk_tokens`` caps the chunk size so
+        the JSON response for one chunk still fits in the output token limit.
+        """
+        available = max(512, context_tokens - reserved_tokens)
+        return TextChunker(min(available, max_chunk_tokens), overlap_tokens)
+
+    @staticmethod
+    def _split_keep(pattern: re.Pattern, separator: str, text: str) -> List[Tuple[str, str]]:
+        """Split text, returning (preceding separator, piece) pairs"""
+        pieces = []
+        position = 0
+        for match in pattern.finditer(text):
+            pieces.append((separator, text[position:match.start()]))
+            separator = match.group(0)
+            position = match.end()
+        pieces.append((separator, text[position:]))
+        return [(sep, piece) for sep, piece in pieces if piece]
+
+    def _split(self, separator: str, text: str, level: int) -> List[Tuple[str, str]]:
+        if estimate_tokens(text) <= self.max_tokens:
+            return [(separator, text)]
+
+        if level == len(self.SPLIT_PATTERNS):
+            # A single word longer than a chunk is cut at the character limit
+            limit = self.max_tokens * CHARS_PER_TOKEN
+            return [(separator if i == 0 else '', text[i:i + limit]) for i in range(0, len(text), limit)]
+
+        units = []
+        for sep, piece in self._split_keep(self.SPLIT_PATTERNS[level], separator, text):
+            units.extend(self._split(sep, piece, level + 1))
+        return units
+
+    def units(self, text: str) -> List[Tuple[str, str]]:
+        """(separator, unit) pairs, each unit within the chunk limit"""
+        units = []
+        for separator, paragraph in self._split_keep(self.SPLIT_PATTERNS[0], '', text.strip()):
+            units.extend(self._split(separator, paragraph, 1))
+        return units
+
+    @staticmethod
+    def _join(units: List[Tuple[str, str]]) -> str:
+        return units[0][1] + ''.join(sep + unit for sep, unit in units[1:])
+
+    def chunk(self, text: str, target_tokens: Optional[int] = None) -> List[str]:
+        """Split text into chunks of at most ``max_tokens`` approximate tokens"""
+        units = self.units(text)
+        if not units:
+            return []
+
+        unit_tokens = [estimate_tokens(sep + unit) for sep, unit in units]
+        total = sum(unit_tokens)
+        if total <= self.max_tokens:
+            return [self._join(units)]
+
+        # Balance chunk sizes for the minimum number of calls
+        if target_tokens is None:
+            effective = self.max_tokens - self.overlap_tokens
+            num_chunks = math.ceil(total / effective)
+            target_tokens = min(self.max_tokens, math.ceil(total / num_chunks) + self.overlap_tokens)
+
+        chunks = []
+        current, current_tokens, has_new_content = [], 0, False
+        for unit, tokens in zip(units, unit_tokens):
+            if has_new_content and current_tokens + tokens > target_tokens:
+                chunks.append(self._join(current))
+                current, current_tokens = self._overlap_tail(current)
+                if current_tokens + tokens > self.max_tokens:
+                    current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+            has_new_content = True
+
+        if current:
+            chunks.append(self._join(current))
+
+        return chunks
+
+    def _overlap_tail(self, units: List[Tuple[str, str]]):
+        """Trailing units of a finished chunk to repeat at the start of the next"""
+        tail, tail_tokens = [], 0
+        for unit in reversed(units):
+            tokens = estimate_tokens(unit[0] + unit[1])
+            if tail_tokens + tokens > self.overlap_tokens:
+                break
+            tail.insert(0, unit)
+            tail_tokens += tokens
+        # Never repeat a whole chunk
+        if len(tail) == len(units):
+            return [], 0
+        return tail, tail_tokens
@@ -1,8 +1,8 @@
-import docx
-import PyPDF2
-import pdfplumber
 from typing import Optional
 import io
+import logging
+
+logger = logging.getLogger(__name__)
 
 class DocumentParser:
     """Parse DOCX and PDF documents to extract text"""
@@ -12,6 +12,8 @@ class DocumentParser:
     @staticmethod
     def parse_docx(file_content: bytes) -> str:
         """Extract text from DOCX file"""
+        import docx  # Deferred: parser libraries are only needed for uploads
+        
         try:
             doc = docx.Document(io.BytesIO(file_content))
             text_parts = []
@@ -31,7 +33,7 @@ class DocumentParser:
             # Limit text length to prevent memory issues
             if len(full_text) > DocumentParser.MAX_TEXT_LENGTH:
                 full_text = full_text[:DocumentParser.MAX_TEXT_LENGTH]
-                print(f"Warning: DOCX text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
+                logger.warning(f"DOCX text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
             return full_text
         except Exception as e:
             raise ValueError(f"Failed to parse DOCX: {str(e)}")
@@ -39,6 +41,8 @@ class DocumentParser:
     @staticmethod
     def parse_pdf(file_content: bytes) -> str:
         """Extract text from PDF file using pdfplumber (better for complex layouts)"""
+        import pdfplumber
+        
         try:
             text_parts = []
             
@@ -57,7 +61,7 @@ class DocumentParser:
             # Limit text length to prevent memory issues
             if len(full_text) > DocumentParser.MAX_TEXT_LENGTH:
                 full_text = full_text[:DocumentParser.MAX_TEXT_LENGTH]
-                print(f"Warning: PDF text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
+                logger.warning(f"PDF text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
             return full_text
         except Exception as e:
             # Try fallback method
@@ -69,6 +73,8 @@ class DocumentParser:
     @staticmethod
     def _parse_pdf_pypdf2(file_content: bytes) -> str:
         """Fallback PDF parser using PyPDF2"""
+        import PyPDF2
+        
         text_parts = []
         pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
         
@@ -81,7 +87,7 @@ class DocumentParser:
         # Limit text length to prevent memory issues
         if len(full_text) > DocumentParser.MAX_TEXT_LENGTH:
             full_text = full_text[:DocumentParser.MAX_TEXT_LENGTH]
-            print(f"Warning: PDF (PyPDF2) text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
+            logger.warning(f"PDF (PyPDF2) text truncated to {DocumentParser.MAX_TEXT_LENGTH} characters")
         return full_text
     
     @staticmethod
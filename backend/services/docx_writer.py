@@ -0,0 +1,194 @@
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+import io
+import re
+import struct
+import threading
+import zipfile
+import zlib
+
+# Characters lxml refuses in XML text (python-docx raises on them)
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+BOLD = re.compile(r'\*\*(.*?)\*\*')
+NUMBERED = re.compile(r'^\d+\.\s')
+
+FONT = '<w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman"/>'
+# Run properties python-docx writes for each kind of run
+RUN_PLAIN = f'<w:rPr>{FONT}<w:sz w:val="24"/></w:rPr>'
+RUN_BOLD = f'<w:rPr>{FONT}<w:b/><w:sz w:val="24"/></w:rPr>'
+RUN_HEADING = {
+    1: f'<w:rPr>{FONT}<w:b/><w:sz w:val="32"/></w:rPr>',
+    2: f'<w:rPr>{FONT}<w:b/><w:sz w:val="28"/></w:rPr>',
+    3: f'<w:rPr>{FONT}<w:b/><w:sz w:val="24"/></w:rPr>',
+}
+PARA_HEADING = {level: f'<w:pPr><w:pStyle w:val="Heading{level}"/><w:jc w:val="left"/></w:pPr>' for level in RUN_HEADING}
+PARA_JUSTIFIED = '<w:pPr><w:jc w:val="both"/></w:pPr>'
+PARA_BODY = '<w:pPr><w:spacing w:line="360" w:lineRule="auto"/><w:jc w:val="both"/></w:pPr>'
+PARA_BULLET = '<w:pPr><w:pStyle w:val="ListBullet"/><w:ind w:left="720"/></w:pPr>'
+# Every entry gets the same date (the DOS epoch, 1980-01-01 00:00), so a draft always gives the same bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+PARA_NUMBER = '<w:pPr><w:pStyle w:val="ListNumber"/><w:ind w:left="720"/></w:pPr>'
+
+class _Entry:
+    """A precompressed part of the skeleton package"""
+
+    def __init__(self, name: str, data: bytes):
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self.name = name.encode("utf-8")
+        self.crc = zlib.crc32(data)
+        self.size = len(data)
+        self.compressed = compressor.compress(data) + compressor.flush()
+
+class DocxWriter:
+    """Write DOCX files straight from draft markdown, without python-docx objects
+
+    The package is a skeleton saved once by python-docx with the page setup,
+    styles and properties DocxGenerator applies, so every part except
+    word/document.xml is copied as-is. Those parts are deflated once; each
+    document only compresses its own body, written paragraph by paragraph as
+    the same XML python-docx would produce for the markdown subset drafts
+    use (headings, bold runs, bullet and numbered lists, paragraphs).
+    """
+
+    # Paragraph XML is joined and compressed this many lines at a time
+    CHUNK_LINES = 512
+
+    def __init__(self):
+        self._skeleton: Optional[Tuple[List[_Entry], str, str]] = None
+        self._lock = threading.Lock()
+
+    def _load_skeleton(self) -> Tuple[List[_Entry], str, str]:
+        if self._skeleton is None:
+            with self._lock:
+                if self._skeleton is None:
+                    from services.docx_generator import DocxGenerator
+
+                    buffer = io.BytesIO()
+                    DocxGenerator.new_document().save(buffer)
+                    entries, head, tail = [], None, None
+                    with zipfile.ZipFile(buffer) as package:
+                        for info in package.infolist():
+                            data = package.read(info)
+                            if info.filename == "word/document.xml":
+                                document = data.decode("utf-8")
+                                body = document.index("<w:body>") + len("<w:body>")
+                                head, tail = document[:body], document[document.index("<w:sectPr", body):]
+                                entries.append(None)
+                            else:
+                                entries.append(_Entry(info.filename, data))
+                    self._skeleton = (entries, head, tail)
+        return self._skeleton
+
+    @staticmethod
+    def _text(text: str) -> str:
+        """Run content for ``text``: w:t elements split at tabs and line breaks"""
+        out = []
+        for piece in re.split(r'(\t|\r|\n)', INVALID_XML_CHARS.sub('', text)):
+            if piece == '\t':
+                out.append('<w:tab/>')
+            elif piece in ('\r', '\n'):
+                out.append('<w:br/>')
+            elif piece:
+                escaped = piece.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+                if len(piece.strip()) < len(piece):
+                    out.append(f'<w:t xml:space="preserve">{escaped}</w:t>')
+                else:
+                    out.append(f'<w:t>{escaped}</w:t>')
+        return "".join(out)
+
+    @classmethod
+    def _run(cls, properties: str, text: str) -> str:
+        return f'<w:r>{properties}{cls._text(text)}</w:r>'
+
+    @classmethod
+    def paragraph(cls, line: str) -> str:
+        """document.xml markup for one markdown line (see DocxGenerator.markdown_to_docx)"""
+        stripped = line.strip()
+        if not stripped:
+            return '<w:p/>'
+
+        for level, prefix in ((1, '# '), (2, '## '), (3, '### ')):
+            if stripped.startswith(prefix):
+                text = stripped[len(prefix):]
+                run = cls._run(RUN_HEADING[level], text) if text else ''
+                return f'<w:p>{PARA_HEADING[level]}{run}</w:p>'
+
+        if '*' in stripped:
+            runs, text = [], stripped
+            while text:
+                match = BOLD.search(text)
+                if not match:
+                    runs.append(cls._run(RUN_PLAIN, text))
+                    break
+                if match.start():
+                    runs.append(cls._run(RUN_PLAIN, text[:match.start()]))
+                runs.append(cls._run(RUN_BOLD, match.group(1)))
+                text = text[match.end():]
+            return f'<w:p>{PARA_JUSTIFIED}{"".join(runs)}</w:p>'
+
+        if stripped.startswith('- '):
+            properties, text = PARA_BULLET, stripped[2:]
+        elif NUMBERED.match(stripped):
+            properties, text = PARA_NUMBER, stripped[3:]
+        else:
+            properties, text = PARA_BODY, stripped
+        run = cls._run(RUN_PLAIN, text) if text else ''
+        return f'<w:p>{properties}{run}</w:p>'
+
+    def _document_xml(self, lines: List[str]) -> Iterator[bytes]:
+        _, head, tail = self._load_skeleton()
+        yield head.encode("utf-8")
+        for start in range(0, len(lines), self.CHUNK_LINES):
+            chunk = lines[start:start + self.CHUNK_LINES]
+            yield "".join(self.paragraph(line) for line in chunk).encode("utf-8")
+        yield tail.encode("utf-8")
+
+    def write(self, lines: List[str], stream: BinaryIO):
+        """Write a DOCX package for cleaned markdown ``lines`` to a binary stream"""
+        entries, _, _ = self._load_skeleton()
+        year, month, day, hour, minute, second = ZIP_DATE_TIME
+        dos_time = (hour << 11) | (minute << 5) | (second // 2)
+        dos_date = ((year - 1980) << 9) | (month << 5) | day
+
+        offset, central = 0, []
+        for entry in entries:
+            if entry is None:
+                entry = self._compress_document(self._document_xml(lines))
+            header = struct.pack(
+                "<IHHHHHIIIHH", 0x04034b50, 20, 0, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                entry.crc, len(entry.compressed), entry.size, len(entry.name), 0
+            )
+            stream.write(header + entry.name)
+            stream.write(entry.compressed)
+            central.append(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014b50, 20, 20, 0, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                entry.crc, len(entry.compressed), entry.size, len(entry.name), 0, 0, 0, 0, 0, offset
+            ) + entry.name)
+            offset += len(header) + len(entry.name) + len(entry.compressed)
+
+        directory = b"".join(central)
+        stream.write(directory)
+        stream.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(central), len(central), len(directory), offset, 0))
+
+    @staticmethod
+    def normalize_timestamps(path: str):
+        """Rewrite a DOCX package with every entry dated ZIP_DATE_TIME (for packages saved by python-docx)"""
+        with open(path, "rb") as f:
+            source = io.BytesIO(f.read())
+        with zipfile.ZipFile(source) as package, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as out:
+            for info in package.infolist():
+                out.writestr(zipfile.ZipInfo(info.filename, ZIP_DATE_TIME), package.read(info), zipfile.ZIP_DEFLATED)
+
+    @staticmethod
+    def _compress_document(chunks: Iterable[bytes]) -> _Entry:
+        entry = _Entry.__new__(_Entry)
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed, crc, size = [], 0, 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            compressed.append(compressor.compress(chunk))
+        compressed.append(compressor.flush())
+        entry.name, entry.crc, entry.size, entry.compressed = b"word/document.xml", crc, size, b"".join(compressed)
+        return entry
+
+docx_writer = DocxWriter()
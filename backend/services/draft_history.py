@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import logging
+import threading
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import Instance, Template, TemplateVersion, InstanceRevision
+from services.draft_renderer import draft_renderer
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class DraftHistory:
+    """Revision history of draft instances, stored as answer deltas
+
+    Each finalize or regenerate appends a revision holding only the answers
+    that changed since the previous revision (all answers for the first one)
+    and the template version it was rendered from. A past draft is rebuilt
+    by folding the deltas and rendering the template body of that version,
+    so the history costs a few small JSON rows per draft rather than a full
+    markdown copy per revision. Template bodies replaced by an edit are kept
+    in template_versions for this purpose.
+    """
+
+    def __init__(self, cache_size: int = settings.DRAFT_REVISION_CACHE_SIZE):
+        self.cache_size = cache_size
+        # (instance_id, revision) -> draft markdown; revisions never change once written
+        self._drafts: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def archive_template(db: Session, template: Template):
+        """Keep the current body of a template before it is edited or deleted"""
+        version = template.version or 1
+        exists = db.query(TemplateVersion.id).filter(
+            TemplateVersion.template_row_id == template.id,
+            TemplateVersion.version == version
+        ).first()
+        if not exists:
+            db.add(TemplateVersion(template_row_id=template.id, version=version, body_md=template.body_md))
+
+    @staticmethod
+    def lock_instance(db: Session, instance_id: str):
+        """Take the database write lock for an instance before reading it
+
+        Call first in a transaction that records a revision. A concurrent
+        finalize or regenerate of the same draft (in another worker process)
+        then waits until this one commits, and reads the answers and revision
+        number it wrote instead of recording the same revision number again.
+        """
+        db.query(Instance).filter(Instance.id == instance_id).update(
+            {Instance.draft_number: Instance.draft_number}, synchronize_session=False
+        )
+
+    @staticmethod
+    def latest_revision(db: Session, instance_id: str) -> int:
+        return db.query(func.max(InstanceRevision.revision)).filter(
+            InstanceRevision.instance_id == instance_id
+        ).scalar() or 0
+
+    def record(self, db: Session, instance, template: Template, answers: Dict[str, Any]) -> int:
+        """Append a revision for answers about to be stored on the instance
+
+        Must be called before ``instance.answers_json`` is updated: those are
+        the answers of the previous revision. The instance must have been read
+        after ``lock_instance``. Returns the new revision number.
+        """
+        latest = self.latest_revision(db, instance.id)
+        previous = (instance.answers_json or {}) if latest else {}
+        delta = {key: value for key, value in answers.items() if key not in previous or previous[key] != value}
+        # Answers are only ever added or changed, but keep removals reconstructible
+        delta.update({key: None for key in previous if key not in answers})
+
+        db.add(InstanceRevision(
+            instance_id=instance.id,
+            revision=latest + 1,
+            template_row_id=template.id,
+            template_version=template.version or 1,
+            answers_delta=delta
+        ))
+        return latest + 1
+
+    @staticmethod
+    def list(db: Session, instance_id: str) -> List[InstanceRevision]:
+        return (
+            db.query(InstanceRevision)
+            .filter(InstanceRevision.instance_id == instance_id)
+            .order_by(InstanceRevision.revision)
+            .all()
+        )
+
+    @staticmethod
+    def answers_at(revisions: List[InstanceRevision]) -> Dict[str, Any]:
+        """Fold the deltas of revisions 1..N (in order) into the answers of revision N"""
+        answers: Dict[str, Any] = {}
+        for revision in revisions:
+            answers.update(revision.answers_delta or {})
+        return answers
+
+    @staticmethod
+    def _template_body(db: Session, template_row_id: str, version: int) -> Optional[str]:
+        template = db.query(Template).filter(Template.id == template_row_id).first()
+        if template is not None and (template.version or 1) == version:
+            return template.body_md
+        archived = db.query(TemplateVersion).filter(
+            TemplateVersion.template_row_id == template_row_id,
+            TemplateVersion.version == version
+        ).first()
+        return archived.body_md if archived else None
+
+    def materialize(self, db: Session, instance_id: str, revision: int) -> Optional[Dict[str, Any]]:
+        """Rebuild a past revision of a draft
+
+        Returns:
+            Dict with revision, template_version, answers and draft_md, or
+            None if the instance has no such revision
+
+        Raises:
+            ValueError: If the template body of that revision is no longer stored
+        """
+        revisions = (
+            db.query(InstanceRevision)
+            .filter(InstanceRevision.instance_id == instance_id, InstanceRevision.revision <= revision)
+            .order_by(InstanceRevision.revision)
+            .all()
+        )
+        if not revisions or revisions[-1].revision != revision:
+            return None
+
+        target = revisions[-1]
+        answers = self.answers_at(revisions)
+        key = (instance_id, revision)
+        with self._lock:
+            draft_md = self._drafts.get(key)
+            if draft_md is not None:
+                self._drafts.move_to_end(key)
+
+        if draft_md is None:
+            body_md = self._template_body(db, target.template_row_id, target.template_version)
+            if body_md is None:
+                raise ValueError(f"Template version {target.template_version} of revision {revision} is not available")
+            draft_md = draft_renderer.render(body_md, answers)
+            with self._lock:
+                self._drafts[key] = draft_md
+                while len(self._drafts) > self.cache_size:
+                    self._drafts.popitem(last=False)
+
+        return {
+            "revision": target.revision,
+            "template_version": target.template_version,
+            "answers": answers,
+            "draft_md": draft_md,
+            "created_at": target.created_at
+        }
+
+draft_history = DraftHistory()
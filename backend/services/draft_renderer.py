@@ -0,0 +1,337 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import re
+import threading
+from services.metrics import record_cache
+from config import settings
+
+# Placeholder syntax in template bodies: {{key}}
+PLACEHOLDER = re.compile(r'\{\{([^{}]*)\}\}')
+HTML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+
+class CompiledTemplate:
+    """A template body split into literal text and placeholder slots
+
+    ``parts`` alternates literal, key, literal, ..., literal, so rendering is
+    one pass over the slots instead of one scan of the body per answer.
+    """
+
+    def __init__(self, parts: List[str]):
+        self.parts = parts
+        # key -> indices of its slots in ``parts``
+        self.slots: Dict[str, List[int]] = {}
+        for index in range(1, len(parts), 2):
+            self.slots.setdefault(parts[index], []).append(index)
+
+    @classmethod
+    def from_body(cls, text: str) -> "CompiledTemplate":
+        return cls(PLACEHOLDER.split(text))
+
+    @property
+    def keys(self) -> List[str]:
+        return self.parts[1::2]
+
+    @staticmethod
+    def slot_text(key: str, value: Any) -> str:
+        """Text of a filled slot; slots without a (non-null) answer keep their placeholder"""
+        return "{{" + key + "}}" if value is None else str(value)
+
+    def fill(self, answers: Dict[str, Any]) -> List[str]:
+        """``parts`` with every slot replaced by its text"""
+        return [
+            part if i % 2 == 0 else self.slot_text(part, answers.get(part))
+            for i, part in enumerate(self.parts)
+        ]
+
+    def substitute(self, answers: Dict[str, Any]) -> str:
+        return "".join(self.fill(answers))
+
+class RenderState:
+    """The last rendered draft of one instance, kept to re-render only changed lines
+
+    ``values`` holds the text of every part (literals and filled slots),
+    ``part_lines`` the draft line each part starts on, ``line_starts`` the
+    (part, offset) where each draft line starts, and ``formatted`` the
+    markdown produced for each draft line.
+    """
+
+    def __init__(
+        self,
+        body_md: str,
+        compiled: CompiledTemplate,
+        values: List[str],
+        part_lines: List[int],
+        line_starts: List[Tuple[int, int]],
+        formatted: List[str]
+    ):
+        self.body_md = body_md
+        self.compiled = compiled
+        self.values = values
+        self.part_lines = part_lines
+        self.line_starts = line_starts
+        self.formatted = formatted
+        self.draft_md = '\n'.join(formatted)
+        self.lock = threading.Lock()
+
+    def line_text(self, line: int) -> str:
+        """Current text of a draft line, assembled from the parts it spans"""
+        part, offset = self.line_starts[line]
+        pieces = []
+        while part < len(self.values):
+            text = self.values[part]
+            end = text.find('\n', offset)
+            if end >= 0:
+                pieces.append(text[offset:end])
+                break
+            pieces.append(text[offset:])
+            part, offset = part + 1, 0
+        return "".join(pieces)
+
+class DraftRenderer:
+    """Render drafts from template bodies and answers
+
+    Template bodies are formatted and compiled once and kept in an LRU cache,
+    so rendering a draft (or reconstructing an old revision) only fills the
+    slots and formats the result.
+
+    Drafts rendered with ``render_instance`` also keep a RenderState per
+    instance. When the same instance is rendered again with a few changed
+    answers, only the draft lines holding those slots are rebuilt and
+    re-formatted. Changes that could move lines (values gaining or losing
+    line breaks) or involve HTML comments fall back to a full render.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = settings.COMPILED_TEMPLATE_CACHE_SIZE,
+        state_cache_size: int = settings.DRAFT_RENDER_STATE_CACHE_SIZE
+    ):
+        self.cache_size = cache_size
+        self.state_cache_size = state_cache_size
+        self._compiled: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        self._states: "OrderedDict[str, RenderState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, body_md: str) -> CompiledTemplate:
+        """Compiled form of a template body (front matter and tracking code removed)"""
+        with self._lock:
+            compiled = self._compiled.get(body_md)
+            if compiled is not None:
+                self._compiled.move_to_end(body_md)
+                return compiled
+
+        compiled = CompiledTemplate.from_body(self.format_template_content(body_md))
+        with self._lock:
+            self._compiled[body_md] = compiled
+            while len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def render(self, body_md: str, answers: Dict[str, Any]) -> str:
+        """Final draft markdown for a template body and answers"""
+        draft_md = self.compile(body_md).substitute(answers)
+        return self.format_draft_markdown(self.strip_markup(draft_md))
+
+    def render_instance(self, instance_id: str, body_md: str, answers: Dict[str, Any]) -> str:
+        """Same result as ``render``, reusing the instance's previous render when possible"""
+        with self._lock:
+            state = self._states.get(instance_id)
+            if state is not None:
+                self._states.move_to_end(instance_id)
+
+        if state is not None and state.body_md == body_md:
+            with state.lock:
+                draft_md = self._patch(state, answers)
+            if draft_md is not None:
+                record_cache("draft_render", True)
+                return draft_md
+        record_cache("draft_render", False)
+
+        compiled = self.compile(body_md)
+        values = compiled.fill(answers)
+        state = self._build_state(body_md, compiled, values)
+        with self._lock:
+            if state is None:
+                self._states.pop(instance_id, None)
+            else:
+                self._states[instance_id] = state
+                while len(self._states) > self.state_cache_size:
+                    self._states.popitem(last=False)
+        if state is None:
+            return self.format_draft_markdown(self.strip_markup("".join(values)))
+        return state.draft_md
+
+    def _build_state(self, body_md: str, compiled: CompiledTemplate, values: List[str]) -> Optional[RenderState]:
+        """Render line by line, recording where each part and line sits; None if comments need stripping"""
+        part_lines: List[int] = []
+        line_starts: List[Tuple[int, int]] = [(0, 0)]
+        for part, text in enumerate(values):
+            part_lines.append(len(line_starts) - 1)
+            end = text.find('\n')
+            while end >= 0:
+                line_starts.append((part, end + 1))
+                end = text.find('\n', end + 1)
+
+        lines = [self._strip_line(line) for line in "".join(values).split('\n')]
+        if any("<!--" in line for line in lines):
+            return None
+        formatted = ['\n'.join(self.format_draft_line(line, i, len(lines))) for i, line in enumerate(lines)]
+        return RenderState(body_md, compiled, values, part_lines, line_starts, formatted)
+
+    def _patch(self, state: RenderState, answers: Dict[str, Any]) -> Optional[str]:
+        """Update a render state for new answers; None if it needs a full render"""
+        changes = []
+        for key, slots in state.compiled.slots.items():
+            text = CompiledTemplate.slot_text(key, answers.get(key))
+            previous = state.values[slots[0]]
+            if text != previous:
+                if '\n' in text or '\n' in previous:
+                    return None  # Line numbers would shift
+                changes.append((slots, text))
+        if not changes:
+            return state.draft_md
+
+        lines = set()
+        for slots, text in changes:
+            for part in slots:
+                state.values[part] = text
+                lines.add(state.part_lines[part])
+
+        line_count = len(state.line_starts)
+        for line in lines:
+            stripped = self._strip_line(state.line_text(line))
+            if "<!--" in stripped:
+                return None  # The caller rebuilds the state from scratch
+            state.formatted[line] = '\n'.join(self.format_draft_line(stripped, line, line_count))
+        state.draft_md = '\n'.join(state.formatted)
+        return state.draft_md
+
+    @staticmethod
+    def _strip_line(line: str) -> str:
+        # strip_markup for one line, when no HTML comment remains
+        return line.replace("UOIONHHC", "").replace("<!--  -->", "")
+
+    @staticmethod
+    def strip_markup(content: str) -> str:
+        """Remove the tracking code and HTML comments from a filled draft"""
+        content = content.replace("UOIONHHC", "")
+        content = content.replace("<!--  -->", "")
+        return HTML_COMMENT.sub('', content)
+
+    @staticmethod
+    def format_template_content(content: str) -> str:
+        """Format template content for better markdown rendering"""
+        # Remove YAML front-matter if present
+        if content.startswith('---'):
+            parts = content.split('---', 2)
+            if len(parts) >= 3:
+                content = parts[2].strip()
+        
+        # Remove tracking code from visible content
+        content = content.replace("UOIONHHC", "")
+        content = content.replace("<!--  -->", "")
+        
+        # Clean up extra whitespace
+        content = content.strip()
+        
+        # Ensure proper line breaks for common patterns
+        # Fix "To," patterns - add line breaks after recipients
+        content = re.sub(r'To,\s*\n?\s*', 'To,\n\n', content)
+        
+        # Fix date patterns - add line breaks after dates
+        content = re.sub(r'Date:\s*([^\n]+)\n?', r'Date: \1\n\n', content)
+        
+        # Fix subject patterns - add line breaks after subject
+        content = re.sub(r'Subject:\s*([^\n]+)\n?', r'Subject: \1\n\n', content)
+        
+        # Fix "Dear" patterns - add line breaks after salutation
+        content = re.sub(r'Dear\s+([^\n]+),\n?', r'Dear \1,\n\n', content)
+        
+        # Fix signature patterns - add line breaks before signatures
+        content = re.sub(r'\n(Yours\s+(?:faithfully|sincerely))', r'\n\n\1', content, flags=re.IGNORECASE)
+        
+        # Ensure double line breaks between paragraphs
+        # Replace multiple newlines with exactly two
+        content = re.sub(r'\n{3,}', '\n\n', content)
+        
+        # Clean up any trailing whitespace
+        content = re.sub(r'\n\s+', '\n', content)
+        
+        return content
+
+    @staticmethod
+    def format_draft_markdown(content: str) -> str:
+        """Format draft markdown for beautiful display with proper markdown syntax"""
+        lines = content.split('\n')
+        formatted_lines = []
+        for i, line in enumerate(lines):
+            formatted_lines.extend(DraftRenderer.format_draft_line(line, i, len(lines)))
+        return '\n'.join(formatted_lines)
+
+    @staticmethod
+    def format_draft_line(line: str, i: int, line_count: int) -> List[str]:
+        """Markdown lines for line ``i`` of a draft with ``line_count`` lines"""
+        formatted_lines = []
+        stripped = line.strip()
+        
+        # Skip empty lines
+        if not stripped:
+            formatted_lines.append('')
+        
+        # Main title (first line, all caps or starts with specific patterns)
+        elif i == 0 or (stripped.isupper() and len(stripped.split()) <= 6):
+            formatted_lines.append(f"# {stripped}")
+        
+        # Date line
+        elif stripped.startswith('Date:'):
+            formatted_lines.append(f"**{stripped}**")
+            formatted_lines.append('')  # Add space after
+        
+        # To, From patterns
+        elif stripped in ['To,', 'From:']:
+            formatted_lines.append(f"**{stripped}**")
+        
+        # Subject line
+        elif stripped.startswith('Subject:'):
+            formatted_lines.append(f"**{stripped}**")
+            formatted_lines.append('')
+        
+        # Section headers (ALL CAPS, colon at end)
+        elif stripped.isupper() and stripped.endswith(':') and len(stripped.split()) <= 5:
+            formatted_lines.append('')
+            formatted_lines.append(f"### {stripped[:-1]}")
+            formatted_lines.append('')
+        
+        # Salutation (Dear...)
+        elif stripped.startswith('Dear '):
+            formatted_lines.append(f"**{stripped}**")
+            formatted_lines.append('')
+        
+        # Closing (Yours faithfully, Yours sincerely, etc.)
+        elif re.match(r'^Yours\s+(faithfully|sincerely)', stripped, re.IGNORECASE):
+            formatted_lines.append('')
+            formatted_lines.append(f"**{stripped}**")
+        
+        # Name/signature at end
+        elif i > line_count - 5 and stripped and not stripped.startswith(('-', 'Contact:', 'Email:', 'Address:', '1.', '2.', '3.')):
+            # Could be a name
+            if not any(stripped.startswith(prefix) for prefix in ['I ', 'The ', 'Please ', 'Enclosed ']):
+                formatted_lines.append(f"**{stripped}**")
+            else:
+                formatted_lines.append(stripped)
+        
+        # Bullet points (lines starting with dash or number)
+        elif stripped.startswith('-') or re.match(r'^\d+\.', stripped):
+            formatted_lines.append(stripped)
+        
+        # Contact info at end
+        elif stripped.startswith(('Contact:', 'Email:', 'Address:')):
+            formatted_lines.append(f"**{stripped}**")
+        
+        # Regular paragraph text
+        else:
+            formatted_lines.append(stripped)
+        
+        return formatted_lines
+
+draft_renderer = DraftRenderer()
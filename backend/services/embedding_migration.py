@@ -0,0 +1,260 @@
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import logging
+import time
+from sqlalchemy import or_
+from database import SessionLocal, Template, EmbeddingMigrationState
+from services.catalogue import catalogue
+from services.embedding_providers import EmbeddingProvider
+from services.embedding_service import EmbeddingService
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingMigration:
+    """Resumable bulk re-embedding of the template catalogue with a new model
+
+    Templates are read in primary-key order, in batches of ``batch_size``.
+    Up to ``concurrency`` batches are embedded at once on worker threads,
+    while results are written back in order on the calling thread. Each batch
+    commits its vectors together with the checkpoint (the last template id it
+    covered), so after a crash or Ctrl-C the next run resumes after the last
+    committed batch, redoing at most the batches that were in flight.
+
+    New vectors go into the secondary slot of each row (the primary slot if
+    it already holds the target model), so workers still configured with the
+    old model keep matching against the primary vectors, and workers switched
+    to the target model read the secondary ones. On startup with the new
+    model, rebuild_index swaps the slots without calling the API.
+
+    Rows added or edited while the scan runs are caught by a final pass over
+    rows that still have no current vector from the target model.
+    """
+
+    RUNNING = "running"
+    COMPLETE = "complete"
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        concurrency: int = settings.EMBEDDING_MIGRATION_CONCURRENCY,
+        session_factory: Callable = SessionLocal,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.provider = provider
+        self.target = provider.model_id
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.session_factory = session_factory
+        self.progress = progress
+
+    @staticmethod
+    def _text(template: Template) -> str:
+        return EmbeddingService.template_embedding_text(
+            template.title, template.doc_type, template.jurisdiction, template.similarity_tags
+        )
+
+    def _has_target(self, template: Template, digest: str) -> bool:
+        """Whether either slot already holds a current vector from the target model"""
+        if template.embedding and EmbeddingService._stamp(template) == self.target:
+            return template.embedding_hash in (None, digest)
+        return template.secondary_embedding_model == self.target and template.secondary_embedding_hash == digest
+
+    def _pending(self, templates: List[Template]) -> List[Tuple[str, str, str]]:
+        """(id, text, hash) of the templates that still need a target vector"""
+        pending = []
+        for template in templates:
+            text = self._text(template)
+            digest = EmbeddingService.embedding_hash(text)
+            if not self._has_target(template, digest):
+                pending.append((template.id, text, digest))
+        return pending
+
+    def _embed(self, pending: List[Tuple[str, str, str]]) -> List[List[float]]:
+        return self.provider.embed([text for _, text, _ in pending]) if pending else []
+
+    def _store(self, db, pending: List[Tuple[str, str, str]], vectors: List[List[float]]) -> int:
+        """Write vectors into the target slot; returns the number of rows written"""
+        templates = {t.id: t for t in db.query(Template).filter(Template.id.in_([p[0] for p in pending])).all()}
+        written = 0
+        for (template_id, _, digest), vector in zip(pending, vectors):
+            template = templates.get(template_id)
+            if template is None or EmbeddingService.embedding_hash(self._text(template)) != digest:
+                continue  # Deleted or edited since it was read; the final pass picks up edits
+            if template.embedding and EmbeddingService._stamp(template) == self.target:
+                template.embedding, template.embedding_hash = vector, digest
+            else:
+                template.secondary_embedding = vector
+                template.secondary_embedding_model = self.target
+                template.secondary_embedding_hash = digest
+            written += 1
+        return written
+
+    def status(self) -> Dict[str, Any]:
+        """Checkpoint and target-model coverage of the catalogue
+
+        ``covered`` counts rows holding a vector from the target model in
+        either slot; whether it is current for later edits is only checked
+        when the migration runs.
+        """
+        db = self.session_factory()
+        try:
+            state = db.get(EmbeddingMigrationState, self.target)
+            total = db.query(Template).count()
+            covered = db.query(Template).filter(or_(
+                Template.embedding_model == self.target,
+                Template.secondary_embedding_model == self.target
+            )).count()
+            return {
+                "target_model": self.target,
+                "status": state.status if state else None,
+                "checkpoint": state.last_row_id if state else None,
+                "embedded": state.embedded_count if state else 0,
+                "templates": total,
+                "covered": covered
+            }
+        finally:
+            db.close()
+
+    def run(self, restart: bool = False, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Embed every template that lacks a target vector, resuming from the checkpoint
+
+        Args:
+            restart: Ignore the checkpoint and scan from the beginning
+            max_batches: Stop after this many batches (the run can be resumed)
+        """
+        db = self.session_factory()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="reembed")
+        try:
+            # Both migrations would write the same secondary slot
+            other = (
+                db.query(EmbeddingMigrationState)
+                .filter(EmbeddingMigrationState.target_model != self.target,
+                        EmbeddingMigrationState.status == self.RUNNING)
+                .first()
+            )
+            if other is not None:
+                raise ValueError(f"A migration to {other.target_model} is still running; "
+                                 f"finish it before migrating to {self.target}")
+
+            state = db.get(EmbeddingMigrationState, self.target)
+            if state is None:
+                state = EmbeddingMigrationState(target_model=self.target, status=self.RUNNING, last_row_id="", embedded_count=0)
+                db.add(state)
+                db.commit()
+            elif restart:
+                state.status, state.last_row_id, state.started_at = self.RUNNING, "", datetime.utcnow()
+                db.commit()
+
+            total = db.query(Template).count()
+            done = db.query(Template).filter(Template.id <= state.last_row_id).count() if state.last_row_id else 0
+            run = {"target_model": self.target, "templates": total, "scanned": done, "embedded": 0,
+                   "batches": 0, "started": time.monotonic(), "resumed_rows": done}
+
+            cursor = state.last_row_id
+            in_flight: Deque[Tuple[Future, List[Tuple[str, str, str]], str, int]] = deque()
+            scan_finished = state.status == self.COMPLETE
+
+            while True:
+                # Read ahead until the window is full
+                while not scan_finished and len(in_flight) < self.concurrency and (
+                    max_batches is None or run["batches"] + len(in_flight) < max_batches
+                ):
+                    page = (
+                        db.query(Template).filter(Template.id > cursor)
+                        .order_by(Template.id).limit(self.batch_size).all()
+                    )
+                    if not page:
+                        scan_finished = True
+                        break
+                    cursor = page[-1].id
+                    pending = self._pending(page)
+                    in_flight.append((executor.submit(self._embed, pending), pending, cursor, len(page)))
+
+                if not in_flight:
+                    break
+
+                # Commit batches in scan order, so the checkpoint never skips one
+                future, pending, last_row_id, scanned = in_flight.popleft()
+                written = self._store(db, pending, future.result())
+                state.last_row_id = last_row_id
+                state.embedded_count += written
+                db.commit()
+
+                run["batches"] += 1
+                run["scanned"] += scanned
+                run["embedded"] += written
+                self._report(run)
+
+            if scan_finished:
+                run["embedded"] += self._catch_up(db, state)
+                state.status = self.COMPLETE
+            if run["embedded"]:
+                # Snapshots for the target model are rebuilt on next use
+                catalogue.bump_version(db)
+            db.commit()
+
+            run["complete"] = state.status == self.COMPLETE
+            run["elapsed_s"] = round(time.monotonic() - run.pop("started"), 2)
+            return run
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            db.close()
+
+    def _catch_up(self, db, state: EmbeddingMigrationState) -> int:
+        """Embed rows added or edited behind the scan cursor
+
+        Rows are paged by id with only the columns needed to hash their text,
+        so rows that already hold a current target vector cost no vector
+        loads. The rest are loaded in full and checked as in the scan.
+        """
+        columns = (
+            Template.id, Template.title, Template.doc_type, Template.jurisdiction, Template.similarity_tags,
+            Template.embedding_model, Template.embedding_hash,
+            Template.secondary_embedding_model, Template.secondary_embedding_hash
+        )
+        cursor, written, found = "", 0, 0
+        while True:
+            page = db.query(*columns).filter(Template.id > cursor).order_by(Template.id).limit(self.batch_size).all()
+            if not page:
+                break
+            cursor = page[-1].id
+            candidates = []
+            for row in page:
+                digest = EmbeddingService.embedding_hash(self._text(row))
+                if not ((row.embedding_model == self.target and row.embedding_hash == digest) or
+                        (row.secondary_embedding_model == self.target and row.secondary_embedding_hash == digest)):
+                    candidates.append(row.id)
+            if not candidates:
+                continue
+            pending = self._pending(db.query(Template).filter(Template.id.in_(candidates)).order_by(Template.id).all())
+            if not pending:
+                continue
+            found += len(pending)
+            stored = self._store(db, pending, self._embed(pending))
+            state.embedded_count += stored
+            written += stored
+            db.commit()
+        if found:
+            logger.info(f"Final pass embedded {written} templates added or edited during the migration")
+        return written
+
+    def _report(self, run: Dict[str, Any]):
+        elapsed = time.monotonic() - run["started"]
+        rate = (run["scanned"] - run["resumed_rows"]) / elapsed if elapsed else 0.0
+        remaining = max(run["templates"] - run["scanned"], 0)
+        progress = {
+            "scanned": run["scanned"],
+            "templates": run["templates"],
+            "embedded": run["embedded"],
+            "rows_per_s": rate,
+            "eta_s": remaining / rate if rate else None
+        }
+        if self.progress:
+            self.progress(progress)
+        else:
+            logger.info(f"Re-embedding {run['scanned']}/{run['templates']} templates "
+                        f"({run['embedded']} embedded, {rate:.0f} rows/s)")
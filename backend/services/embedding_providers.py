@@ -0,0 +1,129 @@
+from typing import List, Optional
+import re
+import math
+import zlib
+import numpy as np
+from config import settings
+
+class EmbeddingProvider:
+    """Base class for embedding backends
+
+    Every provider exposes a ``model_id`` that is stamped on stored vectors, so
+    vectors produced by different models are never compared with each other.
+    """
+
+    name = "base"
+
+    @property
+    def model_id(self) -> str:
+        raise NotImplementedError
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, returning one vector per text"""
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_one(query)
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Remote embeddings from the Gemini API"""
+
+    name = "gemini"
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or settings.GEMINI_EMBEDDING_MODEL
+
+    @property
+    def model_id(self) -> str:
+        return f"gemini:{self.model}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # Imported lazily so the local provider works without a Gemini client
+        from services.gemini_service import gemini_service
+
+        vectors = []
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(gemini_service.generate_embeddings(texts[start:start + batch_size], model=self.model))
+        return vectors
+
+    def embed_query(self, query: str) -> List[float]:
+        from services.gemini_service import gemini_service
+        return gemini_service.generate_query_embedding(query, model=self.model)
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Local CPU embeddings using a hashed n-gram projection
+
+    Word unigrams, word bigrams and character 3/4-grams are hashed into a fixed
+    number of signed buckets with sublinear term weighting, then L2-normalised.
+    The model is stateless and deterministic, so it needs no network access,
+    no model files and no fitting step.
+    """
+
+    name = "local"
+
+    TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+    STOPWORDS = frozenset([
+        "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "i", "in",
+        "is", "it", "me", "my", "need", "of", "on", "or", "our", "please", "the",
+        "to", "want", "we", "with", "write", "draft", "create", "make", "generate"
+    ])
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.LOCAL_EMBEDDING_DIM
+
+    @property
+    def model_id(self) -> str:
+        return f"local:hashing-ngram-{self.dim}"
+
+    def _features(self, text: str):
+        tokens = [t for t in self.TOKEN_PATTERN.findall(text.lower()) if t not in self.STOPWORDS]
+
+        for token in tokens:
+            yield "w:" + token
+            padded = f"<{token}>"
+            for n in (3, 4):
+                for i in range(len(padded) - n + 1):
+                    yield "c:" + padded[i:i + n]
+
+        for first, second in zip(tokens, tokens[1:]):
+            yield "b:" + first + " " + second
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        counts = {}
+        for feature in self._features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            # Whole words carry more signal than character fragments
+            weight = 2.0 if feature[0] in "wb" else 1.0
+            vector[(h & 0x7FFFFFFF) % self.dim] += sign * weight * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vectorize(text).tolist() for text in texts]
+
+def get_embedding_provider(name: Optional[str] = None, model: Optional[str] = None) -> EmbeddingProvider:
+    """Build the embedding provider configured by ``EMBEDDING_PROVIDER``
+
+    Args:
+        model: Gemini embedding model (defaults to GEMINI_EMBEDDING_MODEL)
+    """
+    name = (name or settings.EMBEDDING_PROVIDER).lower()
+
+    if name == "gemini":
+        return GeminiEmbeddingProvider(model)
+    if name == "local":
+        return HashingEmbeddingProvider()
+
+    raise ValueError(f"Unknown embedding provider: {name}. Use 'gemini' or 'local'.")
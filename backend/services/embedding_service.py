@@ -1,26 +1,231 @@
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Dict, Any
+import hashlib
+import logging
 import numpy as np
-from scipy.spatial.distance import cosine
-from services.gemini_service import gemini_service
+from sqlalchemy.orm import Session
+from config import settings
+from services.metrics import time_stage
+from services.embedding_providers import EmbeddingProvider, HashingEmbeddingProvider, get_embedding_provider
+
+logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     """Service for generating and comparing embeddings"""
-    
+
+    def __init__(self, provider: Optional[EmbeddingProvider] = None):
+        self.provider = provider or get_embedding_provider()
+        self.local_provider = HashingEmbeddingProvider()
+        # Local vectors computed on the fly for the fallback path: template.id -> (updated_at, vector)
+        self._fallback_vectors: Dict[str, Tuple[Any, List[float]]] = {}
+
+    @property
+    def model_id(self) -> str:
+        """Model stamp of the active provider"""
+        return self.provider.model_id
+
+    def set_provider(self, provider: EmbeddingProvider):
+        """Switch the active provider (call rebuild_index afterwards)"""
+        self.provider = provider
+
     @staticmethod
-    def generate_document_embedding(text: str) -> List[float]:
-        """Generate embedding for a document"""
-        return gemini_service.generate_embedding(text)
-    
+    def template_embedding_text(
+        title: str,
+        doc_type: Optional[str],
+        jurisdiction: Optional[str],
+        similarity_tags: Optional[List[str]]
+    ) -> str:
+        """Text that represents a template in the vector index"""
+        return f"{title} {doc_type} {jurisdiction} {' '.join(similarity_tags or [])}"
+
     @staticmethod
-    def generate_query_embedding(query: str) -> List[float]:
+    def embedding_hash(text: str) -> str:
+        """Fingerprint of a template's embedding text, to detect when it needs re-embedding"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed_template(self, template) -> bool:
+        """Embed a template unless its stored vector is current for its embedded fields
+
+        Returns:
+            Whether an embedding was generated
+        """
+        text = self.template_embedding_text(
+            template.title, template.doc_type, template.jurisdiction, template.similarity_tags
+        )
+        digest = self.embedding_hash(text)
+        if self.is_current(template) and template.embedding_hash == digest:
+            return False
+        if self._promote_secondary(template, digest):
+            return False
+
+        template.embedding = self.generate_document_embedding(text)
+        template.embedding_model = self.model_id
+        template.embedding_hash = digest
+        if template.secondary_embedding_hash != digest:
+            # Drop the other model's vector rather than serve it for the old text
+            template.secondary_embedding = None
+            template.secondary_embedding_model = None
+            template.secondary_embedding_hash = None
+        self.forget(template.id)
+        return True
+
+    def forget(self, template_row_id: str):
+        """Drop the cached fallback vector of a changed or deleted template"""
+        self._fallback_vectors.pop(template_row_id, None)
+
+    def generate_document_embedding(self, text: str) -> List[float]:
+        """Generate embedding for a document"""
+        return self.provider.embed_one(text)
+
+    def generate_document_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for several documents in batches"""
+        with time_stage("embed"):
+            return self.provider.embed(texts)
+
+    def generate_query_embedding(self, query: str) -> List[float]:
         """Generate embedding for a search query"""
-        return gemini_service.generate_query_embedding(query)
-    
+        with time_stage("embed"):
+            return self.provider.embed_query(query)
+
+    @staticmethod
+    def _stamp(template) -> str:
+        # Rows created before model stamping were embedded with Gemini
+        return template.embedding_model or f"gemini:{settings.GEMINI_EMBEDDING_MODEL}"
+
+    def is_current(self, template) -> bool:
+        """Whether a template's stored vector was produced by the active provider"""
+        return bool(template.embedding) and self._stamp(template) == self.model_id
+
+    @staticmethod
+    def vector_for(template, model_id: str) -> Optional[List[float]]:
+        """The template's vector from ``model_id``, from either slot, or None
+
+        Reading both slots keeps matching working during an embedding
+        migration, whichever model a worker is configured with.
+        """
+        if template.embedding and EmbeddingService._stamp(template) == model_id:
+            return template.embedding
+        if template.secondary_embedding and template.secondary_embedding_model == model_id:
+            return template.secondary_embedding
+        return None
+
+    def _promote_secondary(self, template, digest: str) -> bool:
+        """Swap the slots if the secondary vector is current for the active provider"""
+        if not (
+            template.secondary_embedding
+            and template.secondary_embedding_model == self.model_id
+            and template.secondary_embedding_hash == digest
+        ):
+            return False
+
+        stamp = self._stamp(template) if template.embedding else None
+        template.embedding, template.secondary_embedding = template.secondary_embedding, template.embedding
+        template.embedding_model, template.secondary_embedding_model = template.secondary_embedding_model, stamp
+        template.embedding_hash, template.secondary_embedding_hash = digest, template.embedding_hash
+        self.forget(template.id)
+        return True
+
+    def rebuild_index(self, db: Session, force: bool = False) -> int:
+        """Re-embed templates whose vectors are stale
+
+        A vector is stale when it was produced by a different provider or its
+        embedded fields were edited since (e.g. directly in the database).
+        Rows embedded before hashing was added are only stamped with the hash.
+        Rows whose secondary vector was already produced by the active provider
+        (see reembed_templates.py) switch slots without an API call.
+
+        Returns:
+            Number of templates re-embedded
+        """
+        from database import Template
+        from services.catalogue import catalogue
+
+        templates = db.query(Template).all()
+        texts = {
+            t.id: self.template_embedding_text(t.title, t.doc_type, t.jurisdiction, t.similarity_tags)
+            for t in templates
+        }
+        digests = {template_id: self.embedding_hash(text) for template_id, text in texts.items()}
+        stale, promoted = [], []
+        for t in templates:
+            if force:
+                stale.append(t)
+            elif self.is_current(t) and t.embedding_hash in (None, digests[t.id]):
+                if t.embedding_hash is None:
+                    t.embedding_hash = digests[t.id]
+            elif self._promote_secondary(t, digests[t.id]):
+                promoted.append(t)
+            else:
+                stale.append(t)
+
+        if promoted:
+            logger.info(f"Switched {len(promoted)} templates to their pre-computed {self.model_id} vectors")
+        if not stale:
+            if promoted:
+                catalogue.bump_version(db, changed=[t.id for t in promoted])
+            db.commit()
+            return 0
+
+        vectors = self.generate_document_embeddings([texts[t.id] for t in stale])
+
+        for template, vector in zip(stale, vectors):
+            template.embedding = vector
+            template.embedding_model = self.model_id
+            template.embedding_hash = digests[template.id]
+            self.forget(template.id)
+
+        catalogue.bump_version(db, changed=[t.id for t in stale + promoted])
+        db.commit()
+        logger.info(f"Re-embedded {len(stale)} templates with {self.model_id}")
+        return len(stale)
+
+    def embed_query(self, query: str) -> Tuple[List[float], str]:
+        """Embed a query, returning the vector and the model that produced it
+
+        If the remote provider fails and fallback is enabled, the query is
+        embedded with the local model so matching keeps working without
+        network access.
+        """
+        try:
+            return self.generate_query_embedding(query), self.model_id
+        except Exception as e:
+            if not settings.EMBEDDING_FALLBACK_TO_LOCAL or self.provider.name == self.local_provider.name:
+                raise
+            logger.warning(f"Query embedding failed ({str(e)}), falling back to {self.local_provider.model_id}")
+
+        with time_stage("embed"):
+            return self.local_provider.embed_query(query), self.local_provider.model_id
+
+    def template_vectors(self, templates: list, model_id: str) -> List[Tuple[Any, List[float]]]:
+        """Pair templates with vectors comparable to a query embedded by ``model_id``
+
+        Stored vectors from either slot are used. When the query was embedded
+        by the local fallback provider, templates without a stored local
+        vector are embedded on the fly.
+        """
+        pairs = [(t, self.vector_for(t, model_id)) for t in templates]
+        if model_id == self.model_id or model_id != self.local_provider.model_id:
+            return [(t, vector) for t, vector in pairs if vector is not None]
+
+        return [(t, vector if vector is not None else self._local_vector(t)) for t, vector in pairs]
+
+    def _local_vector(self, template) -> List[float]:
+        cached = self._fallback_vectors.get(template.id)
+        if cached and cached[0] == template.updated_at:
+            return cached[1]
+
+        vector = self.local_provider.embed_one(self.template_embedding_text(
+            template.title, template.doc_type, template.jurisdiction, template.similarity_tags
+        ))
+        self._fallback_vectors[template.id] = (template.updated_at, vector)
+        return vector
+
     @staticmethod
     def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
         """Calculate cosine similarity between two embeddings"""
-        return 1 - cosine(embedding1, embedding2)
-    
+        a = np.asarray(embedding1, dtype=np.float64)
+        b = np.asarray(embedding2, dtype=np.float64)
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
     @staticmethod
     def find_most_similar(
         query_embedding: List[float],
@@ -28,24 +233,25 @@ class EmbeddingService:
         top_k: int = 3
     ) -> List[Tuple[str, float]]:
         """Find most similar embeddings to query
-        
+
         Args:
             query_embedding: Query embedding vector
             candidate_embeddings: List of (id, embedding) tuples
             top_k: Number of top results to return
-            
+
         Returns:
             List of (id, similarity_score) tuples, sorted by similarity
         """
-        similarities = []
-        
-        for candidate_id, candidate_embedding in candidate_embeddings:
-            similarity = EmbeddingService.cosine_similarity(query_embedding, candidate_embedding)
-            similarities.append((candidate_id, similarity))
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        return similarities[:top_k]
+        if not candidate_embeddings:
+            return []
+
+        # Score all candidates with one matrix-vector product
+        matrix = np.asarray([embedding for _, embedding in candidate_embeddings], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+
+        order = np.argsort(-scores)[:top_k]
+        return [(candidate_embeddings[i][0], float(scores[i])) for i in order]
 
 embedding_service = EmbeddingService()
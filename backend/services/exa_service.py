@@ -1,20 +1,131 @@
-from typing import List, Dict, Any, Optional
-from exa_py import Exa
+from typing import List, Dict, Any, Optional, Set, Tuple
+import bisect
+import threading
 import time
 import logging
+import re
 from config import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def _lines_containing(text: str, line_starts: List[int], phrases: Tuple[str, ...]) -> Set[int]:
+    """Indices of the lines of ``text`` that contain any of the phrases
+
+    Each phrase is searched once across the whole text with str.find, skipping
+    to the next line after a hit, instead of testing every phrase on every line.
+    Phrases never contain newlines, so a hit always lies within one line.
+    """
+    found = set()
+    line_count = len(line_starts)
+    for phrase in phrases:
+        position = text.find(phrase)
+        while position != -1:
+            line = bisect.bisect_right(line_starts, position) - 1
+            found.add(line)
+            if line + 1 >= line_count:
+                break
+            position = text.find(phrase, line_starts[line + 1])
+    return found
+
 class ExaService:
     """Service for searching and retrieving documents from the web using exa.ai"""
     
+    # Phrase lists for clean_web_content, matched as substrings of lowercased lines.
+    # None may start or end with whitespace, so matching unstripped lines is equivalent.
+    
+    # Common phrases to filter out
+    JUNK_PHRASES = (
+        "we use cookies",
+        "click here to",
+        "read more",
+        "read less",
+        "by clicking",
+        "cookie policy",
+        "privacy policy",
+        "terms of service",
+        "subscribe",
+        "newsletter",
+        "sign up",
+        "log in",
+        "create account",
+        "view this form",
+        "buy now",
+        "download now",
+        "instant download",
+        "form preview",
+        "related forms",
+        "faq",
+        "more info",
+        "category:",
+        "control #:",
+        "format:",
+        "state:",
+        "us legal forms",
+        "form popularity",
+        # AI/marketing articles
+        "is not a futuristic concept",
+        "already a part of many",
+        "workplace and will continue",
+        "employers and employees can",
+        "here's how",
+        "expert said",
+        "learn how",
+        "proliferation of artificial",
+        "ensuing expected increase",
+        "could help usher in",
+        "boosts staff well-being",
+        "improving productivity"
+    )
+    
+    # Lines that START legal sections (preserve these)
+    SECTION_STARTERS = (
+        "date:",
+        "to:",
+        "from:",
+        "re:",
+        "subject:",
+        "dear",
+        "sincerely",
+        "regards",
+        "signature",
+        "notice of",
+        "letter of",
+        "agreement",
+        "hereby"
+    )
+    
+    # Signs of returning to legal content after a non-legal section
+    LEGAL_KEYWORDS = (
+        'date', 'hereby', 'employee', 'employer', 'termination',
+        'notice', 'agreement', 'party', 'witness', 'signature',
+        'severance', 'cobra', 'insurance', 'benefits', 'pay', 'release'
+    )
+    
+    # Lines that look like legal document content
+    CONTENT_KEYWORDS = ('employee', 'employer', 'date', 'signature', 'hereby', 'notice')
+    
+    # str.translate table deleting the symbols counted as metadata noise
+    METADATA_SYMBOLS = str.maketrans('', '', '#@$%^&*~|')
+    
+    EXCESS_BLANK_LINES = re.compile(r'\n{4,}')
+    
     def __init__(self):
         if not settings.EXA_API_KEY:
             raise ValueError("EXA_API_KEY not configured")
         
-        self.client = Exa(api_key=settings.EXA_API_KEY)
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Exa client, created on first use so importing the API stays fast"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from exa_py import Exa
+                    self._client = Exa(api_key=settings.EXA_API_KEY)
+        return self._client
     
     def search_documents(
         self,
@@ -136,75 +247,26 @@ class ExaService:
         if not text:
             return ""
         
-        import re
-        
-        # Common phrases to filter out (case-insensitive)
-        junk_phrases = [
-            "we use cookies",
-            "click here to",
-            "read more",
-            "read less",
-            "by clicking",
-            "cookie policy",
-            "privacy policy",
-            "terms of service",
-            "subscribe",
-            "newsletter",
-            "sign up",
-            "log in",
-            "create account",
-            "view this form",
-            "buy now",
-            "download now",
-            "instant download",
-            "form preview",
-            "related forms",
-            "faq",
-            "more info",
-            "category:",
-            "control #:",
-            "format:",
-            "state:",
-            "us legal forms",
-            "form popularity",
-            # NEW: Filter AI/marketing articles
-            "is not a futuristic concept",
-            "already a part of many",
-            "workplace and will continue",
-            "employers and employees can",
-            "here's how",
-            "expert said",
-            "learn how",
-            "proliferation of artificial",
-            "ensuing expected increase",
-            "could help usher in",
-            "boosts staff well-being",
-            "improving productivity"
-        ]
+        lines = text.split('\n')
+        lowered = text.lower()
+        lowered_lines = lowered.split('\n')
+        if len(lowered_lines) != len(lines):  # Defensive: lower() never adds or removes newlines
+            lowered_lines = [line.lower() for line in lines]
+            lowered = '\n'.join(lowered_lines)
         
-        # Lines that START legal sections (preserve these)
-        section_starters = [
-            "date:",
-            "to:",
-            "from:",
-            "re:",
-            "subject:",
-            "dear",
-            "sincerely",
-            "regards",
-            "signature",
-            "notice of",
-            "letter of",
-            "agreement",
-            "hereby"
-        ]
+        # Classify every line against each phrase list up front
+        line_starts, offset = [], 0
+        for line_lower in lowered_lines:
+            line_starts.append(offset)
+            offset += len(line_lower) + 1
+        section_lines = _lines_containing(lowered, line_starts, self.SECTION_STARTERS)
+        junk_lines = _lines_containing(lowered, line_starts, self.JUNK_PHRASES)
         
-        lines = text.split('\n')
         cleaned_lines = []
         skip_until_legal = False
         in_legal_section = False
         
-        for line in lines:
+        for index, line in enumerate(lines):
             line = line.strip()
             
             # Skip empty lines (but keep some for structure)
@@ -213,29 +275,23 @@ class ExaService:
                     cleaned_lines.append("")
                 continue
             
-            line_lower = line.lower()
-            
             # Check if this line STARTS a legal section
-            if any(starter in line_lower for starter in section_starters):
+            if index in section_lines:
                 in_legal_section = True
                 skip_until_legal = False
                 cleaned_lines.append(line)
                 continue
             
             # Check if this line starts a non-legal section
-            if any(junk in line_lower for junk in junk_phrases):
+            if index in junk_lines:
                 skip_until_legal = True
                 in_legal_section = False
                 continue
             
             # If we're in a non-legal section, look for signs of returning to legal content
             if skip_until_legal and not in_legal_section:
-                # Legal documents have specific keywords
-                legal_keywords = ['date', 'hereby', 'employee', 'employer', 'termination', 
-                                'notice', 'agreement', 'party', 'witness', 'signature',
-                                'severance', 'cobra', 'insurance', 'benefits', 'pay', 'release']
-                
-                if any(keyword in line_lower for keyword in legal_keywords):
+                line_lower = lowered_lines[index]
+                if any(keyword in line_lower for keyword in self.LEGAL_KEYWORDS):
                     skip_until_legal = False
                     in_legal_section = True
                 else:
@@ -257,7 +313,7 @@ class ExaService:
                 continue
             
             # Skip lines with too many symbols (likely metadata)
-            symbol_count = sum(1 for c in line if c in '#@$%^&*~|')
+            symbol_count = len(line) - len(line.translate(self.METADATA_SYMBOLS))
             if symbol_count > 5:
                 continue
             
@@ -267,8 +323,7 @@ class ExaService:
                 continue
             
             # KEEP: Lines that look like legal document content
-            if in_legal_section or any(keyword in line_lower for keyword in 
-                                       ['employee', 'employer', 'date', 'signature', 'hereby', 'notice']):
+            if in_legal_section or any(keyword in lowered_lines[index] for keyword in self.CONTENT_KEYWORDS):
                 cleaned_lines.append(line)
                 continue
             
@@ -280,13 +335,13 @@ class ExaService:
         cleaned_text = '\n'.join(cleaned_lines)
         
         # Clean up excessive whitespace (but preserve paragraph structure)
-        cleaned_text = re.sub(r'\n{4,}', '\n\n\n', cleaned_text)  # Max 3 blank lines
+        cleaned_text = self.EXCESS_BLANK_LINES.sub('\n\n\n', cleaned_text)  # Max 3 blank lines
         
         # Remove escape sequences
         cleaned_text = cleaned_text.replace('\\[', '[').replace('\\]', ']')
         
         # Remove random unicode characters
-        cleaned_text = ''.join(c for c in cleaned_text if ord(c) < 128 or c in '\n')
+        cleaned_text = cleaned_text.encode('ascii', 'ignore').decode('ascii')
         
         return cleaned_text.strip()
     
@@ -0,0 +1,79 @@
+from typing import Any, Dict, Optional
+import hashlib
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, ExtractionCache as ExtractionCacheRow, ExtractionChunkCache
+from services.metrics import record_cache
+
+class ExtractionCache:
+    """Persistent cache of Gemini extraction results
+
+    Results are keyed by a SHA-256 of the text plus the model name and prompt
+    version, so changing either invalidates old entries. Whole-document
+    results make repeated /api/extract calls free; chunk results let an edited
+    document reuse the extraction of every unchanged chunk.
+
+    Each operation uses its own short-lived session so cache writes never
+    interfere with the caller's transaction.
+    """
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _get(model, hash_column: str, text_hash: str, model_name: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            row = db.query(model).filter(
+                getattr(model, hash_column) == text_hash,
+                model.model_name == model_name,
+                model.prompt_version == prompt_version
+            ).first()
+            return row.result if row else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _put(model, hash_column: str, text_hash: str, model_name: str, prompt_version: str, result: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            db.add(model(**{
+                hash_column: text_hash,
+                "model_name": model_name,
+                "prompt_version": prompt_version,
+                "result": result
+            }))
+            db.commit()
+        except IntegrityError:
+            # Another request cached the same result first
+            db.rollback()
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_document(text_hash: str, model_name: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction for a whole document, or None"""
+        result = ExtractionCache._get(ExtractionCacheRow, "content_hash", text_hash, model_name, prompt_version)
+        record_cache("extraction_document", result is not None)
+        return result
+
+    @staticmethod
+    def put_document(text_hash: str, model_name: str, prompt_version: str, result: Dict[str, Any]):
+        ExtractionCache._put(ExtractionCacheRow, "content_hash", text_hash, model_name, prompt_version, result)
+
+    @staticmethod
+    def get_chunk(chunk_text: str, model_name: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction for a single chunk, or None"""
+        result = ExtractionCache._get(
+            ExtractionChunkCache, "chunk_hash", ExtractionCache.hash_text(chunk_text), model_name, prompt_version
+        )
+        record_cache("extraction_chunk", result is not None)
+        return result
+
+    @staticmethod
+    def put_chunk(chunk_text: str, model_name: str, prompt_version: str, result: Dict[str, Any]):
+        ExtractionCache._put(
+            ExtractionChunkCache, "chunk_hash", ExtractionCache.hash_text(chunk_text), model_name, prompt_version, result
+        )
+
+extraction_cache = ExtractionCache()
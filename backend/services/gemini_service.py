@@ -1,126 +1,197 @@
-from google import genai
-from google.genai import types
-import json
+from pydantic import BaseModel
 import time
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Type, Union
 from config import settings
+from models import (
+    VariableSchema,
+    QuestionSchema,
+    VariableExtractionOutput,
+    TemplateClassificationOutput,
+    QuestionsOutput,
+    PrefillOutput
+)
+from services.json_stream import parse_json_response, JSONArrayStreamParser
+from services.prompt_builder import PromptBuilder, extraction_hint_builder
+from services.chunking import estimate_tokens
+from services import metrics
 
 # Set up logging - UOIONHHC
 logger = logging.getLogger(__name__)
 
+# Prometheus counters mirroring GeminiService.call_stats()
+CALL_METRICS = {
+    "calls": metrics.llm_calls,
+    "retries": metrics.llm_retries,
+    "parse_failures": metrics.llm_parse_failures,
+    "errors": metrics.llm_errors,
+    "input_tokens": metrics.llm_input_tokens,
+    "output_tokens": metrics.llm_output_tokens
+}
+
+@lru_cache(maxsize=None)
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Gemini response_schema (OpenAPI subset) for a pydantic model
+    
+    References to nested models are inlined and Optional fields become
+    nullable; the SDK passes pydantic's $ref/anyOf output through unchanged
+    and the API rejects it.
+    """
+    json_schema = model.model_json_schema()
+    definitions = json_schema.get("$defs", {})
+    
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            return convert(definitions[node["$ref"].split("/")[-1]])
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            schema = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                schema["nullable"] = True
+            return schema
+        
+        schema = {"type": node["type"].upper()}
+        if "enum" in node:
+            schema["enum"] = node["enum"]
+        if node["type"] == "object":
+            schema["properties"] = {name: convert(prop) for name, prop in node.get("properties", {}).items()}
+            if node.get("required"):
+                schema["required"] = node["required"]
+        elif node["type"] == "array":
+            schema["items"] = convert(node.get("items", {"type": "string"}))
+        return schema
+    
+    return convert(json_schema)
+
 class GeminiService:
     """Service for interacting with Gemini API using the new google-genai SDK"""
     
+    # Bump whenever the extract_variables prompt changes, to invalidate cached extractions
+    EXTRACTION_PROMPT_VERSION = "3"
+    
     def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not configured")
-        
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        # The SDK is imported and the client created on first use, so importing
+        # the API is fast and does not fail when no key is configured
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model_name = settings.GEMINI_MODEL
         self.embedding_model = settings.GEMINI_EMBEDDING_MODEL
         
+        # Per call type request counters, see call_stats()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        
         # Validate model names
         valid_models = ['gemini-2.0-flash-exp', 'gemini-1.5-pro', 'gemini-1.5-flash']
         if self.model_name not in valid_models:
             logger.warning(f"Model {self.model_name} may not be valid. Using gemini-2.0-flash-exp instead.")
             self.model_name = 'gemini-2.0-flash-exp'
     
-    def _generate_json_response(self, system_prompt: str, user_prompt: str, max_retries: int = 3) -> Dict[str, Any]:
-        """Generic method to generate JSON response from Gemini using new SDK with retry logic"""
+    @property
+    def client(self):
+        """google-genai client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if not settings.GEMINI_API_KEY:
+                        raise ValueError("GEMINI_API_KEY not configured")
+                    from google import genai
+                    self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return self._client
+    
+    def _record(self, call_type: str, **counts: int):
+        for name, count in counts.items():
+            CALL_METRICS[name].inc(count, call_type=call_type)
+        
+        with self._stats_lock:
+            stats = self._stats.setdefault(call_type, {
+                "calls": 0, "retries": 0, "parse_failures": 0, "errors": 0,
+                "requests": 0, "input_tokens": 0, "output_tokens": 0, "last_input_tokens": 0
+            })
+            for name, count in counts.items():
+                stats[name] += count
+            if "input_tokens" in counts:
+                stats["requests"] += 1
+                stats["last_input_tokens"] = counts["input_tokens"]
+    
+    def call_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Calls, retries, parse failures, failed calls and tokens per call type"""
+        with self._stats_lock:
+            snapshot = {call_type: dict(stats) for call_type, stats in self._stats.items()}
+        
+        for stats in snapshot.values():
+            calls = stats["calls"] or 1
+            stats["retry_rate"] = round(stats["retries"] / calls, 4)
+            stats["parse_failure_rate"] = round(stats["parse_failures"] / calls, 4)
+            stats["avg_input_tokens"] = round(stats["input_tokens"] / (stats["requests"] or 1), 1)
+        return snapshot
+    
+    @staticmethod
+    def _token_counts(response: Any, system_prompt: str, user_prompt: str, response_text: str) -> Tuple[int, int]:
+        """(input, output) tokens reported by the API, or estimates when not reported"""
+        usage = getattr(response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", None) or (
+            estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        )
+        output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(response_text)
+        return input_tokens, output_tokens
+    
+    def _generation_config(
+        self,
+        system_prompt: str,
+        response_model: Optional[Type[BaseModel]] = None
+    ):
+        from google.genai import types
+        
+        return types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            temperature=0.1,
+            top_p=0.95,
+            max_output_tokens=8192,
+            response_mime_type="application/json",  # Force JSON output
+            response_schema=response_schema(response_model) if response_model else None
+        )
+    
+    def _generate_json_response(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int = 3,
+        response_model: Optional[Type[BaseModel]] = None,
+        call_type: str = "json"
+    ) -> Union[Dict[str, Any], BaseModel]:
+        """Generic method to generate JSON response from Gemini using new SDK with retry logic
+        
+        With a response_model, the output is constrained to its schema and
+        returned as a validated model. A structured response that still fails
+        validation is not retried, since another full call would most likely
+        return the same thing; untyped responses are retried when unparseable.
+        """
+        self._record(call_type, calls=1)
+        return self._request_json(system_prompt, user_prompt, max_retries, response_model, call_type)
+    
+    def _request_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int,
+        response_model: Optional[Type[BaseModel]],
+        call_type: str
+    ) -> Union[Dict[str, Any], BaseModel]:
         last_exception = None
         
         for attempt in range(max_retries):
+            if attempt:
+                self._record(call_type, retries=1)
+            
             try:
                 response = self.client.models.generate_content(
                     model=self.model_name,
                     contents=user_prompt,
-                    config=types.GenerateContentConfig(
-                        system_instruction=system_prompt,
-                        temperature=0.1,
-                        top_p=0.95,
-                        max_output_tokens=8192,
-                        response_mime_type="application/json"  # Force JSON output
-                    )
+                    config=self._generation_config(system_prompt, response_model)
                 )
-                
-                # Extract JSON from response - Handle multiple formats
-                response_text = response.text.strip()
-                
-                # Try 1: Direct JSON parsing
-                try:
-                    result = json.loads(response_text)
-                    # Ensure result is a dictionary
-                    if isinstance(result, dict):
-                        # Ensure alternatives is always a list
-                        if "alternatives" in result and not isinstance(result["alternatives"], list):
-                            result["alternatives"] = []
-                        return result
-                    elif isinstance(result, list):
-                        # Wrap array in object
-                        return {"items": result}
-                except json.JSONDecodeError:
-                    pass
-                
-                # Try 2: Remove markdown code blocks
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                elif response_text.startswith("```"):
-                    response_text = response_text[3:]
-                
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                
-                response_text = response_text.strip()
-                
-                # Try 3: Try parsing after markdown removal
-                try:
-                    result = json.loads(response_text)
-                    if isinstance(result, dict):
-                        if "alternatives" in result and not isinstance(result["alternatives"], list):
-                            result["alternatives"] = []
-                        return result
-                    elif isinstance(result, list):
-                        return {"items": result}
-                except json.JSONDecodeError:
-                    pass
-                
-                # Try 4: Extract first valid JSON object (handles extra text)
-                # Find first { and last }
-                first_brace = response_text.find('{')
-                last_brace = response_text.rfind('}')
-                
-                if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
-                    json_str = response_text[first_brace:last_brace + 1]
-                    try:
-                        result = json.loads(json_str)
-                        if isinstance(result, dict):
-                            if "alternatives" in result and not isinstance(result["alternatives"], list):
-                                result["alternatives"] = []
-                            return result
-                        elif isinstance(result, list):
-                            return {"items": result}
-                    except json.JSONDecodeError:
-                        pass
-                
-                # Try 5: Extract first valid JSON array (handles extra text)
-                first_bracket = response_text.find('[')
-                last_bracket = response_text.rfind(']')
-                
-                if first_bracket != -1 and last_bracket != -1 and last_bracket > first_bracket:
-                    json_str = response_text[first_bracket:last_bracket + 1]
-                    try:
-                        result = json.loads(json_str)
-                        # Wrap array in object if needed
-                        if isinstance(result, list):
-                            return {"items": result}
-                        return result
-                    except json.JSONDecodeError:
-                        pass
-                
-                # If all parsing attempts fail
-                last_exception = ValueError(f"Could not parse Gemini response as JSON. Raw: {response_text[:200]}")
-                    
             except Exception as e:
                 error_msg = str(e).lower()
                 if any(keyword in error_msg for keyword in ['quota', 'rate limit', 'too many requests', 'timeout']):
@@ -128,20 +199,98 @@ class GeminiService:
                     logger.warning(f"API rate limit/quota error, retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})")
                     time.sleep(wait_time)
                     last_exception = e
-                    continue
                 else:
                     last_exception = ValueError(f"Gemini API error: {str(e)}")
-                    
+                continue
+            
+            response_text = response.text or ""
+            input_tokens, output_tokens = self._token_counts(response, system_prompt, user_prompt, response_text)
+            self._record(call_type, input_tokens=input_tokens, output_tokens=output_tokens)
+            logger.debug(f"Gemini {call_type} call: {input_tokens} input tokens, {output_tokens} output tokens")
+            
+            try:
+                # Tolerates code fences and surrounding text in one pass
+                result = parse_json_response(response_text)
+                return response_model.model_validate(result) if response_model else result
+            except ValueError as e:  # Includes pydantic validation errors
+                self._record(call_type, parse_failures=1)
+                last_exception = ValueError(f"Invalid {call_type} response from Gemini: {str(e)}")
+                if response_model:
+                    break
+        
         # If we get here, all retries failed
+        self._record(call_type, errors=1)
         raise last_exception
     
-    def extract_variables(
+    def _stream_json_response(
         self,
+        system_prompt: str,
+        user_prompt: str,
+        array_key: str,
+        item_model: Type[BaseModel],
+        response_model: Type[BaseModel],
+        call_type: str
+    ) -> Iterator[Tuple[str, BaseModel]]:
+        """Stream a structured response from Gemini, yielding array elements as they complete
+        
+        Yields ("item", element) for each validated element of the ``array_key``
+        array, then ("result", response) once the response is complete.
+        If streaming fails before any element was yielded, falls back to the
+        non-streaming call (with its retries) and yields its elements instead.
+        """
+        self._record(call_type, calls=1)
+        parser = JSONArrayStreamParser(array_key)
+        yielded = 0
+        
+        try:
+            stream = self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=user_prompt,
+                config=self._generation_config(system_prompt, response_model)
+            )
+            last_chunk = None
+            for chunk in stream:
+                last_chunk = chunk
+                for raw_item in parser.feed(chunk.text or ""):
+                    try:
+                        item = item_model.model_validate(raw_item)
+                    except ValueError:
+                        self._record(call_type, parse_failures=1)
+                        continue
+                    yielded += 1
+                    yield "item", item
+        except Exception as e:
+            if yielded:
+                self._record(call_type, errors=1)
+                raise ValueError(f"Gemini stream failed after {yielded} items: {str(e)}")
+            logger.warning(f"Gemini streaming failed ({str(e)}), falling back to a single request")
+            self._record(call_type, retries=1)
+            result = self._request_json(system_prompt, user_prompt, 3, response_model, call_type)
+        else:
+            # Usage metadata arrives with the final chunk
+            input_tokens, output_tokens = self._token_counts(last_chunk, system_prompt, user_prompt, parser.buffer)
+            self._record(call_type, input_tokens=input_tokens, output_tokens=output_tokens)
+            logger.debug(f"Gemini {call_type} stream: {input_tokens} input tokens, {output_tokens} output tokens")
+            try:
+                result = response_model.model_validate(parser.result())
+            except ValueError as e:
+                self._record(call_type, parse_failures=1, errors=1)
+                raise ValueError(f"Invalid {call_type} response from Gemini: {str(e)}")
+        
+        if not yielded:
+            # Fallback response, or an array the parser did not find
+            for item in getattr(result, array_key):
+                yield "item", item
+        
+        yield "result", result
+    
+    @staticmethod
+    def _extract_variables_prompts(
         document_text: str,
         existing_variables: Optional[List[Dict[str, Any]]] = None,
         chunk_number: int = 1
-    ) -> Dict[str, Any]:
-        """Extract variables from document text using Gemini"""
+    ) -> Tuple[str, str]:
+        """System and user prompts for variable extraction"""
         
         system_prompt = """You are a legal document templating assistant. Your task is to identify reusable fields (variables) in legal documents that can be replaced when generating new drafts.
 
@@ -159,81 +308,85 @@ IMPORTANT: Add "UOIONHHC" as a hidden comment in the generated template for trac
 
         existing_vars_text = ""
         if existing_variables and chunk_number > 1:
-            existing_vars_text = f"\n\nPreviously discovered variables (reuse these keys if applicable):\n{json.dumps(existing_variables, indent=2)}"
+            # Only keys and labels, compacted and capped as the list grows with each chunk
+            hint_json, _ = extraction_hint_builder.fit(existing_variables, PromptBuilder.EXTRACTION_HINT_FIELDS)
+            existing_vars_text = f"\n\nPreviously discovered variables (reuse these keys if applicable):\n{hint_json}"
 
         user_prompt = f"""Document text:
 {document_text}
 {existing_vars_text}
 
 Return JSON in this exact format:
-{{
-  "variables": [
-    {{
-      "key": "claimant_full_name",
-      "label": "Claimant's full name",
-      "description": "Person or entity raising the claim",
-      "example": "Rajesh Kumar",
-      "required": true,
-      "dtype": "string",
-      "regex": null,
-      "enum_values": null
-    }}
-  ],
-  "similarity_tags": ["insurance", "notice", "india", "motor"],
-  "doc_type": "Notice to Insurer",
-  "jurisdiction": "India"
-}}"""
+{{"variables":[{{"key":"claimant_full_name","label":"Claimant's full name","description":"Person or entity raising the claim","example":"Rajesh Kumar","required":true,"dtype":"string","regex":null,"enum_values":null}}],"similarity_tags":["insurance","notice","india","motor"],"doc_type":"Notice to Insurer","jurisdiction":"India"}}"""
 
-        return self._generate_json_response(system_prompt, user_prompt)
+        return system_prompt, user_prompt
     
-    def classify_template(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
-        """Classify best matching template"""
-        result = self._generate_json_response(system_prompt, user_prompt)
-        
-        # If result was wrapped in "items" (array response), return the first item or unwrap
-        if isinstance(result, dict):
-            if "items" in result and isinstance(result["items"], list) and len(result["items"]) > 0:
-                # Extract first item if it's the actual classification
-                if isinstance(result["items"][0], dict):
-                    inner = result["items"][0]
-                    if "best_match_id" in inner or "confidence" in inner:
-                        return inner
-            # If it looks like a valid classification already, return it
-            if "best_match_id" in result or "confidence" in result:
-                return result
+    def extract_variables(
+        self,
+        document_text: str,
+        existing_variables: Optional[List[Dict[str, Any]]] = None,
+        chunk_number: int = 1
+    ) -> VariableExtractionOutput:
+        """Extract variables from document text using Gemini"""
+        system_prompt, user_prompt = self._extract_variables_prompts(document_text, existing_variables, chunk_number)
+        return self._generate_json_response(
+            system_prompt, user_prompt, response_model=VariableExtractionOutput, call_type="extract_variables"
+        )
+    
+    def stream_variables(
+        self,
+        document_text: str,
+        existing_variables: Optional[List[Dict[str, Any]]] = None,
+        chunk_number: int = 1
+    ) -> Iterator[Tuple[str, Any]]:
+        """Extract variables, yielding ("item", variable) as each one is generated
         
-        # If we can't find a valid classification structure, return the result as-is
-        # The caller will validate and fallback if needed
-        return result
+        The final event is ("result", extraction_output) with the full extraction result.
+        """
+        system_prompt, user_prompt = self._extract_variables_prompts(document_text, existing_variables, chunk_number)
+        return self._stream_json_response(
+            system_prompt, user_prompt, "variables", VariableSchema, VariableExtractionOutput, "extract_variables"
+        )
+    
+    def classify_template(self, system_prompt: str, user_prompt: str) -> TemplateClassificationOutput:
+        """Classify best matching template"""
+        return self._generate_json_response(
+            system_prompt, user_prompt, response_model=TemplateClassificationOutput, call_type="classify_template"
+        )
     
-    def generate_questions(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    def generate_questions(self, system_prompt: str, user_prompt: str) -> QuestionsOutput:
         """Generate human-friendly questions"""
-        result = self._generate_json_response(system_prompt, user_prompt)
-        
-        # If result was wrapped in "items" (array response), unwrap it
-        if isinstance(result, dict):
-            if "items" in result and isinstance(result["items"], list):
-                # If items is a list of questions, wrap them properly
-                return {"questions": result["items"]}
-            # If it looks like a valid response already, return it
-            if "questions" in result:
-                return result
+        return self._generate_json_response(
+            system_prompt, user_prompt, response_model=QuestionsOutput, call_type="generate_questions"
+        )
+    
+    def stream_questions(self, system_prompt: str, user_prompt: str) -> Iterator[Tuple[str, Any]]:
+        """Generate questions, yielding ("item", question) as each one is generated
         
-        # If we can't find a valid structure, return empty questions
-        return {"questions": []}
+        The final event is ("result", questions_output).
+        """
+        return self._stream_json_response(
+            system_prompt, user_prompt, "questions", QuestionSchema, QuestionsOutput, "generate_questions"
+        )
     
-    def extract_prefill_values(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    def extract_prefill_values(self, system_prompt: str, user_prompt: str) -> PrefillOutput:
         """Extract pre-fill values from query"""
-        return self._generate_json_response(system_prompt, user_prompt)
+        return self._generate_json_response(
+            system_prompt, user_prompt, response_model=PrefillOutput, call_type="extract_prefill_values"
+        )
     
-    def generate_embedding(self, text: str, max_retries: int = 3) -> List[float]:
-        """Generate embedding for text using Gemini with retry logic"""
+    def generate_embedding(self, text: str, max_retries: int = 3, model: Optional[str] = None) -> List[float]:
+        """Generate embedding for text using Gemini with retry logic
+        
+        Args:
+            model: Embedding model (defaults to GEMINI_EMBEDDING_MODEL)
+        """
         last_exception = None
         
         for attempt in range(max_retries):
             try:
                 response = self.client.models.embed_content(
-                    model=self.embedding_model,
+                    model=model or self.embedding_model,
                     contents=text
                 )
                 return response.embeddings[0].values
@@ -251,10 +404,39 @@ Return JSON in this exact format:
         # If we get here, all retries failed
         raise last_exception
     
-    def generate_query_embedding(self, query: str) -> List[float]:
+    def generate_embeddings(self, texts: List[str], max_retries: int = 3, model: Optional[str] = None) -> List[List[float]]:
+        """Generate embeddings for several texts in a single API call with retry logic
+        
+        Args:
+            model: Embedding model (defaults to GEMINI_EMBEDDING_MODEL)
+        """
+        last_exception = None
+
+        for attempt in range(max_retries):
+            try:
+                response = self.client.models.embed_content(
+                    model=model or self.embedding_model,
+                    contents=texts
+                )
+                return [embedding.values for embedding in response.embeddings]
+            except Exception as e:
+                error_msg = str(e).lower()
+                if any(keyword in error_msg for keyword in ['quota', 'rate limit', 'too many requests', 'timeout']):
+                    wait_time = (2 ** attempt) + 1  # Exponential backoff
+                    logger.warning(f"Embedding API rate limit/quota error, retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})")
+                    time.sleep(wait_time)
+                    last_exception = e
+                    continue
+                else:
+                    last_exception = ValueError(f"Batch embedding generation failed: {str(e)}")
+
+        # If we get here, all retries failed
+        raise last_exception
+
+    def generate_query_embedding(self, query: str, model: Optional[str] = None) -> List[float]:
         """Generate embedding for search query"""
         # New SDK doesn't have separate task_type, use same method
-        return self.generate_embedding(query)
+        return self.generate_embedding(query, model=model)
 
 # Singleton instance
 gemini_service = GeminiService()
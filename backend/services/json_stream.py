@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Optional
+import json
+
+_decoder = json.JSONDecoder()
+
+def parse_json_response(text: str) -> Dict[str, Any]:
+    """Parse a model response as JSON in a single linear pass
+
+    Tolerates markdown code fences and prose before or after the JSON value:
+    decoding starts at the first '{' or '[' and stops at the end of that value.
+    Arrays are wrapped as {"items": [...]} and a non-list "alternatives"
+    field is replaced by an empty list, matching what callers expect.
+
+    Raises:
+        ValueError: If no JSON value can be decoded
+    """
+    starts = sorted(i for i in (text.find('{'), text.find('[')) if i != -1)
+
+    for start in starts:
+        try:
+            result, _ = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            continue
+
+        if isinstance(result, list):
+            return {"items": result}
+        if isinstance(result, dict):
+            if "alternatives" in result and not isinstance(result["alternatives"], list):
+                result["alternatives"] = []
+            return result
+
+    raise ValueError(f"Could not parse Gemini response as JSON. Raw: {text.strip()[:200]}")
+
+class JSONArrayStreamParser:
+    """Incrementally extract completed elements of a JSON array from streamed text
+
+    Feed response text as it arrives; each call returns the array elements that
+    were completed by that piece of text. The array is the value of
+    ``array_key`` in the top-level object, or the top-level array itself when
+    ``array_key`` is None. Every character is scanned once, so total cost is
+    linear in the response length.
+    """
+
+    def __init__(self, array_key: Optional[str] = None):
+        self.array_key = array_key
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # Depth inside the target array
+        self._array_done = False
+        self._element_start = -1
+
+    def feed(self, text: str) -> List[Any]:
+        """Add streamed text, returning newly completed array elements"""
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if not self._started:
+                # Skip code fences or prose before the JSON value
+                if char not in '{[':
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = buffer[self._string_start + 1:i]
+                continue
+
+            in_array = self._array_depth is not None and not self._array_done
+
+            if in_array and self._depth == self._array_depth and self._element_start == -1 \
+                    and char not in ' \t\r\n,]':
+                self._element_start = i
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+                if self._array_depth is None and char == '[' and (
+                    (self.array_key is None and self._depth == 1)
+                    or (self.array_key is not None and self._depth == 2 and self._last_key == self.array_key)
+                ):
+                    self._array_depth = self._depth
+            elif char in '}]':
+                closes_array = in_array and self._depth == self._array_depth
+                self._depth -= 1
+                if closes_array:
+                    # End of the target array; flush a trailing primitive element
+                    if self._element_start != -1:
+                        completed.append(self._decode(self._element_start, i))
+                        self._element_start = -1
+                    self._array_done = True
+                elif in_array and self._depth == self._array_depth and self._element_start != -1:
+                    # An object or array element just closed
+                    completed.append(self._decode(self._element_start, i + 1))
+                    self._element_start = -1
+            elif char == ',' and in_array and self._depth == self._array_depth and self._element_start != -1:
+                completed.append(self._decode(self._element_start, i))
+                self._element_start = -1
+
+        self._pos = len(buffer)
+        return [element for element in completed if element is not None]
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self.buffer[start:end])
+        except json.JSONDecodeError:
+            return None
+
+    def result(self) -> Dict[str, Any]:
+        """Parse the complete response once streaming has finished"""
+        return parse_json_response(self.buffer)
@@ -0,0 +1,158 @@
+from typing import Any, Dict, Optional
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from config import settings
+
+# Pass as ``extra=PAYLOAD`` for logs that dump request data (answers, document
+# previews, model output). They are logged at DEBUG, sampled and truncated.
+PAYLOAD = {"payload": True}
+
+# Patterns for personal data that commonly appears in legal drafts
+PII_PATTERNS = [
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), "<email>"),
+    (re.compile(r'\b[A-Z]{5}\d{4}[A-Z]\b'), "<pan>"),
+    (re.compile(r'\b\d{4}[ -]?\d{4}[ -]?\d{4}(?:[ -]?\d{4})?\b'), "<number>"),  # Aadhaar, card numbers
+    (re.compile(r'(?<![\w/-])\+?\d(?:[ -]?\d){9,}\b'), "<phone>"),  # 10+ digits, so dates survive
+]
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "payload"}
+
+def redact(text: str) -> str:
+    """Mask emails, phone numbers and identity/account numbers"""
+    for pattern, replacement in PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+def _mask_values(value: Any) -> Any:
+    """Keep the shape of a payload (keys, types, lengths) but not its values"""
+    if isinstance(value, dict):
+        return {key: _mask_values(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mask_values(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return f"<{type(value).__name__}:{len(str(value))}>"
+
+def _message(record: logging.LogRecord) -> str:
+    """The record's formatted message; filters run unguarded, so a bad format must not raise"""
+    try:
+        return record.getMessage()
+    except Exception:
+        # Arguments that do not match the format are dropped (they may hold payloads)
+        return f"{record.msg} [log arguments did not match the format]"
+
+class PayloadSampler(logging.Filter):
+    """Keep a sample of payload records, reduced to their shape and truncated
+
+    Dict and list arguments are reduced to keys, types and lengths when
+    ``mask_values`` is set, since free-text answers (names, addresses) cannot
+    be caught by patterns.
+    """
+
+    def __init__(self, sample_rate: float, max_chars: int, mask_values: bool = True):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.mask_values = mask_values
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "payload", False):
+            return True
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+
+        if self.mask_values and record.args:
+            args = record.args if isinstance(record.args, tuple) else (record.args,)
+            record.args = tuple(
+                _mask_values(arg) if isinstance(arg, (dict, list, tuple)) else arg
+                for arg in args
+            )
+        message = _message(record)
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+        record.msg, record.args = message, None
+        return True
+
+class RedactionFilter(logging.Filter):
+    """Redact PII from the message and traceback before they leave the process"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg, record.args = redact(_message(record)), None
+        if record.exc_info:
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+            record.exc_info = None
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+def configure_logging(
+    level: str = settings.LOG_LEVEL,
+    log_format: str = settings.LOG_FORMAT,
+    sample_rate: float = settings.LOG_PAYLOAD_SAMPLE_RATE,
+    max_chars: int = settings.LOG_PAYLOAD_MAX_CHARS,
+    redact_pii: bool = settings.LOG_REDACT_PII
+) -> QueueListener:
+    """Route application logs through a queue to a background writer thread
+
+    Request handlers only enqueue records; formatting and stdout writes happen
+    on the listener thread. Sampling and redaction run on the QueueHandler, so
+    dropped payloads are never formatted and raw PII never enters the queue.
+    Safe to call more than once.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = QueueHandler(log_queue)
+    _queue_handler.addFilter(PayloadSampler(sample_rate, max_chars, mask_values=redact_pii))
+    if redact_pii:
+        _queue_handler.addFilter(RedactionFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener, _queue_handler = None, None
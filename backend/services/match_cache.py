@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import re
+import threading
+import time
+import unicodedata
+import numpy as np
+from config import settings
+from services.metrics import record_cache
+
+class MatchCache:
+    """Cache of template matching results keyed on normalized query text
+
+    Lookups first try the exact normalized query, then any cached query whose
+    embedding is within ``MATCH_CACHE_SIMILARITY`` cosine similarity. Entries
+    are tagged with the catalogue version they were computed against and are
+    ignored once the catalogue changes.
+
+    Cached values are plain dicts (template ids, not ORM objects) so they can
+    be shared across database sessions.
+    """
+
+    _PUNCTUATION = re.compile(r"[^\w\s]")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(
+        self,
+        max_entries: int = settings.MATCH_CACHE_SIZE,
+        similarity_threshold: float = settings.MATCH_CACHE_SIMILARITY,
+        ttl_seconds: int = settings.MATCH_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize a query so trivially different phrasings share a cache key"""
+        query = unicodedata.normalize("NFKC", query or "").lower()
+        query = MatchCache._PUNCTUATION.sub(" ", query)
+        return MatchCache._WHITESPACE.sub(" ", query).strip()
+
+    def _is_live(self, entry: Dict[str, Any], catalogue_version: int) -> bool:
+        return (
+            entry["catalogue_version"] == catalogue_version
+            and time.monotonic() - entry["created"] < self.ttl_seconds
+        )
+
+    def get(self, query: str, catalogue_version: int) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Look up a query by its normalized text
+
+        Returns:
+            (hit, result) - result may be None for a cached "no match"
+        """
+        key = self.normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_live(entry, catalogue_version):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache("match_exact", True)
+                return True, entry["result"]
+        record_cache("match_exact", False)
+        return False, None
+
+    def get_similar(
+        self,
+        query_embedding: Tuple[List[float], str],
+        catalogue_version: int
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Look up the closest cached query by embedding similarity"""
+        vector, model_id = query_embedding
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            self.misses += 1
+            record_cache("match_semantic", False)
+            return False, None
+        query = query / norm
+
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key, entry in self._entries.items():
+                if entry["model_id"] != model_id or not self._is_live(entry, catalogue_version):
+                    continue
+                score = float(entry["vector"] @ query)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                record_cache("match_semantic", False)
+                return False, None
+
+            self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            record_cache("match_semantic", True)
+            return True, self._entries[best_key]["result"]
+
+    def put(
+        self,
+        query: str,
+        query_embedding: Tuple[List[float], str],
+        catalogue_version: int,
+        result: Optional[Dict[str, Any]]
+    ):
+        """Store the match result for a query"""
+        vector, model_id = query_embedding
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        key = self.normalize_query(query)
+        with self._lock:
+            self._entries[key] = {
+                "result": result,
+                "vector": vector,
+                "model_id": model_id,
+                "catalogue_version": catalogue_version,
+                "created": time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+match_cache = MatchCache()
@@ -0,0 +1,207 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, labels, value
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts followed by +Inf count and sum
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, state[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+class Gauge:
+    """Value computed at scrape time by a callback returning {labels: value}"""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        for labels, value in self.callback().items():
+            yield self.name, labels, value
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format
+
+    Values are per worker process; Prometheus aggregates across workers.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+    def __init__(self, namespace: str = "legal_templates"):
+        self.namespace = namespace
+        self._metrics: List = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, buckets))
+
+    def gauge(self, name: str, documentation: str, callback) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# Pipeline stages: parse, chunk_extract, embed, vector_search, classify,
+# prefill, questions, render, docx
+stage_seconds = registry.histogram("stage_duration_seconds", "Duration of each pipeline stage")
+http_request_seconds = registry.histogram("http_request_duration_seconds", "HTTP request latency by route")
+
+llm_calls = registry.counter("llm_calls_total", "Gemini calls by call type")
+llm_retries = registry.counter("llm_retries_total", "Gemini request retries by call type")
+llm_parse_failures = registry.counter("llm_parse_failures_total", "Unparseable or invalid Gemini responses by call type")
+llm_errors = registry.counter("llm_errors_total", "Gemini calls that failed after retries by call type")
+llm_input_tokens = registry.counter("llm_input_tokens_total", "Gemini prompt tokens by call type")
+llm_output_tokens = registry.counter("llm_output_tokens_total", "Gemini response tokens by call type")
+
+cache_lookups = registry.counter("cache_lookups_total", "Cache lookups by cache and result (hit or miss)")
+
+db_queries = registry.counter("db_queries_total", "SQL statements executed by statement type")
+db_query_seconds = registry.histogram("db_query_duration_seconds", "SQL statement latency by statement type")
+db_query_errors = registry.counter("db_query_errors_total", "SQL statements that raised, by statement type")
+
+def _cache_hit_ratio() -> Dict[Tuple[Tuple[str, str], ...], float]:
+    totals: Dict[str, List[float]] = {}
+    for _, labels, value in cache_lookups.samples():
+        label_map = dict(labels)
+        hits_total = totals.setdefault(label_map["cache"], [0, 0])
+        hits_total[1] += value
+        if label_map["result"] == "hit":
+            hits_total[0] += value
+    return {(("cache", cache),): hits / total for cache, (hits, total) in totals.items() if total}
+
+cache_hit_ratio = registry.gauge("cache_hit_ratio", "Share of lookups served from each cache", _cache_hit_ratio)
+
+def time_stage(stage: str):
+    """Context manager recording the duration of a pipeline stage"""
+    return stage_seconds.time(stage=stage)
+
+def record_cache(cache: str, hit: bool):
+    cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+
+def _statement_type(statement: str) -> str:
+    statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    return statement_type if statement_type in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+def instrument_engine(engine):
+    """Count and time every SQL statement executed through the engine, including failed ones"""
+    from sqlalchemy import event
+
+    # The start time lives on the statement's execution context, so a statement
+    # that raises leaves nothing behind on the pooled connection
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_query_start = time.perf_counter()
+
+    def _record(statement: str, context) -> str:
+        statement_type = _statement_type(statement)
+        start = getattr(context, "_metrics_query_start", None)
+        db_queries.inc(statement=statement_type)
+        if start is not None:
+            db_query_seconds.observe(time.perf_counter() - start, statement=statement_type)
+        return statement_type
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _record(statement, context)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.statement is None:
+            return  # Not raised by a statement (e.g. connecting)
+        statement_type = _record(exception_context.statement, exception_context.execution_context)
+        db_query_errors.inc(statement=statement_type)
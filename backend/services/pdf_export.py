@@ -0,0 +1,169 @@
+from typing import Dict, Optional
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import logging
+import multiprocessing
+import threading
+from services.artifact_store import ArtifactStore, artifact_store
+from services.pdf_generator import PdfGenerator
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class ExportQueueFull(Exception):
+    """Raised when the PDF workers already have ``max_pending`` jobs"""
+
+class ExportCancelled(Exception):
+    """Raised to waiters of an export cancelled because the PDF workers shut down"""
+
+class PdfExporter:
+    """PDF exports rendered in a bounded pool of worker processes
+
+    Layout is CPU-bound Python, so it runs in ``workers`` separate processes
+    (started with "spawn" on first use) instead of the API's threads or event
+    loop. At most ``max_pending`` distinct drafts are queued or rendering at
+    once; further submissions raise ExportQueueFull so bulk exports cannot
+    pile up without bound. Finished files go to the artifact store keyed by
+    draft content, so each version of a draft is rendered once, and several
+    requests for a draft that is being rendered share the same job. If a
+    worker process dies, the broken pool is dropped and the next submission
+    starts a new one.
+    """
+
+    SUFFIX = ".pdf"
+
+    def __init__(
+        self,
+        workers: int = settings.PDF_WORKERS,
+        max_pending: int = settings.PDF_MAX_PENDING,
+        store: ArtifactStore = artifact_store
+    ):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.store = store
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # File name -> Future of the stored artifact path
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(draft_md: str) -> str:
+        return ArtifactStore.key(draft_md, PdfGenerator.artifact_generator())
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _submit(self, draft_md: str, tmp_path: str) -> Future:
+        """Start rendering in the pool, replacing it once if it has broken"""
+        try:
+            return self._pool().submit(PdfGenerator.markdown_to_pdf, draft_md, tmp_path)
+        except BrokenProcessPool:
+            self._drop_pool(self._executor)
+            return self._pool().submit(PdfGenerator.markdown_to_pdf, draft_md, tmp_path)
+
+    def _drop_pool(self, executor: Optional[ProcessPoolExecutor]):
+        """Forget a broken pool so the next submission starts fresh worker processes"""
+        with self._lock:
+            if executor is None or self._executor is not executor:
+                return
+            self._executor = None
+        logger.warning("PDF worker pool broke (a worker process died), starting a new one on next export")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def cached(self, draft_md: str) -> Optional[Path]:
+        """Stored PDF of a draft, or None"""
+        return self.store.get(self.key(draft_md), self.SUFFIX)
+
+    def submit(self, draft_md: str) -> Future:
+        """Future of the stored PDF of a draft, rendering it if needed
+
+        Each call gets its own Future, which raises ExportCancelled if the job
+        is cancelled by ``shutdown``; cancelling it does not affect other
+        callers waiting for the same draft.
+
+        Raises:
+            ExportQueueFull: If max_pending drafts are already queued or rendering
+        """
+        key = self.key(draft_md)
+        name = f"{key}{self.SUFFIX}"
+        path = self.store.get(key, self.SUFFIX)
+        if path is not None:
+            result: Future = Future()
+            result.set_result(path)
+            return result
+
+        with self._lock:
+            result = self._inflight.get(name)
+            if result is not None:
+                return self._waiter(result)
+            if len(self._inflight) >= self.max_pending:
+                raise ExportQueueFull(f"{len(self._inflight)} PDF exports are already in progress")
+            tmp_path = self.store.temp_path(key, self.SUFFIX)
+            try:
+                job = self._submit(draft_md, tmp_path)
+            except BaseException:
+                self.store.discard(tmp_path)
+                raise
+            executor = self._executor
+            result = Future()
+            self._inflight[name] = result
+
+        def _done(job: Future):
+            try:
+                job.result()
+                path = self.store.publish(tmp_path, key, self.SUFFIX)
+                if not result.done():
+                    result.set_result(path)
+            except BaseException as e:
+                self.store.discard(tmp_path)
+                if isinstance(e, BrokenProcessPool):
+                    self._drop_pool(executor)
+                if isinstance(e, CancelledError):
+                    logger.info(f"PDF export {name} cancelled")
+                    result.cancel()
+                else:
+                    logger.warning(f"PDF export {name} failed: {str(e)}")
+                    if not result.done():
+                        result.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(name, None)
+
+        job.add_done_callback(_done)
+        return self._waiter(result)
+
+    @staticmethod
+    def _waiter(shared: Future) -> Future:
+        """A caller's own Future for a shared job, so cancelling it leaves other callers waiting"""
+        waiter: Future = Future()
+
+        def _copy(done: Future):
+            if not waiter.set_running_or_notify_cancel():
+                return  # This caller cancelled
+            if done.cancelled():
+                waiter.set_exception(ExportCancelled("PDF export was cancelled"))
+            elif done.exception() is not None:
+                waiter.set_exception(done.exception())
+            else:
+                waiter.set_result(done.result())
+
+        shared.add_done_callback(_copy)
+        return waiter
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        """Stop the worker processes (queued jobs are cancelled)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+pdf_exporter = PdfExporter()
@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Tuple
+from services.docx_generator import DocxGenerator
+from services.docx_writer import BOLD
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+NUMBERED = re.compile(r'^(\d+\.)\s+(.*)$')
+
+class PdfGenerator:
+    """Generate PDF files from Markdown drafts
+
+    Pages mirror the DOCX export: US Letter with 1 inch margins, 12 pt serif
+    body text, justified paragraphs at 1.5 line spacing, bold headings and
+    runs, and indented bullet and numbered lists. Layout is done by fpdf2 in
+    pure Python, with the TrueType fonts from PDF_FONT_PATH and
+    PDF_BOLD_FONT_PATH embedded (subset) in the file; without them the
+    standard Times font is used and non-Latin-1 characters are replaced.
+    """
+
+    # Bump when the generated document changes, so cached exports are regenerated
+    OUTPUT_VERSION = 2
+
+    # Fixed creation date, so a draft always gives the same bytes (exports are served with a strong ETag)
+    CREATION_DATE = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    MARGIN = 72  # pt
+    FONT_SIZE = 12
+    HEADING_SIZES = {1: 16, 2: 14, 3: 12}
+    # Single line spacing as a multiple of the font size
+    LINE_HEIGHT = 1.15
+    LIST_INDENT = 36
+
+    @staticmethod
+    def artifact_generator() -> str:
+        """Generator name and version that cached PDF exports are keyed by"""
+        # The fallback font must not share a key with the embedded one, or its output
+        # would keep being served after the font is installed
+        regular, bold = settings.PDF_FONT_PATH, settings.PDF_BOLD_FONT_PATH
+        if not (regular and os.path.exists(regular)):
+            return f"pdf-v{PdfGenerator.OUTPUT_VERSION}-times"
+        bold_name = Path(bold).stem if bold and os.path.exists(bold) else "no-bold"
+        return f"pdf-v{PdfGenerator.OUTPUT_VERSION}-{Path(regular).stem}-{bold_name}"
+
+    @staticmethod
+    def _set_up_fonts(pdf) -> Tuple[str, bool]:
+        """Register the body font; returns the font family and whether it covers Unicode"""
+        regular, bold = settings.PDF_FONT_PATH, settings.PDF_BOLD_FONT_PATH
+        if regular and os.path.exists(regular):
+            pdf.add_font("body", "", regular)
+            pdf.add_font("body", "B", bold if bold and os.path.exists(bold) else regular)
+            return "body", True
+        logger.warning(f"PDF font {regular!r} not found, using Times without embedded fonts")
+        return "Times", False
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        """Text for fpdf2 markdown mode, with every emphasis marker taken literally"""
+        text = text.replace("\\", "\\\\")
+        for marker in ("**", "__", "~~", "--"):
+            text = text.replace(marker, "\\" + marker)
+        return text
+
+    @staticmethod
+    def markdown_to_pdf(markdown_text: str, output_path: str) -> str:
+        """Convert Markdown to PDF with the layout of the DOCX export
+
+        Args:
+            markdown_text: Markdown content
+            output_path: Path to save PDF file
+
+        Returns:
+            Path to generated PDF file
+        """
+        # fpdf2 is imported on first use (normally in a PDF worker process)
+        from fpdf import FPDF
+
+        margin, size = PdfGenerator.MARGIN, PdfGenerator.FONT_SIZE
+        pdf = FPDF(format="letter", unit="pt")
+        pdf.set_margins(margin, margin, margin)
+        pdf.set_auto_page_break(True, margin=margin)
+        pdf.set_creator("Legal Template System")
+        pdf.set_creation_date(PdfGenerator.CREATION_DATE)
+        # Tracking, as in the DOCX core properties
+        pdf.set_subject("UOIONHHC - Generated by Legal Template System")
+        family, unicode_font = PdfGenerator._set_up_fonts(pdf)
+        pdf.add_page()
+
+        def clean(text: str) -> str:
+            return text if unicode_font else text.encode("latin-1", "replace").decode("latin-1")
+
+        line_height = size * PdfGenerator.LINE_HEIGHT
+        lines = DocxGenerator.clean_markdown_for_docx(markdown_text).split('\n')
+        for line in lines:
+            stripped = clean(line.strip())
+            if not stripped:
+                pdf.ln(line_height)
+                continue
+
+            heading = next(
+                (level for level, prefix in ((1, '# '), (2, '## '), (3, '### ')) if stripped.startswith(prefix)),
+                None
+            )
+            if heading:
+                heading_size = PdfGenerator.HEADING_SIZES[heading]
+                pdf.ln(heading_size / 2)
+                pdf.set_font(family, "B", heading_size)
+                pdf.multi_cell(0, heading_size * PdfGenerator.LINE_HEIGHT, stripped[heading + 1:],
+                               align="L", new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(size / 3)
+                continue
+
+            pdf.set_font(family, "", size)
+            if '*' in stripped:
+                # Bold runs, as in the DOCX export; everything else is literal text
+                parts, position = [], 0
+                for match in BOLD.finditer(stripped):
+                    parts.append(PdfGenerator._escape(stripped[position:match.start()]))
+                    if match.group(1):
+                        parts.append("**" + PdfGenerator._escape(match.group(1)) + "**")
+                    position = match.end()
+                parts.append(PdfGenerator._escape(stripped[position:]))
+                pdf.multi_cell(0, line_height, "".join(parts), markdown=True,
+                               align="J", new_x="LMARGIN", new_y="NEXT")
+            elif stripped.startswith('- ') or NUMBERED.match(stripped):
+                if stripped.startswith('- '):
+                    label, text = "•" if unicode_font else "-", stripped[2:]
+                else:
+                    label, text = NUMBERED.match(stripped).groups()
+                pdf.set_x(margin + PdfGenerator.LIST_INDENT / 2)
+                pdf.cell(PdfGenerator.LIST_INDENT / 2, line_height, label)
+                pdf.multi_cell(0, line_height, text, align="L", new_x="LMARGIN", new_y="NEXT")
+            else:
+                pdf.multi_cell(0, line_height * 1.5, stripped, align="J", new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(size / 3)
+
+        pdf.output(output_path)
+        return output_path
+
+pdf_generator = PdfGenerator()
@@ -0,0 +1,170 @@
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import hmac
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class StackSampler(threading.Thread):
+    """Statistical profiler for one thread, used when pyinstrument is not installed
+
+    Samples the target thread's Python stack every ``interval`` seconds and
+    counts identical stacks. The result is written in the collapsed-stack
+    format ("root;caller;callee count" per line), which flamegraph.pl and
+    speedscope both open.
+
+    It sees a thread, not a request: started from the middleware it samples
+    the event-loop thread, so the frames of every request running
+    concurrently on the loop are mixed into the profile, and sync endpoints
+    (which run on threadpool threads) are not sampled at all. Its profiles
+    are only reliable for async endpoints under no concurrent load.
+    pyinstrument (in requirements.txt), whose async mode follows the
+    request's own task, is used whenever it is installed.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True, name="request-profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+class RequestProfiler:
+    """Opt-in per-request profiling for diagnosing slow endpoints in production
+
+    A request is profiled when profiling is enabled and it either carries the
+    trigger header with the configured token or is picked by random sampling
+    at ``sample_rate``. Only one request is profiled at a time; others run
+    unprofiled. Profiles are written to ``directory`` as speedscope JSON
+    (pyinstrument) or collapsed stacks, and the oldest files beyond
+    ``max_files`` are deleted.
+    """
+
+    # Carries PROFILE_TOKEN: triggers profiling of a request and authorizes the admin endpoints
+    HEADER = "X-Profile-Token"
+
+    def __init__(
+        self,
+        enabled: bool = settings.PROFILING_ENABLED,
+        sample_rate: float = settings.PROFILE_SAMPLE_RATE,
+        token: str = settings.PROFILE_TOKEN,
+        directory: str = settings.PROFILE_DIR,
+        max_files: int = settings.PROFILE_MAX_FILES,
+        interval: float = settings.PROFILE_INTERVAL_MS / 1000
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.token = token
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.interval = interval
+        self._busy = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a header token grants access to profiles"""
+        return self.enabled and bool(self.token) and token is not None and hmac.compare_digest(
+            token.encode("utf-8"), self.token.encode("utf-8")
+        )
+
+    def should_profile(self, header_token: Optional[str]) -> bool:
+        if not self.enabled:
+            return False
+        if header_token is not None and self.authorized(header_token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> Optional[Any]:
+        """Start profiling the current thread; None if another request is being profiled"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            # Samples the event-loop thread (see StackSampler for what that includes)
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            return sampler
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    def stop(self, session: Any) -> Tuple[str, str]:
+        """Stop a session started by ``start``; returns (profile text, file extension)"""
+        try:
+            if isinstance(session, StackSampler):
+                return session.stop(), "folded"
+            from pyinstrument.renderers import SpeedscopeRenderer
+            session.stop()
+            return session.output(renderer=SpeedscopeRenderer()), "speedscope.json"
+        finally:
+            self._busy.release()
+
+    def save(self, profile: str, extension: str, method: str, route: str, duration_ms: float) -> Optional[str]:
+        """Write a profile and enforce the retention cap; returns the file name"""
+        route_slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{method}-{route_slug}-{duration_ms:.0f}ms.{extension}"
+        try:
+            with self._write_lock:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                (self.directory / name).write_text(profile, encoding="utf-8")
+                for stale in self._files()[self.max_files:]:
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not write profile: {str(e)}")
+            return None
+        logger.info(f"Profiled {method} {route} ({duration_ms:.0f} ms): {name}")
+        return name
+
+    def _files(self) -> List[Path]:
+        """Profile files, newest first"""
+        if not self.directory.exists():
+            return []
+        files = [p for p in self.directory.iterdir() if p.suffix in (".folded", ".json") and p.is_file()]
+        return sorted(files, key=lambda p: p.name, reverse=True)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": p.name,
+                "size_bytes": p.stat().st_size,
+                "format": "speedscope" if p.name.endswith(".speedscope.json") else "collapsed",
+            }
+            for p in self._files()
+        ]
+
+    def path_for(self, name: str) -> Optional[Path]:
+        """Path of a listed profile, or None (names are never joined unchecked)"""
+        for p in self._files():
+            if p.name == name:
+                return p
+        return None
+
+request_profiler = RequestProfiler()
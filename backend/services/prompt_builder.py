@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Sequence, Tuple
+import json
+from config import settings
+from services.chunking import CHARS_PER_TOKEN, estimate_tokens
+
+class PromptBuilder:
+    """Build compact JSON sections of LLM prompts within a token budget
+
+    Items are projected onto the fields a task needs, serialized without
+    whitespace, and trimmed to fit the budget: the least important fields are
+    dropped first, then trailing items. Callers learn how many items were
+    included so they can handle the rest another way.
+    """
+
+    # Variable fields each task uses, most important first
+    QUESTION_FIELDS = ("key", "label", "dtype", "description", "example")
+    PREFILL_FIELDS = ("key", "label", "dtype", "description")
+    EXTRACTION_HINT_FIELDS = ("key", "label")
+
+    def __init__(self, budget_tokens: int = settings.PROMPT_TOKEN_BUDGET):
+        self.budget_tokens = budget_tokens
+
+    @staticmethod
+    def compact_json(value: Any) -> str:
+        """JSON without indentation or spaces after separators"""
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    @staticmethod
+    def project(items: List[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+        """Keep only the given fields, dropping empty values"""
+        return [
+            {field: item[field] for field in fields if item.get(field) not in (None, "", [])}
+            for item in items
+        ]
+
+    def fit(
+        self,
+        items: List[Dict[str, Any]],
+        fields: Sequence[str],
+        reserved_text: str = ""
+    ) -> Tuple[str, int]:
+        """Compact JSON for as many items as fit in the budget
+
+        Args:
+            items: Dicts to serialize
+            fields: Fields to keep, most important first; the first is never dropped
+            reserved_text: The rest of the prompt, counted against the budget
+
+        Returns:
+            The JSON text and the number of leading items it includes
+        """
+        available = self.budget_tokens - estimate_tokens(reserved_text)
+
+        for field_count in range(len(fields), 0, -1):
+            text = self.compact_json(self.project(items, fields[:field_count]))
+            if estimate_tokens(text) <= available:
+                return text, len(items)
+
+        # Even keys alone are too large: include as many leading items as fit
+        projected = self.project(items, fields[:1])
+        included, used = 0, 2  # Brackets
+        for item in projected:
+            used += len(self.compact_json(item)) + 1
+            if used > available * CHARS_PER_TOKEN:
+                break
+            included += 1
+        return self.compact_json(projected[:included]), included
+
+prompt_builder = PromptBuilder()
+extraction_hint_builder = PromptBuilder(settings.EXTRACTION_HINT_TOKENS)
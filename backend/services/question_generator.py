@@ -1,16 +1,22 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 from services.gemini_service import gemini_service
-import json
+from services.prompt_builder import PromptBuilder, prompt_builder
+from services.metrics import stage_seconds, time_stage
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 class QuestionGenerator:
     """Generate human-friendly questions for missing variables"""
     
     @staticmethod
-    def generate_questions(variables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate friendly questions for variables"""
+    def _question_prompts(variables: List[Dict[str, Any]]) -> Tuple[str, str, int]:
+        """System and user prompts for question generation
         
-        if not variables:
-            return []
+        Also returns how many leading variables fit in the prompt budget; the
+        rest get fallback questions.
+        """
         
         system_prompt = """You are a conversational assistant that generates human-friendly questions for missing legal document variables.
 
@@ -22,42 +28,89 @@ Rules:
 5. Return JSON array of questions
 6. Make questions conversational and easy to understand"""
 
+        response_format = """Generate friendly questions. Return JSON:
+{"questions":[{"variable_key":"policy_number","question":"What is the insurance policy number exactly as it appears on the policy schedule?","format_hint":"Example: 302786965"}]}"""
+
+        variables_json, included = prompt_builder.fit(
+            variables, PromptBuilder.QUESTION_FIELDS, reserved_text=system_prompt + response_format
+        )
         user_prompt = f"""Missing variables:
-{json.dumps(variables, indent=2)}
-
-Generate friendly questions. Return JSON:
-{{
-  "questions": [
-    {{
-      "variable_key": "policy_number",
-      "question": "What is the insurance policy number exactly as it appears on the policy schedule?",
-      "format_hint": "Example: 302786965"
-    }}
-  ]
-}}"""
+{variables_json}
+
+{response_format}"""
+
+        return system_prompt, user_prompt, included
+    
+    @staticmethod
+    def _fallback_questions(variables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Simple questions built from variable labels"""
+        return [
+            {
+                "variable_key": var["key"],
+                "question": f"Please provide {var['label'].lower()}",
+                "format_hint": var.get("example", None)
+            }
+            for var in variables
+        ]
+    
+    @staticmethod
+    def generate_questions(variables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Generate friendly questions for variables"""
+        
+        if not variables:
+            return []
+        
+        system_prompt, user_prompt, included = QuestionGenerator._question_prompts(variables)
 
         try:
-            result = gemini_service.generate_questions(system_prompt, user_prompt)
-            questions = result.get("questions", [])
-            print(f"DEBUG: Gemini generated {len(questions)} questions")
+            with time_stage("questions"):
+                result = gemini_service.generate_questions(system_prompt, user_prompt)
+            questions = [question.model_dump() for question in result.questions]
+            logger.debug(f"Gemini generated {len(questions)} questions")
             if len(questions) == 0:
-                print(f"DEBUG: Gemini result: {result}")
                 raise ValueError("Gemini returned empty questions list")
-            return questions
+            # Variables beyond the prompt budget were not sent
+            return questions + QuestionGenerator._fallback_questions(variables[included:])
         except Exception as e:
-            print(f"DEBUG: Question generation error: {str(e)}, using fallback")
+            logger.warning(f"Question generation error: {str(e)}, using fallback")
             # Fallback to simple questions
-            fallback_questions = [
-                {
-                    "variable_key": var["key"],
-                    "question": f"Please provide {var['label'].lower()}",
-                    "format_hint": var.get("example", None)
-                }
-                for var in variables
-            ]
-            print(f"DEBUG: Generated {len(fallback_questions)} fallback questions")
+            fallback_questions = QuestionGenerator._fallback_questions(variables)
+            logger.debug(f"Generated {len(fallback_questions)} fallback questions")
             return fallback_questions
     
+    @staticmethod
+    def stream_questions(variables: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Generate friendly questions, yielding each one as soon as it is generated
+        
+        If generation fails part-way, fallback questions are yielded for the
+        variables that did not get one yet.
+        """
+        if not variables:
+            return
+        
+        system_prompt, user_prompt, included = QuestionGenerator._question_prompts(variables)
+        answered = set()
+        failed = False
+        start = time.perf_counter()
+        
+        try:
+            for event, payload in gemini_service.stream_questions(system_prompt, user_prompt):
+                if event == "item" and payload.question:
+                    answered.add(payload.variable_key)
+                    yield payload.model_dump()
+        except Exception as e:
+            logger.warning(f"Question streaming error: {str(e)}, using fallback")
+            failed = True
+        stage_seconds.observe(time.perf_counter() - start, stage="questions")
+        
+        if failed or not answered:
+            remaining = [var for var in variables if var["key"] not in answered]
+            logger.debug(f"Generated {len(remaining)} fallback questions")
+        else:
+            remaining = variables[included:]
+        for question in QuestionGenerator._fallback_questions(remaining):
+            yield question
+    
     @staticmethod
     def extract_values_from_query(
         query: str,
@@ -77,23 +130,25 @@ Rules:
 4. Normalize dates to ISO 8601 format (YYYY-MM-DD)
 5. Keep original casing for names"""
 
+        response_format = """Extract any values present in the query. Return JSON with one entry per variable key:
+{"filled_variables":[{"key":"incident_date","value":"2025-07-12"},{"key":"claimant_full_name","value":"Rajesh Kumar"},{"key":"policy_number","value":null}]}"""
+
+        # Variables beyond the budget are simply not pre-filled
+        variables_json, _ = prompt_builder.fit(
+            variables, PromptBuilder.PREFILL_FIELDS, reserved_text=system_prompt + query + response_format
+        )
+
         user_prompt = f"""User query: "{query}"
 
 Template variables:
-{json.dumps(variables, indent=2)}
+{variables_json}
 
-Extract any values present in the query. Return JSON:
-{{
-  "filled_variables": {{
-    "incident_date": "2025-07-12",
-    "claimant_full_name": "Rajesh Kumar",
-    "policy_number": null
-  }}
-}}"""
+{response_format}"""
 
         try:
-            result = gemini_service.extract_prefill_values(system_prompt, user_prompt)
-            return result.get("filled_variables", {})
+            with time_stage("prefill"):
+                result = gemini_service.extract_prefill_values(system_prompt, user_prompt)
+            return result.as_dict()
         except Exception as e:
             return {}
 
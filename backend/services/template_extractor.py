@@ -1,38 +1,34 @@
 import re
-from typing import List, Dict, Any, Tuple
+import time
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 from services.gemini_service import gemini_service
+from services.extraction_cache import extraction_cache
+from services.chunking import TextChunker
+from services.metrics import stage_seconds, time_stage
 from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
 
 class TemplateExtractor:
     """Extract variables and create templates from documents - UOIONHHC"""
     
-    CHUNK_SIZE = 2000  # tokens (approximate by characters)
     MAX_DOCUMENT_SIZE = 100000  # Maximum document size in characters (100KB)
     
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
-        """Split long text into chunks for processing"""
-        # Simple chunking by paragraphs
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for para in paragraphs:
-            para_length = len(para)
-            
-            if current_length + para_length > chunk_size and current_chunk:
-                chunks.append('\n\n'.join(current_chunk))
-                current_chunk = [para]
-                current_length = para_length
-            else:
-                current_chunk.append(para)
-                current_length += para_length
-        
-        if current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
+    def chunk_text(text: str, max_tokens: Optional[int] = None) -> List[str]:
+        """Split long text into token-bounded, overlapping chunks for processing
         
-        return chunks
+        Args:
+            text: Document text
+            max_tokens: Maximum approximate tokens per chunk (defaults to the
+                size derived from the model's context window)
+        """
+        if max_tokens:
+            chunker = TextChunker(max_tokens, settings.EXTRACTION_CHUNK_OVERLAP_TOKENS)
+        else:
+            chunker = TextChunker.for_context_window()
+        return chunker.chunk(text)
     
     @staticmethod
     def deduplicate_variables(variables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -54,9 +50,11 @@ class TemplateExtractor:
         if len(document_text) > TemplateExtractor.MAX_DOCUMENT_SIZE:
             # Truncate document if too large
             document_text = document_text[:TemplateExtractor.MAX_DOCUMENT_SIZE]
-            print(f"Warning: Document truncated to {TemplateExtractor.MAX_DOCUMENT_SIZE} characters")
+            logger.warning(f"Document truncated to {TemplateExtractor.MAX_DOCUMENT_SIZE} characters")
             
         chunks = TemplateExtractor.chunk_text(document_text)
+        model_name = gemini_service.model_name
+        prompt_version = gemini_service.EXTRACTION_PROMPT_VERSION
         
         all_variables = []
         similarity_tags = []
@@ -69,11 +67,17 @@ class TemplateExtractor:
             # Pass previously found variables to avoid duplicates
             existing_vars = [{"key": v["key"], "label": v["label"]} for v in all_variables]
             
-            result = gemini_service.extract_variables(
-                chunk,
-                existing_variables=existing_vars if chunk_number > 1 else None,
-                chunk_number=chunk_number
-            )
+            # Unchanged chunks reuse their cached extraction. The previously found
+            # variables are only a key-reuse hint, so they are not part of the key.
+            result = extraction_cache.get_chunk(chunk, model_name, prompt_version)
+            if result is None:
+                with time_stage("chunk_extract"):
+                    result = gemini_service.extract_variables(
+                        chunk,
+                        existing_variables=existing_vars if chunk_number > 1 else None,
+                        chunk_number=chunk_number
+                    ).model_dump()
+                extraction_cache.put_chunk(chunk, model_name, prompt_version, result)
             
             # Collect variables
             all_variables.extend(result.get('variables', []))
@@ -94,6 +98,71 @@ class TemplateExtractor:
             'jurisdiction': jurisdiction
         }
     
+    @staticmethod
+    def stream_variables_from_document(document_text: str) -> Iterator[Tuple[str, Any]]:
+        """Extract variables from the document, yielding each one as soon as it is generated
+        
+        Yields ("variable", variable) for every new variable key across all
+        chunks, then ("result", extraction_result) with the same structure as
+        extract_variables_from_document. Cached chunks are replayed immediately.
+        """
+        if len(document_text) > TemplateExtractor.MAX_DOCUMENT_SIZE:
+            document_text = document_text[:TemplateExtractor.MAX_DOCUMENT_SIZE]
+            logger.warning(f"Document truncated to {TemplateExtractor.MAX_DOCUMENT_SIZE} characters")
+        
+        chunks = TemplateExtractor.chunk_text(document_text)
+        model_name = gemini_service.model_name
+        prompt_version = gemini_service.EXTRACTION_PROMPT_VERSION
+        
+        unique_variables = []
+        seen_keys = set()
+        similarity_tags = []
+        doc_type = None
+        jurisdiction = None
+        
+        for i, chunk in enumerate(chunks):
+            chunk_number = i + 1
+            existing_vars = [{"key": v["key"], "label": v["label"]} for v in unique_variables]
+            
+            result = extraction_cache.get_chunk(chunk, model_name, prompt_version)
+            cached = result is not None
+            start = time.perf_counter()
+            if cached:
+                events = [("item", v) for v in result.get('variables', [])] + [("result", result)]
+            else:
+                events = (
+                    (event, payload.model_dump())
+                    for event, payload in gemini_service.stream_variables(
+                        chunk,
+                        existing_variables=existing_vars if chunk_number > 1 else None,
+                        chunk_number=chunk_number
+                    )
+                )
+            
+            for event, payload in events:
+                if event == "result":
+                    result = payload
+                elif payload.get('key') and payload['key'] not in seen_keys:
+                    seen_keys.add(payload['key'])
+                    unique_variables.append(payload)
+                    yield "variable", payload
+            
+            if not cached:
+                stage_seconds.observe(time.perf_counter() - start, stage="chunk_extract")
+                extraction_cache.put_chunk(chunk, model_name, prompt_version, result)
+            
+            if chunk_number == 1:
+                similarity_tags = result.get('similarity_tags', [])
+                doc_type = result.get('doc_type')
+                jurisdiction = result.get('jurisdiction')
+        
+        yield "result", {
+            'variables': unique_variables,
+            'similarity_tags': similarity_tags,
+            'doc_type': doc_type,
+            'jurisdiction': jurisdiction
+        }
+    
     @staticmethod
     def create_template_markdown(
         document_text: str,
@@ -107,31 +176,93 @@ class TemplateExtractor:
     ) -> str:
         """Create Markdown template with YAML front-matter and variable substitution"""
         
-        # Replace variable values with {{variable_key}} placeholders
-        template_body = document_text
+        template_body = TemplateExtractor.substitute_variables(document_text, variables)
+        
+        return TemplateExtractor.build_front_matter(
+            template_id, title, doc_type, jurisdiction, similarity_tags, file_description
+        ) + template_body
+    
+    @staticmethod
+    def substitute_variables(document_text: str, variables: List[Dict[str, Any]]) -> str:
+        """Replace variable example values with {{variable_key}} placeholders
         
-        # Sort variables by example length (longest first) to avoid partial replacements
+        All examples are matched in a single pass with one trie-structured regex,
+        preferring the longest example at each position, instead of one full
+        re.sub pass over the document per variable.
+        """
+        # Longest examples first so equal examples resolve to the same variable as before
         sorted_vars = sorted(
-            [v for v in variables if v.get('example')],
-            key=lambda x: len(x.get('example', '')),
+            [v for v in variables if v.get('example') and len(v['example']) > 2],  # Only meaningful examples
+            key=lambda x: len(x['example']),
             reverse=True
         )
         
+        if not sorted_vars:
+            return document_text
+        
+        placeholders = {}
         for var in sorted_vars:
-            example = var.get('example', '')
-            if example and len(example) > 2:  # Only replace meaningful examples
-                # Escape special regex characters
-                escaped_example = re.escape(example)
-                # Replace with variable placeholder
-                template_body = re.sub(
-                    escaped_example,
-                    f"{{{{{var['key']}}}}}",
-                    template_body,
-                    flags=re.IGNORECASE
+            placeholders.setdefault(var['example'].lower(), f"{{{{{var['key']}}}}}")
+        
+        pattern = re.compile(TemplateExtractor._trie_pattern(placeholders.keys()), re.IGNORECASE)
+        
+        def replace(match):
+            matched = match.group(0)
+            placeholder = placeholders.get(matched.lower())
+            if placeholder is None:
+                # Case folding differs from str.lower() for a few non-ASCII characters
+                placeholder = next(
+                    f"{{{{{v['key']}}}}}" for v in sorted_vars
+                    if re.fullmatch(re.escape(v['example']), matched, re.IGNORECASE)
                 )
+            return placeholder
+        
+        return pattern.sub(replace, document_text)
+    
+    @staticmethod
+    def _trie_pattern(words) -> str:
+        """Build a regex matching any of the words, sharing common prefixes
+        
+        At each position the regex engine only explores branches that match the
+        next character, and greedy optional groups prefer longer words.
+        """
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = True
+        
+        # Post-order traversal without recursion, so long examples cannot hit the recursion limit
+        patterns = {}
+        stack = [(trie, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for char, child in node.items() if char)
+                continue
+            
+            branches = [re.escape(char) + patterns[id(child)] for char, child in node.items() if char]
+            if not branches:
+                patterns[id(node)] = ''
+                continue
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            patterns[id(node)] = f'(?:{body})?' if '' in node else body
         
-        # Create YAML front-matter
-        yaml_front_matter = f"""---
+        return patterns[id(trie)]
+    
+    @staticmethod
+    def build_front_matter(
+        template_id: str,
+        title: str,
+        doc_type: str,
+        jurisdiction: str,
+        similarity_tags: List[str],
+        file_description: str = ""
+    ) -> str:
+        """Create the YAML front-matter block that precedes the template body"""
+        return f"""---
 template_id: {template_id}
 title: {title}
 doc_type: {doc_type or 'Unknown'}
@@ -143,8 +274,6 @@ File_description: {file_description}
 <!-- {settings.TRACKING_CODE} -->
 
 """
-        
-        return yaml_front_matter + template_body
     
     @staticmethod
     def generate_template_id(title: str) -> str:
@@ -3,8 +3,15 @@ from sqlalchemy.orm import Session
 from database import Template, TemplateVariable
 from services.embedding_service import embedding_service
 from services.gemini_service import gemini_service
+from services.match_cache import match_cache
+from services.catalogue import catalogue
+from services.catalogue_snapshot import catalogue_snapshot
+from services.prompt_builder import prompt_builder
+from services.metrics import time_stage
 from config import settings
-import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class TemplateMatcher:
     """Match user queries to templates using embeddings and AI classification"""
@@ -13,39 +20,31 @@ class TemplateMatcher:
     def find_candidate_templates(
         query: str,
         db: Session,
-        top_k: int = 3
+        top_k: int = 3,
+        query_embedding: Optional[Tuple[List[float], str]] = None
     ) -> List[Tuple[Template, float]]:
-        """Find top K candidate templates using embedding similarity"""
-        
-        # Generate query embedding
-        query_embedding = embedding_service.generate_query_embedding(query)
+        """Find top K candidate templates using embedding similarity
         
-        # Get all templates with embeddings
-        templates = db.query(Template).all()
+        Ranking runs against the memory-mapped catalogue snapshot; only the
+        top K template rows are loaded from the database.
         
-        if not templates:
-            return []
+        Args:
+            query_embedding: Optional precomputed (vector, model_id) for the query
+        """
         
-        # Calculate similarities
-        candidate_embeddings = [
-            (template, template.embedding) 
-            for template in templates 
-            if template.embedding
-        ]
+        # Embed the query and rank templates embedded by the same model
+        query_vector, model_id = query_embedding or embedding_service.embed_query(query)
+        with time_stage("vector_search"):
+            ranked = catalogue_snapshot.get(db, model_id).search(query_vector, top_k=top_k)
         
-        if not candidate_embeddings:
+        if not ranked:
             return []
         
-        # Find most similar
-        similarities = []
-        for template, embedding in candidate_embeddings:
-            similarity = embedding_service.cosine_similarity(query_embedding, embedding)
-            similarities.append((template, similarity))
+        ids = [meta["id"] for meta, _ in ranked]
+        templates = {t.id: t for t in db.query(Template).filter(Template.id.in_(ids)).all()}
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        return similarities[:top_k]
+        # Rows deleted since the snapshot was built are skipped
+        return [(templates[meta["id"]], score) for meta, score in ranked if meta["id"] in templates]
     
     @staticmethod
     def classify_best_match(
@@ -87,7 +86,7 @@ Rules:
         user_prompt = f"""User request: "{query}"
 
 Candidate templates:
-{json.dumps(candidate_data, indent=2)}
+{prompt_builder.compact_json(candidate_data)}
 
 Return JSON:
 {{
@@ -98,53 +97,111 @@ Return JSON:
 }}"""
 
         try:
-            result = gemini_service.classify_template(system_prompt, user_prompt)
-            
-            # Validate result has required fields
-            if not isinstance(result, dict):
-                raise ValueError(f"Expected dict result, got {type(result)}")
-            
-            # Ensure all required fields exist
-            required_fields = ["best_match_id", "confidence", "justification", "alternatives"]
-            for field in required_fields:
-                if field not in result:
-                    print(f"DEBUG: Missing field '{field}' in classification result: {result}")
-                    raise KeyError(f"Missing field: {field}")
-            
-            # Ensure types are correct
-            if not isinstance(result.get("confidence"), (int, float)):
-                result["confidence"] = float(result.get("confidence", 0.0))
-            
-            if not isinstance(result.get("alternatives"), list):
-                result["alternatives"] = []
-            
-            return result
+            # The response schema guarantees the fields and their types
+            with time_stage("classify"):
+                return gemini_service.classify_template(system_prompt, user_prompt).model_dump()
         except Exception as e:
-            print(f"DEBUG: Classification exception: {str(e)}")
+            logger.warning(f"Classification failed ({str(e)}), using highest similarity")
             # Fallback to highest similarity
             best_template = candidates[0][0]
             return {
                 "best_match_id": best_template.template_id,
                 "confidence": float(candidates[0][1]),
                 "justification": f"Selected based on highest similarity score",
-                "alternatives": [t.template_id for t, _ in candidates[1:]]
+                "alternatives": [t.template_id for t, _ in candidates[1:]],
+                # Not a classifier answer: not to be cached
+                "fallback": True
             }
     
     @staticmethod
     def match_template(query: str, db: Session) -> Optional[Dict[str, Any]]:
-        """Complete template matching pipeline"""
+        """Complete template matching pipeline, served from the match cache when possible
+        
+        Exact (normalized) repeats of a query are answered without any API call;
+        near-duplicates cost one query embedding instead of the full pipeline.
+        """
+        catalogue_version = catalogue.get_version(db)
+        query_embedding = None
+        
+        hit, cached = match_cache.get(query, catalogue_version)
+        if not hit:
+            query_embedding = embedding_service.embed_query(query)
+            hit, cached = match_cache.get_similar(query_embedding, catalogue_version)
+        
+        if hit:
+            result = TemplateMatcher._hydrate_match(cached, db)
+            if cached is None or result is not None:
+                return result
+        
+        if query_embedding is None:
+            query_embedding = embedding_service.embed_query(query)
+        
+        result, cacheable = TemplateMatcher._run_match_pipeline(query, db, query_embedding)
+        # Results of a failed classification are not cached, so the next request retries the LLM
+        if cacheable:
+            match_cache.put(query, query_embedding, catalogue_version, TemplateMatcher._serialize_match(result))
+        
+        return result
+    
+    @staticmethod
+    def _serialize_match(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Convert a match result into a session-independent dict for caching"""
+        if result is None:
+            return None
+        
+        return {
+            "template_id": result["template"].template_id,
+            "confidence": result["confidence"],
+            "justification": result["justification"],
+            "alternatives": result["alternatives"]
+        }
+    
+    @staticmethod
+    def _hydrate_match(cached: Optional[Dict[str, Any]], db: Session) -> Optional[Dict[str, Any]]:
+        """Load the template for a cached match result"""
+        if cached is None:
+            return None
+        
+        template = db.query(Template).filter(
+            Template.template_id == cached["template_id"]
+        ).first()
+        
+        if not template:
+            return None
+        
+        return {
+            "template": template,
+            "confidence": cached["confidence"],
+            "justification": cached["justification"],
+            "alternatives": cached["alternatives"]
+        }
+    
+    @staticmethod
+    def _run_match_pipeline(
+        query: str,
+        db: Session,
+        query_embedding: Optional[Tuple[List[float], str]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Embedding search followed by LLM classification
+
+        Returns:
+            The match (or None) and whether it may be cached, which it may not
+            when classification failed and similarity was used instead
+        """
         
         # Find candidates
-        candidates = TemplateMatcher.find_candidate_templates(query, db, top_k=3)
+        candidates = TemplateMatcher.find_candidate_templates(
+            query, db, top_k=3, query_embedding=query_embedding
+        )
         
         if not candidates:
-            return None
+            return None, True
         
         # Classify best match
         try:
             classification = TemplateMatcher.classify_best_match(query, candidates)
         except Exception as e:
-            print(f"DEBUG: Classification error: {str(e)}")
+            logger.warning(f"Classification failed ({str(e)}), using highest similarity")
             # Fallback to highest similarity
             best_template = candidates[0][0]
             return {
@@ -159,23 +216,25 @@ Return JSON:
                     }
                     for t, _ in candidates[1:]
                 ]
-            }
+            }, False
+        
+        cacheable = not classification.get("fallback", False)
         
         # Check confidence threshold
         if classification["confidence"] < settings.CONFIDENCE_THRESHOLD:
-            return None
+            return None, cacheable
         
         # Get the best matching template
         best_template_id = classification["best_match_id"]
         if not best_template_id or best_template_id == "none":
-            return None
+            return None, cacheable
         
         best_template = db.query(Template).filter(
             Template.template_id == best_template_id
         ).first()
         
         if not best_template:
-            return None
+            return None, cacheable
         
         # Get alternatives - ensure it's a list
         alternatives = []
@@ -200,6 +259,6 @@ Return JSON:
             "confidence": classification["confidence"],
             "justification": classification["justification"],
             "alternatives": alternatives
-        }
+        }, cacheable
 
 template_matcher = TemplateMatcher()
@@ -1,16 +1,56 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from services.exa_service import exa_service
 from services.gemini_service import gemini_service
 from services.template_extractor import TemplateExtractor
 from services.embedding_service import embedding_service
+from services.catalogue import catalogue
+from services.web_cache import web_cache
 from database import Template, TemplateVariable
+from config import settings
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+import re
 import uuid
 import json
+import logging
+from services.logging_setup import PAYLOAD
+from services.metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+# Speculative fetches of search results the user has not picked yet
+_prefetch_executor = ThreadPoolExecutor(max_workers=settings.WEB_PREFETCH_WORKERS, thread_name_prefix="web-prefetch")
+_inflight: Dict[str, Future] = {}
+# Document id -> (expiry, error) of failed prefetches, so callers that must not refetch still see them
+_failed: Dict[str, Tuple[float, BaseException]] = {}
+_inflight_lock = threading.Lock()
 
 class WebBootstrap:
     """Bootstrap templates from web when no local match is found"""
     
+    # Signs that content is a legal document
+    LEGAL_KEYWORDS = (
+        'agreement', 'contract', 'notice', 'letter', 'termination',
+        'employment', 'lease', 'rental', 'party', 'date', 'whereas',
+        'hereby', 'undersigned', 'signature', 'witness'
+    )
+    
+    # Phrases that only appear in articles/marketing content about a topic
+    NON_LEGAL_PHRASES = (
+        "is not a futuristic concept",
+        "already a part of many workplaces",
+        "here's how employers",
+        "expert said",
+        "learn how",
+        "proliferation of artificial",
+        "could help usher in"
+    )
+    
+    # Fillable fields in a page: [PLACEHOLDERS], {{variables}} and long blank lines
+    FIELD_PATTERN = re.compile(r'\[[A-Za-z][^\]\n]{0,40}\]|\{\{\s*\w+\s*\}\}|_{8,}|\.{15,}')
+    
     @staticmethod
     def _extract_template_with_llm(raw_content: str, title: str) -> str:
         """Use Gemini to intelligently extract the actual template from messy web content
@@ -69,22 +109,21 @@ Return ONLY valid JSON:
 {{"template": "<extracted template content here, or empty string if nothing found>"}}"""
 
         try:
-            print(f"DEBUG: LLM extraction for template: {title}")
-            print(f"DEBUG: Raw content length: {len(raw_content)}")
-            print(f"DEBUG: Raw content preview: {raw_content[:500]}")
+            logger.debug(f"LLM extraction for template: {title} ({len(raw_content)} chars of raw content)")
+            logger.debug("Raw content preview: %s", raw_content[:500], extra=PAYLOAD)
 
-            result = gemini_service._generate_json_response(system_prompt, user_prompt)
+            result = gemini_service._generate_json_response(system_prompt, user_prompt, call_type="web_template_extraction")
             
             # Handle different response structures
             if isinstance(result, dict):
                 extracted = result.get('template', '')
             else:
-                print(f"DEBUG: Unexpected result type: {type(result)}, result: {result}")
+                logger.warning(f"Unexpected template extraction result type: {type(result).__name__}")
                 extracted = ''
             
             extracted = extracted.strip() if extracted else ''
-            print(f"DEBUG: LLM extracted template length: {len(extracted)}")
-            print(f"DEBUG: LLM extracted preview: {extracted[:300] if extracted else 'None'}")
+            logger.debug(f"LLM extracted template length: {len(extracted)}")
+            logger.debug("LLM extracted preview: %s", extracted[:300] if extracted else None, extra=PAYLOAD)
 
             # Check if template was actually found
             if not extracted or extracted == "NO_TEMPLATE_FOUND" or len(extracted) < 100:
@@ -103,7 +142,7 @@ Return ONLY valid JSON:
             
         except Exception as e:
             # If LLM extraction fails, try with cleaned content
-            print(f"DEBUG: Template extraction error: {str(e)}")
+            logger.warning(f"Template extraction error: {str(e)}")
             raise ValueError(f"Template extraction failed: {str(e)}")
 
     @staticmethod
@@ -311,7 +350,12 @@ Return ONLY valid JSON:
 
     @staticmethod
     def extract_search_terms(query: str) -> str:
-        """Extract key search terms from user query using Gemini"""
+        """Extract key search terms from user query using Gemini (cached per query)"""
+        cache_key = " ".join(query.lower().split())
+        cached = web_cache.get("search_terms", cache_key)
+        if cached is not None:
+            return cached
+        
         system_prompt = """Extract key search terms from the user's query for finding legal documents online.
 
 Rules:
@@ -328,12 +372,14 @@ Extract search terms. Return JSON:
 }}"""
 
         try:
-            result = gemini_service._generate_json_response(system_prompt, user_prompt)
-            terms = result.get("search_terms", [])
-            return " ".join(terms)
+            result = gemini_service._generate_json_response(system_prompt, user_prompt, call_type="search_terms")
+            terms = " ".join(result.get("search_terms", []))
         except:
-            # Fallback: use original query
+            # Fallback: use original query (not cached, so the next search retries Gemini)
             return query
+        
+        web_cache.put("search_terms", cache_key, terms, settings.WEB_SEARCH_CACHE_TTL_SECONDS)
+        return terms
     
     @staticmethod
     def search_web_documents(query: str, num_results: int = 3) -> List[Dict[str, Any]]:
@@ -345,10 +391,197 @@ Extract search terms. Return JSON:
         search_terms = WebBootstrap.extract_search_terms(query)
         
         # Search using exa
-        results = exa_service.search_documents(search_terms, num_results=num_results)
+        cache_key = f"{search_terms}|{num_results}"
+        results = web_cache.get("search", cache_key)
+        if results is None:
+            results = exa_service.search_documents(search_terms, num_results=num_results)
+            web_cache.put("search", cache_key, results, settings.WEB_SEARCH_CACHE_TTL_SECONDS)
+        
+        # Fetch the top results while the user is still choosing
+        WebBootstrap.prefetch_contents([r["id"] for r in results[:settings.WEB_PREFETCH_COUNT]])
         
         return results
     
+    @staticmethod
+    def _fetch_content(document_id: str) -> str:
+        """Fetch a document's content from Exa and cache it with its cleaned version"""
+        raw_content = exa_service.get_document_content(document_id)
+        web_cache.put("content", document_id, raw_content, settings.WEB_CONTENT_CACHE_TTL_SECONDS)
+        web_cache.put(
+            "cleaned", document_id, exa_service.clean_web_content(raw_content), settings.WEB_CONTENT_CACHE_TTL_SECONDS
+        )
+        return raw_content
+    
+    @staticmethod
+    def _recent_failure(document_id: str) -> Optional[BaseException]:
+        """Error of a prefetch of this document that failed within the failure TTL (lock held)"""
+        failure = _failed.get(document_id)
+        if failure is None:
+            return None
+        if failure[0] <= time.monotonic():
+            del _failed[document_id]
+            return None
+        return failure[1]
+    
+    @staticmethod
+    def prefetch_contents(document_ids: List[str]):
+        """Start background fetches of documents that are not cached, in flight or recently failed"""
+        for document_id in document_ids:
+            with _inflight_lock:
+                if document_id in _inflight or WebBootstrap._recent_failure(document_id) is not None:
+                    continue
+            if web_cache.get("content", document_id) is not None:
+                continue
+            
+            with _inflight_lock:
+                if document_id in _inflight:
+                    continue
+                future = _prefetch_executor.submit(WebBootstrap._fetch_content, document_id)
+                _inflight[document_id] = future
+            
+            def _done(f: Future, document_id: str = document_id):
+                error = f.exception()
+                with _inflight_lock:
+                    # Record the failure before the future leaves _inflight, so no caller misses both
+                    if error is not None:
+                        now = time.monotonic()
+                        for stale in [key for key, (expiry, _) in _failed.items() if expiry <= now]:
+                            del _failed[stale]
+                        _failed[document_id] = (now + settings.WEB_PREFETCH_FAILURE_TTL_SECONDS, error)
+                    _inflight.pop(document_id, None)
+                if error is not None:
+                    logger.debug(f"Prefetch of {document_id} failed: {error}")
+            
+            future.add_done_callback(_done)
+    
+    @staticmethod
+    def get_document_content(document_id: str, retry_failed_prefetch: bool = True) -> str:
+        """Raw content of a document: from an in-flight prefetch, the cache, or Exa
+        
+        With ``retry_failed_prefetch=False``, a prefetch that failed (in flight
+        or within WEB_PREFETCH_FAILURE_TTL_SECONDS) raises its error instead of
+        fetching the document again.
+        """
+        with _inflight_lock:
+            future = _inflight.get(document_id)
+            failure = WebBootstrap._recent_failure(document_id) if future is None else None
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                if not retry_failed_prefetch:
+                    raise
+                # Otherwise retry the fetch below, surfacing its error to the caller
+        elif failure is not None and not retry_failed_prefetch:
+            raise failure
+        
+        cached = web_cache.get("content", document_id)
+        if cached is not None:
+            return cached
+        content = WebBootstrap._fetch_content(document_id)
+        with _inflight_lock:
+            _failed.pop(document_id, None)
+        return content
+    
+    @staticmethod
+    def get_cleaned_content(document_id: str, raw_content: str) -> str:
+        """Cleaned content of a document, computed at prefetch time when available"""
+        cached = web_cache.get("cleaned", document_id)
+        if cached is not None:
+            return cached
+        return exa_service.clean_web_content(raw_content)
+    
+    @staticmethod
+    def _check_legal_content(content: str):
+        """Raise ValueError unless content looks like a legal document rather than an article"""
+        content_lower = content.lower()
+        
+        keyword_count = sum(1 for keyword in WebBootstrap.LEGAL_KEYWORDS if keyword in content_lower)
+        if keyword_count < 2:
+            raise ValueError("Content does not appear to be a legal document. Please try a different source.")
+        
+        # Check for excessive non-legal content
+        # Count lines that are definitely NOT legal content
+        non_legal_count = sum(1 for phrase in WebBootstrap.NON_LEGAL_PHRASES if phrase in content_lower)
+        total_lines = len(content.split('\n'))
+        
+        # If more than 15% of the content is non-legal, reject it
+        if total_lines > 20 and non_legal_count > (total_lines * 0.15):
+            raise ValueError(f"Content appears to be mixed with articles/marketing content. "
+                           f"Found {non_legal_count} non-legal sections out of {total_lines} lines. "
+                           f"Please try a different source or upload the document directly.")
+    
+    @staticmethod
+    def score_candidate(raw_content: str) -> Dict[str, Any]:
+        """Rank a fetched page by how likely it is to yield a template, without calling the LLM
+        
+        The score is the density of legal keywords (occurrences per 100 words),
+        boosted by up to 2x for fillable fields and divided by 1 + the number of
+        non-legal phrases found. Pages that would fail the checks in
+        fetch_and_templatize get a rejection reason instead.
+        """
+        content_lower = raw_content.lower()
+        word_count = len(content_lower.split())
+        keyword_hits = sum(content_lower.count(keyword) for keyword in WebBootstrap.LEGAL_KEYWORDS)
+        distinct_keywords = sum(1 for keyword in WebBootstrap.LEGAL_KEYWORDS if keyword in content_lower)
+        non_legal_count = sum(1 for phrase in WebBootstrap.NON_LEGAL_PHRASES if phrase in content_lower)
+        field_count = len(WebBootstrap.FIELD_PATTERN.findall(raw_content))
+        
+        density = 100 * keyword_hits / word_count if word_count else 0.0
+        score = density * (1 + min(field_count, 20) / 20) / (1 + non_legal_count)
+        
+        rejected = None
+        if len(raw_content.strip()) < 100:
+            rejected = "Document content is too short or empty"
+        elif distinct_keywords < 2:
+            rejected = "Fewer than two legal keywords"
+        
+        return {
+            "score": round(score, 3),
+            "keyword_density": round(density, 3),
+            "field_count": field_count,
+            "non_legal_count": non_legal_count,
+            "rejected": rejected
+        }
+    
+    @staticmethod
+    def bootstrap_best_candidate(query: str, db: Session, num_candidates: int = settings.WEB_BOOTSTRAP_CANDIDATES) -> Dict[str, Any]:
+        """Search the web, then templatize the best-scoring of the top results
+        
+        All candidates are fetched concurrently on the prefetch pool and scored
+        locally. LLM extraction runs on the best candidate first; if it fails,
+        the next one is tried, so one request replaces several manual attempts.
+        """
+        results = WebBootstrap.search_web_documents(query, num_candidates)
+        if not results:
+            raise ValueError("No web documents found for this query")
+        
+        with time_stage("web_candidates"):
+            WebBootstrap.prefetch_contents([r["id"] for r in results])
+            candidates = []
+            for result in results:
+                candidate = {"id": result["id"], "title": result["title"], "url": result["url"], "selected": False}
+                try:
+                    candidate.update(WebBootstrap.score_candidate(WebBootstrap.get_document_content(result["id"], retry_failed_prefetch=False)))
+                except Exception as e:
+                    candidate.update(score=0.0, rejected=f"Could not fetch content: {str(e)}")
+                candidates.append(candidate)
+        
+        ranked = sorted((c for c in candidates if not c["rejected"]), key=lambda c: c["score"], reverse=True)
+        for candidate in ranked:
+            try:
+                result = WebBootstrap.fetch_and_templatize(candidate["id"], candidate["url"], candidate["title"], db)
+            except ValueError as e:
+                logger.info(f"Web candidate {candidate['url']} failed, trying the next one: {str(e)}")
+                candidate["rejected"] = str(e)
+                continue
+            
+            candidate["selected"] = True
+            return {**result, "source_url": candidate["url"], "candidates": candidates}
+        
+        reasons = "; ".join(f"{c['title']}: {c['rejected']}" for c in candidates)
+        raise ValueError(f"None of the top {len(candidates)} web results produced a usable template ({reasons})")
+    
     @staticmethod
     def fetch_and_templatize(
         document_id: str,
@@ -360,8 +593,8 @@ Extract search terms. Return JSON:
         if not exa_service:
             raise ValueError("Exa service not configured")
         
-        # Fetch document content (raw from Exa)
-        raw_content = exa_service.get_document_content(document_id)
+        # Fetch document content (raw from Exa), usually already prefetched by the search
+        raw_content = WebBootstrap.get_document_content(document_id)
         
         if not raw_content or len(raw_content.strip()) < 100:
             raise ValueError("Document content is too short or empty")
@@ -372,55 +605,20 @@ Extract search terms. Return JSON:
             content = WebBootstrap._extract_template_with_llm(raw_content, title)
         except ValueError:
             # Fallback: Try with cleaned content
-            cleaned_content = exa_service.clean_web_content(raw_content)
+            cleaned_content = WebBootstrap.get_cleaned_content(document_id, raw_content)
             if len(cleaned_content.strip()) > 500:
-                print(f"DEBUG: LLM extraction failed, trying cleaned content: {len(cleaned_content)} chars")
+                logger.info(f"LLM extraction failed, trying cleaned content: {len(cleaned_content)} chars")
                 content = cleaned_content
             else:
                 raise ValueError("Content too short after cleaning - no usable template found")
         
         # CRITICAL: Convert field labels and blank lines to proper {{variable}} placeholders
         # This ensures web-extracted templates can have variables replaced
-        print(f"DEBUG: Converting field labels to placeholders in extracted template")
         content = WebBootstrap._convert_field_labels_to_placeholders(content)
-        print(f"DEBUG: Template after field label conversion, preview: {content[:500]}")
-        
-        print(f"DEBUG: Converting blank lines to placeholders in extracted template")
         content = WebBootstrap._convert_blanks_to_placeholders(content)
-        print(f"DEBUG: Template after blank conversion, preview: {content[:500]}")
-        
-        # Additional validation: ensure it looks like a legal document
-        content_lower = content.lower()
-        legal_keywords = [
-            'agreement', 'contract', 'notice', 'letter', 'termination', 
-            'employment', 'lease', 'rental', 'party', 'date', 'whereas',
-            'hereby', 'undersigned', 'signature', 'witness'
-        ]
-        
-        keyword_count = sum(1 for keyword in legal_keywords if keyword in content_lower)
-        if keyword_count < 2:
-            raise ValueError("Content does not appear to be a legal document. Please try a different source.")
+        logger.debug("Template after placeholder conversion, preview: %s", content[:500], extra=PAYLOAD)
         
-        # NEW: Check for excessive non-legal content
-        # Count lines that are definitely NOT legal content
-        non_legal_phrases = [
-            "is not a futuristic concept",
-            "already a part of many workplaces",
-            "here's how employers",
-            "expert said",
-            "learn how",
-            "proliferation of artificial",
-            "could help usher in"
-        ]
-        
-        non_legal_count = sum(1 for phrase in non_legal_phrases if phrase in content_lower)
-        total_lines = len(content.split('\n'))
-        
-        # If more than 15% of the content is non-legal, reject it
-        if total_lines > 20 and non_legal_count > (total_lines * 0.15):
-            raise ValueError(f"Content appears to be mixed with articles/marketing content. "
-                           f"Found {non_legal_count} non-legal sections out of {total_lines} lines. "
-                           f"Please try a different source or upload the document directly.")
+        WebBootstrap._check_legal_content(content)
         
         # Extract variables
         extraction_result = TemplateExtractor.extract_variables_from_document(content)
@@ -449,10 +647,6 @@ Extract search terms. Return JSON:
             f"Bootstrapped from web: {document_url}"
         )
         
-        # Generate embedding
-        embedding_text = f"{title} {extraction_result.get('doc_type')} {extraction_result.get('jurisdiction')} {' '.join(extraction_result.get('similarity_tags', []))}"
-        embedding = embedding_service.generate_document_embedding(embedding_text)
-        
         # Save template to database
         template = Template(
             id=str(uuid.uuid4()),
@@ -462,10 +656,12 @@ Extract search terms. Return JSON:
             doc_type=extraction_result.get('doc_type'),
             jurisdiction=extraction_result.get('jurisdiction'),
             similarity_tags=extraction_result.get('similarity_tags', []),
-            body_md=template_markdown,
-            embedding=embedding
+            body_md=template_markdown
         )
         
+        # Generate embedding
+        embedding_service.embed_template(template)
+        
         db.add(template)
         db.flush()
         
@@ -485,6 +681,7 @@ Extract search terms. Return JSON:
             )
             db.add(variable)
         
+        catalogue.bump_version(db, changed=[template.id])
         db.commit()
         db.refresh(template)
         
@@ -0,0 +1,73 @@
+from typing import Any, Optional
+from datetime import datetime, timedelta
+import hashlib
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, WebCache as WebCacheRow
+from services.metrics import record_cache
+
+class WebCache:
+    """Persistent TTL cache for web bootstrap lookups
+
+    Entries live in a namespace ("search_terms", "search", "content",
+    "cleaned") under a SHA-256 of their lookup key and expire after a
+    per-entry TTL. Expired entries are ignored on read and deleted by
+    ``purge_expired``. Each operation uses its own short-lived session, as in
+    ExtractionCache.
+    """
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get(namespace: str, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        db = SessionLocal()
+        try:
+            row = db.query(WebCacheRow).filter(
+                WebCacheRow.namespace == namespace,
+                WebCacheRow.cache_key == WebCache._key(key),
+                WebCacheRow.expires_at > datetime.utcnow()
+            ).first()
+            value = row.value if row else None
+        finally:
+            db.close()
+        record_cache(f"web_{namespace}", value is not None)
+        return value
+
+    @staticmethod
+    def put(namespace: str, key: str, value: Any, ttl_seconds: int):
+        """Store or refresh an entry"""
+        now = datetime.utcnow()
+        cache_key = WebCache._key(key)
+        db = SessionLocal()
+        try:
+            row = db.query(WebCacheRow).filter(
+                WebCacheRow.namespace == namespace,
+                WebCacheRow.cache_key == cache_key
+            ).first()
+            if row is None:
+                row = WebCacheRow(namespace=namespace, cache_key=cache_key)
+                db.add(row)
+            row.value = value
+            row.created_at = now
+            row.expires_at = now + timedelta(seconds=ttl_seconds)
+            db.commit()
+        except IntegrityError:
+            # Another request stored the same entry first
+            db.rollback()
+        finally:
+            db.close()
+
+    @staticmethod
+    def purge_expired() -> int:
+        """Delete expired entries; returns the number removed"""
+        db = SessionLocal()
+        try:
+            removed = db.query(WebCacheRow).filter(WebCacheRow.expires_at <= datetime.utcnow()).delete()
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+web_cache = WebCache()
@@ -132,6 +132,13 @@ export class ApiClient {
     })
   }
 
+  async bootstrapBestFromWeb(query: string, numCandidates?: number) {
+    return this.request("/api/web/bootstrap/auto", {
+      method: "POST",
+      body: JSON.stringify({ query, num_candidates: numCandidates }),
+    })
+  }
+
   async healthCheck() {
     return this.request("/health")
   }